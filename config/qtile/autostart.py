@@ -0,0 +1,213 @@
+from typing import Callable, NamedTuple
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+
+
+class Daemon(NamedTuple):
+    name: str  # /proc/<pid>/stat 中的进程名
+    command: list
+    config: str = ""  # 存在时追加 --config <path>
+
+
+def scan_processes(names) -> dict:
+    """
+    # 遍历一次 /proc，返回 {进程名: pid}，忽略僵尸进程。
+    """
+    found = {}
+    try:
+        entries = os.scandir("/proc")
+    except OSError:
+        return found
+    with entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat", "rb") as stat_file:
+                    stat = stat_file.read()
+            except OSError:
+                continue
+            comm_end = stat.rfind(b")")
+            comm = stat[stat.find(b"(") + 1 : comm_end].decode(errors="replace")
+            if comm in names and comm not in found and stat[comm_end + 2 : comm_end + 3] != b"Z":
+                found[comm] = int(entry.name)
+    return found
+
+
+class Supervisor:
+    """
+    # 守护进程监管。
+    # 启动时遍历一次 /proc 找出已运行的实例，缺失的直接启动；之后用 pidfd 等待
+    # 进程退出，不再轮询。进程退出后先重新扫描一次 /proc（兼容 fcitx5 -d 这类
+    # 自行转入后台的程序），找不到才按指数退避重启。
+    """
+
+    def __init__(self, daemons=(), backoff: float = 1, max_backoff: float = 60, stable_after: float = 60):
+        self.daemons = {}
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.running = False
+        self.pids = {}
+        self.restarts = {}
+        self._failures = {}
+        self._started = {}
+        self._pidfds = {}
+        self._children = {}
+        self._pending = {}
+        self.configure(daemons)
+
+    def configure(self, daemons):
+        """
+        # 换上新的守护进程列表。已经在监管时（重新加载配置）立即启动新增的。
+        """
+        self.daemons = {daemon.name: daemon for daemon in daemons}
+        for name in self.daemons:
+            self.restarts.setdefault(name, 0)
+            self._failures.setdefault(name, 0)
+        if self.running:
+            self.start()
+
+    def start(self):
+        """
+        # 接管已运行的实例并启动缺失的守护进程，可重复调用。
+        """
+        self.running = True
+        missing = [name for name in self.daemons if name not in self.pids and name not in self._pending]
+        found = scan_processes(missing)
+        for name in missing:
+            if name in found:
+                print(f"{name} 已经在运行。")
+                self._watch(name, found[name])
+            else:
+                self._spawn(name)
+
+    def stop(self):
+        """
+        # 停止监视和待定的重启，守护进程保持运行，由新的监管器接管。
+        """
+        self.running = False
+        for pidfd in self._pidfds.values():
+            asyncio.get_running_loop().remove_reader(pidfd)
+            os.close(pidfd)
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pidfds.clear()
+        self._pending.clear()
+
+    def _spawn(self, name):
+        daemon = self.daemons.get(name)
+        if daemon is None:
+            return
+        command = list(daemon.command)
+        executable = shutil.which(command[0])
+        if not executable:
+            print(f"{name} 不存在，无法自动启动。")
+            return
+        command[0] = executable
+        config = os.path.expanduser(daemon.config) if daemon.config else ""
+        if config and os.path.isfile(config):
+            command.extend(["--config", config])
+
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+        except OSError as error:
+            print(f"启动 {name} 失败: {error}")
+            self._schedule_restart(name)
+            return
+        print(f"已启动 {name}: {' '.join(command)}")
+        self._children[process.pid] = process
+        self._watch(name, process.pid)
+
+    def _watch(self, name, pid):
+        self.pids[name] = pid
+        self._started[name] = time.monotonic()
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            asyncio.get_running_loop().call_soon(self._on_exit, name)
+            return
+        except (AttributeError, OSError) as error:
+            print(f"无法监视 {name} ({pid}): {error}")
+            return
+        self._pidfds[name] = pidfd
+        asyncio.get_running_loop().add_reader(pidfd, self._on_exit, name)
+
+    def _on_exit(self, name):
+        pidfd = self._pidfds.pop(name, None)
+        if pidfd is not None:
+            asyncio.get_running_loop().remove_reader(pidfd)
+            os.close(pidfd)
+        pid = self.pids.pop(name, None)
+        process = self._children.pop(pid, None)
+        if process is not None:
+            process.poll()
+
+        found = scan_processes([name])
+        if name in found:
+            self._watch(name, found[name])
+            return
+
+        if time.monotonic() - self._started.pop(name, 0) > self.stable_after:
+            self._failures[name] = 0
+        self._schedule_restart(name)
+
+    def _schedule_restart(self, name):
+        delay = min(self.backoff * 2 ** self._failures.get(name, 0), self.max_backoff)
+        self._failures[name] = self._failures.get(name, 0) + 1
+        print(f"{name} 已退出，{delay:g} 秒后重启。")
+        self._pending[name] = asyncio.get_running_loop().call_later(delay, self._restart, name)
+
+    def _restart(self, name):
+        self._pending.pop(name, None)
+        if name in self.pids or name not in self.daemons:
+            return
+        self.restarts[name] += 1
+        self._spawn(name)
+
+    def status(self) -> str:
+        lines = []
+        for name in self.daemons:
+            pid = self.pids.get(name)
+            state = f"pid {pid}" if pid else "未运行"
+            lines.append(f"{name}: {state}，重启 {self.restarts[name]} 次")
+        return "\n".join(lines)
+
+
+class AutostartStep(NamedTuple):
+    name: str
+    func: Callable
+    after: tuple = ()
+
+
+async def run_autostart(steps):
+    """
+    # 并发执行启动步骤：互不依赖的步骤同时开始，after 中列出的步骤完成后才会执行。
+    # 依赖必须在列表中先声明。全部完成后打印每一步的开始时间和耗时。
+    """
+    origin = time.monotonic()
+    tasks = {}
+    timeline = []
+
+    async def run_step(step):
+        if step.after:
+            await asyncio.gather(*(tasks[name] for name in step.after))
+        started = time.monotonic()
+        try:
+            result = step.func()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as error:
+            print(f"启动步骤 {step.name} 失败: {error}")
+        timeline.append((step.name, started - origin, time.monotonic() - started))
+
+    for step in steps:
+        tasks[step.name] = asyncio.ensure_future(run_step(step))
+    await asyncio.gather(*tasks.values())
+
+    print(f"autostart 完成，总耗时 {(time.monotonic() - origin) * 1000:.1f}ms:")
+    for name, offset, elapsed in sorted(timeline, key=lambda entry: entry[1]):
+        print(f"  {name:<12} +{offset * 1000:7.1f}ms  {elapsed * 1000:7.1f}ms")
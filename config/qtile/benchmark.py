@@ -0,0 +1,573 @@
+"""
+# config.py 的无界面基准测试与回归检查。
+# 用一个假的 libqtile 导入 config.py，构造上百到上千个窗口、9 个组、多列的会话，
+# 反复调用按键处理函数，统计每次调用的耗时、内存块分配和重新布局次数。
+# 每个场景按几种窗口数各跑一遍，基线里保存整条随窗口数变化的曲线。
+# 与基线比较的有与机器无关的计数（每次调用的重新布局次数和净增内存块），
+# 以及 p95 耗时与同一进程里校准循环耗时之比（多轮取最小，超出 --tolerance
+# 时复测一次仍超出才算回归），任何一项超出时以非零状态退出。
+#
+# 用法：
+#   python benchmark.py                    # 运行并与基线比较
+#   python benchmark.py --update-baseline  # 运行并把结果写成新的基线
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+here = os.path.dirname(os.path.abspath(__file__))
+default_baseline = os.path.join(here, "benchmark_baseline.json")
+
+
+class _Stub:
+    """
+    # 什么都接受的占位对象：config.py 导入时构造的组件、按键、lazy 调用等都用它。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+    def __getitem__(self, key):
+        return _Stub()
+
+    def __iter__(self):
+        return iter(())
+
+    def when(self, *args, **kwargs):
+        return self
+
+
+class _StubMeta(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+
+class _StubModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = _StubMeta(name, (_Stub,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+class Hooks:
+    """
+    # 记录 config.py 订阅的 hook，由会话在相应时机触发。
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+
+    def __getattr__(self, name):
+        def subscribe(func):
+            self.subscribers.setdefault(name, []).append(func)
+            return func
+
+        return subscribe
+
+    def fire(self, name, *args):
+        for func in self.subscribers.get(name, ()):
+            func(*args)
+
+
+class Match:
+    def __init__(self, **rules):
+        self._rules = {key: value for key, value in rules.items() if value is not None}
+
+    def compare(self, win):
+        for prop, expected in self._rules.items():
+            if prop == "title":
+                values = [win.name]
+            elif prop == "wm_type":
+                values = [win.get_wm_type()]
+            elif prop == "wm_class":
+                values = win.get_wm_class() or []
+            else:
+                return False
+            if not any(
+                expected.match(value) if hasattr(expected, "match") else value == expected
+                for value in values
+                if value is not None
+            ):
+                return False
+        return bool(self._rules)
+
+    def __repr__(self):
+        return f"Match({self._rules})"
+
+
+class FakeColumn:
+    def __init__(self):
+        self.width = 100
+        self.clients = []
+        self.current_index = 0
+
+    def __len__(self):
+        return len(self.clients)
+
+
+class Columns:
+    """
+    # 只实现 config.py 用到的部分 Columns 接口。
+    """
+
+    name = "columns"
+
+    def __init__(self, **config):
+        self.grow_amount = config.get("grow_amount", 10)
+        self.columns = [FakeColumn()]
+        self.current = 0
+        self.group = None
+
+    @property
+    def cc(self):
+        return self.columns[self.current]
+
+    def add_client(self, win, max_columns):
+        if len(self.columns) < max_columns and self.cc.clients:
+            self.columns.append(FakeColumn())
+            self.current = len(self.columns) - 1
+        self.cc.clients.append(win)
+        self.cc.current_index = len(self.cc.clients) - 1
+
+    def remove_client(self, win):
+        for column in self.columns:
+            if win in column.clients:
+                column.clients.remove(win)
+                column.current_index = min(column.current_index, max(len(column) - 1, 0))
+
+    def _swap(self, column, a, b):
+        column.clients[a], column.clients[b] = column.clients[b], column.clients[a]
+        column.current_index = b
+        self.group.layout_all()
+
+    def shuffle_down(self):
+        self._swap(self.cc, self.cc.current_index, self.cc.current_index + 1)
+
+    def shuffle_up(self):
+        self._swap(self.cc, self.cc.current_index, self.cc.current_index - 1)
+
+    def _swap_column(self, offset):
+        target = (self.current + offset) % len(self.columns)
+        self.columns[self.current], self.columns[target] = self.columns[target], self.columns[self.current]
+        self.current = target
+        self.group.layout_all()
+
+    def swap_column_right(self):
+        self._swap_column(1)
+
+    def swap_column_left(self):
+        self._swap_column(-1)
+
+
+class MonadTall(_Stub):
+    name = "monadtall"
+
+
+class Max(_Stub):
+    name = "max"
+
+
+class Floating:
+    default_float_rules = [
+        Match(wm_type=name) for name in ("utility", "notification", "toolbar", "splash", "dialog")
+    ] + [
+        Match(wm_class=name)
+        for name in ("file_progress", "confirm", "dialog", "download", "error", "notification", "splash", "toolbar")
+    ]
+
+    def __init__(self, float_rules=None, **config):
+        self.float_rules = float_rules if float_rules is not None else self.default_float_rules
+
+
+def install_fake_libqtile(hooks):
+    names = [
+        "libqtile", "libqtile.bar", "libqtile.config", "libqtile.extension", "libqtile.hook",
+        "libqtile.layout", "libqtile.lazy", "libqtile.utils", "libqtile.widget", "libqtile.widget.base",
+        "libqtile.backend", "libqtile.backend.base", "libqtile.backend.base.drawer", "libqtile.popup",
+        "cairocffi",
+    ]
+    for name in names:
+        module = _StubModule(name)
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+    sys.modules["libqtile"].qtile = None
+    sys.modules["libqtile.hook"].subscribe = hooks
+    sys.modules["libqtile.lazy"].lazy = _Stub()
+    sys.modules["libqtile.config"].Match = Match
+    layout_module = sys.modules["libqtile.layout"]
+    layout_module.Columns, layout_module.MonadTall, layout_module.Max = Columns, MonadTall, Max
+    layout_module.Floating = Floating
+    utils = sys.modules["libqtile.utils"]
+    utils.guess_terminal = lambda *args: "xterm"
+    utils.create_task = lambda coro: coro.close()
+    utils.send_notification = lambda *args, **kwargs: None
+
+
+def load_config():
+    hooks = Hooks()
+    install_fake_libqtile(hooks)
+    spec = importlib.util.spec_from_file_location("config", os.path.join(here, "config.py"))
+    config = importlib.util.module_from_spec(spec)
+    # 与 qtile 导入配置时一样登记模块，code_fingerprint 据此识别本目录的类
+    sys.modules["config"] = config
+    started = time.perf_counter()
+    spec.loader.exec_module(config)
+    return config, hooks, time.perf_counter() - started
+
+
+class FakeWindow:
+    def __init__(self, wid, wm_class):
+        self.wid = wid
+        self.name = f"{wm_class} {wid}"
+        self.wm_class = [wm_class, wm_class.capitalize()]
+        self.group = None
+        self.fullscreen = False
+        self.floating = False
+
+    def get_wm_class(self):
+        return self.wm_class
+
+    def get_wm_type(self):
+        return "normal"
+
+    def togroup(self, name):
+        self.group = self.qtile.groups_map[name]
+
+
+class FakeGroup:
+    def __init__(self, qtile, name):
+        self.qtile = qtile
+        self.name = name
+        self.windows = []
+        self.layout = Columns()
+        self.layout.group = self
+        self.screen = None
+        self.current_window = None
+        self.relayouts = 0
+
+    def add(self, win, max_columns):
+        self.qtile.hooks.fire("group_window_add", self, win)
+        self.windows.append(win)
+        win.group = self
+        self.layout.add_client(win, max_columns)
+        self.current_window = win
+
+    def focus(self, win, warp=True):
+        self.current_window = win
+        self.qtile.hooks.fire("client_focus", win)
+
+    def layout_all(self):
+        # 模拟给每个窗口算一次几何位置
+        self.relayouts += 1
+        x = 0
+        for column in self.layout.columns:
+            for _ in column.clients:
+                x += column.width
+
+
+class FakeScreen:
+    def __init__(self, qtile):
+        self.qtile = qtile
+        self.group = None
+        self.top = None
+
+    def set_group(self, group):
+        if self.group is not None:
+            self.group.screen = None
+        self.group = group
+        group.screen = self
+        self.qtile.hooks.fire("setgroup")
+
+
+class FakeQtile:
+    """
+    # 合成的会话：窗口按轮转分到 9 个组（另有一个空的 scratchpad 组），每组最多
+    # max_columns 列。call_later/call_soon 只排队，由 run_pending 模拟一帧。
+    """
+
+    def __init__(self, hooks):
+        self.hooks = hooks
+        self.core = None
+        self.groups = [FakeGroup(self, str(i)) for i in range(1, 10)]
+        self.groups.append(FakeGroup(self, "scratchpad"))
+        self.groups_map = {group.name: group for group in self.groups}
+        self.windows_map = {}
+        self.current_screen = FakeScreen(self)
+        self.screens = [self.current_screen]
+        self.pending = []
+
+    def populate(self, windows, max_columns):
+        hooks = self.hooks
+        self.current_screen.set_group(self.groups[0])
+        classes = ("alacritty", "brave-browser", "cursor", "thunar", "mpv")
+        for wid in range(windows):
+            win = FakeWindow(wid, classes[wid % len(classes)])
+            win.qtile = self
+            hooks.fire("client_new", win)
+            group = win.group or self.groups[wid % 9]
+            self.windows_map[wid] = win
+            group.add(win, max_columns)
+            hooks.fire("client_focus", win)
+
+    @property
+    def current_group(self):
+        return self.current_screen.group
+
+    @property
+    def current_layout(self):
+        return self.current_group.layout
+
+    @property
+    def current_window(self):
+        return self.current_group.current_window
+
+    def call_later(self, delay, func, *args):
+        self.pending.append((func, args))
+        return _Stub()
+
+    def call_soon(self, func, *args):
+        return self.call_later(0, func, *args)
+
+    def run_pending(self):
+        while self.pending:
+            func, args = self.pending.pop(0)
+            func(*args)
+
+    def relayouts(self):
+        return sum(group.relayouts for group in self.groups)
+
+
+def scenarios(config):
+    def cycle(qtile, i):
+        config.switch_group_cycle(qtile, 1 if i % 4 else -1)
+
+    def resize(qtile, i):
+        # 每轮 8 次变宽、8 次变窄，加速后一轮的总步长是 110；每轮开始时把列宽
+        # 恢复成 200，邻列不会被挤到 min_width，每次调用都是真正的调整
+        if i % 16 == 0:
+            for column in qtile.current_layout.columns:
+                column.width = 200
+        (config.columns_grow_current if i % 16 < 8 else config.columns_shrink_current)(qtile)
+        qtile.run_pending()
+
+    def swap(qtile, i):
+        config.swap_window_with_next(qtile)
+
+    return {
+        "switch_group_cycle": cycle,
+        "columns_resize": resize,
+        "swap_window_with_next": swap,
+    }
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def time_calls(qtile, func, repeat):
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter_ns()
+        func(qtile, i)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    samples.sort()
+    return samples
+
+
+def calibrate(rounds: int = 5, repeat: int = 100) -> float:
+    """
+    # 计时一段固定的纯 Python 负载（字典读写和排序），返回每次耗时（微秒），
+    # 与场景的 p95 一样取各轮中最小的。场景的 p95 除以它，得到与机器快慢基本无关的相对耗时。
+    """
+    values = list(range(200))
+
+    def workload(qtile, i):
+        table = {}
+        for value in values:
+            table[value % 31] = table.get(value % 31, 0) + value
+        sorted(table.values())
+
+    gc.disable()
+    try:
+        return min(percentile(time_calls(None, workload, repeat), 50) for _ in range(rounds))
+    finally:
+        gc.enable()
+
+
+def measure(config, hooks, func, args, windows):
+    qtile = FakeQtile(hooks)
+    # hook 回调使用 config 模块里的全局 qtile
+    config.qtile = qtile
+    # 不读写真实的会话快照
+    config.session_store.path = None
+    qtile.populate(windows, args.columns)
+    config.group_index.rebuild(qtile)
+
+    for i in range(args.warmup):
+        func(qtile, i)
+
+    gc.collect()
+    gc.disable()
+    relayouts = qtile.relayouts()
+    try:
+        samples = time_calls(qtile, func, args.repeat)
+        relayouts = (qtile.relayouts() - relayouts) / args.repeat
+        # 像 timeit 一样多跑几轮取最小的 p95，调度器偶尔的抢占只会让某一轮变慢
+        p95 = min(
+            [percentile(samples, 95)]
+            + [percentile(time_calls(qtile, func, args.repeat), 95) for _ in range(args.rounds - 1)]
+        )
+
+        # 净增内存块数：持续增长说明有东西在泄漏
+        blocks = sys.getallocatedblocks()
+        for i in range(args.repeat):
+            func(qtile, i)
+        blocks = (sys.getallocatedblocks() - blocks) / args.repeat
+
+        tracemalloc.start()
+        for i in range(args.repeat):
+            func(qtile, i)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+
+    return {
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": percentile(samples, 50),
+        "p95_us": p95,
+        "max_us": samples[-1],
+        "blocks_per_call": blocks,
+        "peak_kib": peak / 1024,
+        "relayouts_per_call": relayouts,
+    }
+
+
+def measure_relative(config, hooks, func, args, windows):
+    result = measure(config, hooks, func, args, windows)
+    # 紧挨着每个场景校准，负载或 CPU 频率的变化对两边的影响相同
+    result["p95_rel"] = result["p95_us"] / calibrate()
+    return result
+
+
+baseline_keys = ("blocks_per_call", "relayouts_per_call", "p95_rel")
+
+
+def too_slow(result, base, tolerance):
+    return "p95_rel" in base and result["p95_rel"] > base["p95_rel"] * (1 + tolerance)
+
+
+def compare(results, baseline, tolerance: float = 1.0):
+    """
+    # results/baseline 都是 {场景: {窗口数: 结果}}，基线里的窗口数是字符串。
+    # 计数超出基线即为回归；相对 p95 超出基线的 (1 + tolerance) 倍才算。
+    """
+    failures = []
+    for name, curve in results.items():
+        for windows, result in curve.items():
+            base = baseline.get(name, {}).get(str(windows))
+            if base is None:
+                continue
+            label = f"{name}@{windows}"
+            if result["blocks_per_call"] > base["blocks_per_call"] + 1:
+                failures.append(
+                    f"{label}: 每次调用净增 {result['blocks_per_call']:.2f} 个内存块（基线 {base['blocks_per_call']:.2f}）"
+                )
+            if result["relayouts_per_call"] > base["relayouts_per_call"] + 0.01:
+                failures.append(
+                    f"{label}: 每次调用重新布局 {result['relayouts_per_call']:.2f} 次"
+                    f"（基线 {base['relayouts_per_call']:.2f}）"
+                )
+            if too_slow(result, base, tolerance):
+                failures.append(
+                    f"{label}: p95 为校准循环的 {result['p95_rel']:.2f} 倍"
+                    f"（基线 {base['p95_rel']:.2f}，容差 {tolerance:.0%}）"
+                )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="config.py 按键处理函数的基准测试")
+    parser.add_argument(
+        "--windows", type=int, nargs="+", default=[100, 400, 1600], help="合成会话中的窗口数，每个都跑一遍"
+    )
+    parser.add_argument("--columns", type=int, default=12, help="每个组最多的列数")
+    parser.add_argument("--repeat", type=int, default=2000, help="每个场景的计时调用次数")
+    parser.add_argument("--rounds", type=int, default=5, help="计时轮数，p95 取各轮中最小的")
+    parser.add_argument("--warmup", type=int, default=200)
+    # 微秒级的 p95 在两次运行之间能差出五成以上，默认只把超过基线两倍的算作回归
+    parser.add_argument("--tolerance", type=float, default=1.0, help="相对 p95 允许超出基线的比例")
+    parser.add_argument("--baseline", default=default_baseline)
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写成基线")
+    args = parser.parse_args(argv)
+
+    config, hooks, import_time = load_config()
+    print(f"导入 config.py：{import_time * 1000:.1f} ms")
+    print(
+        f"{'场景':<24}{'窗口':>6}{'平均':>9}{'p50':>9}{'p95':>9}{'最大':>9}{'p95/校准':>10}"
+        f"{'净增块':>8}{'峰值KiB':>9}{'布局/次':>8}"
+    )
+    funcs = scenarios(config)
+    results = {}
+    for name, func in funcs.items():
+        for windows in args.windows:
+            result = results.setdefault(name, {})[windows] = measure_relative(config, hooks, func, args, windows)
+            print(
+                f"{name:<24}{windows:>6}{result['mean_us']:>9.1f}{result['p50_us']:>9.1f}{result['p95_us']:>9.1f}"
+                f"{result['max_us']:>9.1f}{result['p95_rel']:>10.2f}{result['blocks_per_call']:>8.2f}"
+                f"{result['peak_kib']:>9.1f}{result['relayouts_per_call']:>8.2f}"
+            )
+    print("（耗时单位为微秒；与基线比较的是 p95/校准，即 p95 与校准循环耗时之比）")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            rounded = {
+                name: {str(windows): {key: round(result[key], 3) for key in baseline_keys} for windows, result in curve.items()}
+                for name, curve in results.items()
+            }
+            json.dump(rounded, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"基线已写入 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("没有基线文件，跳过比较（用 --update-baseline 生成）")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    # 超出容差的先复测一次、取较小的值，偶发的调度抢占不算回归
+    for name, curve in results.items():
+        for windows, result in curve.items():
+            base = baseline.get(name, {}).get(str(windows))
+            if base is not None and too_slow(result, base, args.tolerance):
+                retry = measure_relative(config, hooks, funcs[name], args, windows)
+                result["p95_rel"] = min(result["p95_rel"], retry["p95_rel"])
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"回归：{failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,35 @@
 from libqtile import bar, extension, hook, layout, qtile, widget # pyright: ignore[reportMissingImports]
-from libqtile.config import Click, Drag, Group, Key, KeyChord, Match, Screen # pyright: ignore[reportMissingImports]
-from libqtile.lazy import lazy # pyright: ignore[reportMissingImports]
-from libqtile.utils import guess_terminal # pyright: ignore[reportMissingImports]
+from libqtile.config import Click, Drag, DropDown, Group, Key, KeyChord, Match, ScratchPad, Screen # pyright: ignore[reportMissingImports]
+from libqtile.lazy import LazyCall, lazy # pyright: ignore[reportMissingImports]
+from libqtile.utils import create_task, guess_terminal, send_notification # pyright: ignore[reportMissingImports]
+from libqtile.backend.base.drawer import TextLayout # pyright: ignore[reportMissingImports]
+from libqtile.popup import Popup # pyright: ignore[reportMissingImports]
+from libqtile.widget import base # pyright: ignore[reportMissingImports]
+# 同目录的模块由 qtile 在重新加载配置时按导入顺序 reload，metrics 要先于依赖它的模块导入
+from metrics import LatencyHistogram, MetricHistory, PollPolicy, TimerWheel
+from sysinfo import ProcCollector, ProcessTable
+from gpu import GpuMonitor, GpuSampler
+from volume import VolumeSource
+from autostart import AutostartStep, Daemon, Supervisor, run_autostart
+from rules import RuleIndex
+from screenshot import Screenshotter
+from session import SessionStore
+from tiling import ColumnResizer, GroupIndex
+from wallpaper import WallpaperCache
+from collections import OrderedDict
+import asyncio
+import cairocffi
+import html
+import math
 import os
+import re
 import subprocess
 import shutil
+import sys
+import time
+import types
+
+config_import_started = time.perf_counter()
 
 
 mod = "mod4"
@@ -12,66 +37,198 @@ terminal = guess_terminal()
 
 myTerm = "alacritty"  # My terminal of choice
 
+# 内部状态报告：名称 -> (Mod+s 之后的按键, 返回文本的函数)
+status_reports = {}
+
+
+def status_text(name: str) -> str:
+    """
+    # 返回某项内部状态的文本，也可在命令行查询：
+    # qtile cmd-obj -o root -f eval -a "self.config.status_text('supervisor')"
+    """
+    _, report = status_reports[name]
+    return report()
+
+
+def show_status(qtile, name: str):
+    """
+    # 以通知形式显示内部状态。
+    """
+    send_notification(f"Qtile: {name}", status_text(name))
+
+
+def normalize(value):
+    """
+    # 把对象转换成可比较的形式：函数取代码指纹（字节码、名字、常量，不含行号），
+    # 只改动文件其他位置时结果不变；容器逐项转换；其余对象只保留类型名。
+    """
+    if isinstance(value, (staticmethod, classmethod)):
+        value = value.__func__
+    if isinstance(value, types.FunctionType):
+        return ("function", normalize(value.__code__), normalize(value.__defaults__))
+    if isinstance(value, types.CodeType):
+        return (value.co_code, value.co_names, tuple(normalize(c) for c in value.co_consts))
+    if isinstance(value, property):
+        return ("property", normalize(value.fget), normalize(value.fset))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, normalize(item)) for key, item in value.items())
+    if value is None or isinstance(value, (bool, int, float, str, bytes, frozenset)):
+        return value
+    return type(value).__qualname__
+
+
+config_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def local_class(klass) -> bool:
+    """
+    # 类是否定义在本文件或同目录的模块中（这些模块随配置一起重新加载）。
+    """
+    module = sys.modules.get(klass.__module__)
+    path = getattr(module, "__file__", None)
+    return path is not None and os.path.dirname(os.path.abspath(path)) == config_dir
+
+
+def code_fingerprint(cls) -> tuple:
+    """
+    # 类的代码指纹：本文件和同目录模块中定义的各层基类的方法和类属性。
+    """
+    return tuple(
+        (klass.__qualname__, tuple(
+            (name, normalize(value))
+            for name, value in sorted(vars(klass).items())
+            if name == "__init__" or not name.startswith("__")
+        ))
+        if local_class(klass) else klass.__qualname__
+        for klass in cls.__mro__
+    )
+
+
+def same_config_value(a, b) -> bool:
+    """
+    # 比较两次加载配置得到的参数值：函数比较代码指纹，lazy 调用比较调用内容，
+    # 其余按相等或同一对象比较。
+    """
+    if isinstance(a, (list, tuple)) and type(a) is type(b):
+        return len(a) == len(b) and all(same_config_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_config_value(a[k], b[k]) for k in a)
+    if isinstance(a, types.FunctionType) and isinstance(b, types.FunctionType):
+        return normalize(a) == normalize(b)
+    if isinstance(a, types.MethodType) and isinstance(b, types.MethodType):
+        return a.__self__ is b.__self__ and normalize(a.__func__) == normalize(b.__func__)
+    if isinstance(a, LazyCall) and isinstance(b, LazyCall):
+        return same_config_value(
+            (a.selectors, a.name, a.args, a.kwargs), (b.selectors, b.name, b.args, b.kwargs)
+        )
+    if isinstance(a, type) and isinstance(b, type):
+        return code_fingerprint(a) == code_fingerprint(b)
+    try:
+        return a is b or bool(a == b)
+    except Exception:
+        return False
+
+
+if "reusable" not in globals():
+    # 名称 -> (类的代码指纹, 参数, 对象)，跨重新加载配置保留
+    reusable = {}
+reused_rebuilt = []
+
+
+def reuse(name: str, factory, *args, **kwargs):
+    """
+    # 创建模块级的共享对象（采样源、定时器等）。重新加载配置时如果类的代码和
+    # 参数都没变就沿用旧对象，保留状态且不重启采样；否则停掉旧对象再新建。
+    """
+    fingerprint = code_fingerprint(factory)
+    entry = reusable.get(name)
+    if entry is not None:
+        old_fingerprint, old_args, old = entry
+        if old_fingerprint == fingerprint and same_config_value(old_args, (args, kwargs)):
+            return old
+        stop = getattr(old, "stop", None)
+        if callable(stop):
+            stop()
+        reused_rebuilt.append(name)
+    obj = factory(*args, **kwargs)
+    reusable[name] = (fingerprint, (args, kwargs), obj)
+    return obj
+
+
+# 重新加载配置时由 reuse 沿用同一个定时器；组件的任务放在各自的 _futures 里，
+# 随旧组件 finalize 一起取消
+timer_wheel = reuse("timer_wheel", TimerWheel)
+status_reports["timers"] = ("t", timer_wheel.status)
+
+column_resizer = reuse("column_resizer", ColumnResizer, lambda: session_store.changed())
+status_reports["resize"] = ("c", column_resizer.status)
+
 
 def columns_grow_current(qtile):
     """
-    # 将当前列宽度增加10像素。
+    # 将当前列变宽，按住时逐渐加速。
     """
-    layout = qtile.current_layout
-    if getattr(layout, "name", "") != "columns":
-        return
-    if len(layout.columns) < 2:
-        return
-    amount = getattr(layout, "grow_amount", 10)
-    left = layout.columns[0]
-    right = layout.columns[1]
-    if right.width <= amount:
-        return
-    left.width += amount
-    right.width -= amount
-    layout.group.layout_all()
+    column_resizer.request(qtile, 1)
 
 
 def columns_shrink_current(qtile):
     """
-    # 将当前列宽度减少10像素。
+    # 将当前列变窄，按住时逐渐加速。
     """
-    layout = qtile.current_layout
-    if getattr(layout, "name", "") != "columns":
-        return
-    if len(layout.columns) < 2:
-        return
-    amount = getattr(layout, "grow_amount", 10)
-    left = layout.columns[0]
-    right = layout.columns[1]
-    if left.width <= amount:
-        return
-    left.width -= amount
-    right.width += amount
-    layout.group.layout_all()
+    column_resizer.request(qtile, -1)
+
+
+# 重新加载配置时保留 MRU 顺序；代码变化而重建时，成员表在 startup hook 中重建
+group_index = reuse("group_index", GroupIndex)
 
 
 def switch_group_cycle(qtile, direction: int):
     """
     # 在不同组之间循环切换。
     """
-    groups = [
-        group
-        for group in qtile.groups
-        if group.name != "scratchpad" and group.windows
-    ]
-    if not groups:
+    next_group = group_index.cycle(qtile.current_group, direction)
+    if next_group is None:
         return
 
-    current_group = qtile.current_group
+    qtile.current_screen.set_group(next_group)
 
-    if current_group in groups:
-        index = groups.index(current_group)
-        next_group = groups[(index + direction) % len(groups)]
-    else:
-        next_group = groups[0 if direction > 0 else -1]
 
-    qtile.current_screen.set_group(next_group)
+def switch_group_recent(qtile):
+    """
+    # 切换到最近使用过的其他有窗口的组，连续按则继续往前。
+    """
+    current = qtile.current_group
+    names = [
+        name
+        for name in group_index.recent_groups
+        if group_index.members.get(name) and name != current.name
+    ]
+    name = group_index.recent("group", names)
+    if name is not None:
+        qtile.current_screen.set_group(qtile.groups_map[name])
+
+
+def focus_window_recent(qtile):
+    """
+    # 跨组切换到最近使用过的其他窗口，连续按则继续往前。
+    """
+    current = qtile.current_window
+    wids = [
+        wid
+        for wid in group_index.recent_windows
+        if wid in qtile.windows_map
+        and group_index.tracked(getattr(qtile.windows_map[wid], "group", None))
+        and (current is None or wid != current.wid)
+    ]
+    wid = group_index.recent("window", wids)
+    win = qtile.windows_map.get(wid) if wid is not None else None
+    if win is None or win.group is None:
+        return
+    if win.group.screen is None:
+        qtile.current_screen.set_group(win.group)
+    win.group.focus(win)
 
 
 def switch_group_next(qtile):
@@ -88,47 +245,322 @@ def switch_group_prev(qtile):
     switch_group_cycle(qtile, direction=-1)
 
 
+def columns_swap_next(qtile, layout):
+    column = layout.cc
+    if len(column) > 1 and column.current_index + 1 < len(column):
+        layout.shuffle_down()
+    elif len(layout.columns) > 1:
+        layout.swap_column_right()
+    elif column.current_index > 0:
+        layout.shuffle_up()
+    else:
+        return False
+    return True
+
+
+def columns_swap_prev(qtile, layout):
+    column = layout.cc
+    if column.current_index > 0:
+        layout.shuffle_up()
+    elif len(layout.columns) > 1:
+        layout.swap_column_left()
+    elif len(column) > 1:
+        layout.shuffle_down()
+    else:
+        return False
+    return True
+
+
+def call_method(name: str):
+    """
+    # 把布局方法包装成操作：layout.<name>()，视为已处理。
+    """
+    def run(qtile, layout):
+        getattr(layout, name)()
+        return True
+
+    return run
+
+
+def no_op(qtile, layout):
+    return False
+
+
+class LayoutOps:
+    """
+    # 每种布局的窗口操作分派表：操作名 -> 直接调用的函数。
+    # 已知布局显式列出每个操作（不支持的就是 no_op），其他布局按类第一次
+    # 使用时根据方法名解析一次并缓存，按键时不再比较名字或逐个 getattr。
+    """
+
+    operations = ("swap_next", "swap_prev", "grow", "shrink", "promote")
+    # 调整尺寸作用于列或主区域本身，没有焦点窗口（如空列）时也要生效
+    resize_operations = frozenset(("grow", "shrink"))
+
+    # 未列出的布局按顺序找第一个存在的方法
+    fallbacks = {
+        "swap_next": ("shuffle_down", "swap_right", "swap_main"),
+        "swap_prev": ("shuffle_up", "swap_left"),
+        "grow": ("grow", "grow_main", "increase_ratio"),
+        "shrink": ("shrink", "shrink_main", "decrease_ratio"),
+        "promote": ("swap_main", "promote"),
+    }
+
+    def __init__(self):
+        self.table = {
+            layout.Columns: {
+                "swap_next": columns_swap_next,
+                "swap_prev": columns_swap_prev,
+                # 列宽调整按帧合并，不需要重新聚焦
+                "grow": lambda qtile, _: columns_grow_current(qtile),
+                "shrink": lambda qtile, _: columns_shrink_current(qtile),
+                "promote": no_op,
+            },
+            layout.MonadTall: {
+                # 沿用原来的行为：Mod+grave 在 MonadTall 中与主窗口对调
+                "swap_next": call_method("swap_main"),
+                "swap_prev": call_method("shuffle_up"),
+                "grow": call_method("grow"),
+                "shrink": call_method("shrink"),
+                "promote": call_method("swap_main"),
+            },
+            layout.Max: {name: no_op for name in self.operations},
+        }
+
+    def resolve(self, layout_):
+        cls = type(layout_)
+        ops = self.table.get(cls)
+        if ops is None:
+            ops = self.table[cls] = {
+                name: next(
+                    (call_method(method) for method in methods if callable(getattr(cls, method, None))),
+                    no_op,
+                )
+                for name, methods in self.fallbacks.items()
+            }
+        return ops
+
+    def run(self, qtile, name: str):
+        group = qtile.current_group
+        layout_ = qtile.current_layout
+        current = group.current_window if group else None
+        if not group or not layout_ or (current is None and name not in self.resize_operations):
+            return
+        if self.resolve(layout_)[name](qtile, layout_):
+            if current is not None:
+                group.focus(current, warp=False)
+            session_store.changed()
+
+
+layout_ops = LayoutOps()
+
+
 def swap_window_with_next(qtile):
     """
     # 与下一个窗口对调位置。
     """
-    group = qtile.current_group
-    layout = qtile.current_layout
-    current = group.current_window if group else None
-    if not group or not layout or not current:
-        return
+    layout_ops.run(qtile, "swap_next")
 
-    handled = False
-    layout_name = getattr(layout, "name", "")
-
-    if layout_name == "columns":
-        column = getattr(layout, "cc", None)
-        if column and len(column) > 1 and column.current_index + 1 < len(column):
-            layout.shuffle_down()
-            handled = True
-        elif getattr(layout, "columns", None) and len(layout.columns) > 1:
-            layout.swap_column_right()
-            handled = True
-        elif column and column.current_index > 0:
-            layout.shuffle_up()
-            handled = True
-    elif layout_name == "monadtall":
-        if hasattr(layout, "swap_main"):
-            layout.swap_main()
-            handled = True
-        elif hasattr(layout, "shuffle_down"):
-            layout.shuffle_down()
-            handled = True
-    else:
-        for command in ("shuffle_down", "swap_right", "swap_main"):
-            method = getattr(layout, command, None)
-            if callable(method):
-                method()
-                handled = True
-                break
 
-    if handled:
-        group.focus(current, warp=False)
+def swap_window_with_prev(qtile):
+    """
+    # 与上一个窗口对调位置。
+    """
+    layout_ops.run(qtile, "swap_prev")
+
+
+def promote_window(qtile):
+    """
+    # 把焦点窗口提升为主窗口（布局支持时）。
+    """
+    layout_ops.run(qtile, "promote")
+
+
+# 下拉窗口：(名称, 命令, DropDown 参数)。用 --class 给终端单独的 wm_class，
+# 不依赖 net_wm_pid 认出窗口
+dropdown_definitions = [
+    (
+        "btop",
+        f"{myTerm} --class dropdown-btop -e btop",
+        {"match": Match(wm_class="dropdown-btop"), "x": 0.1, "y": 0.1, "width": 0.8, "height": 0.8},
+    ),
+    (
+        "term",
+        f"{myTerm} --class dropdown-term",
+        {"match": Match(wm_class="dropdown-term"), "x": 0.1, "y": 0.0, "width": 0.8, "height": 0.5},
+    ),
+    (
+        "mixer",
+        "pavucontrol",
+        {
+            "match": Match(wm_class=re.compile(r"(?i).*pavucontrol")),
+            "x": 0.58,
+            "y": 0.02,
+            "width": 0.4,
+            "height": 0.5,
+        },
+    ),
+]
+
+
+class DropDownWarmer:
+    """
+    # 让 ScratchPad 的下拉窗口常驻：启动后在后台预先启动并隐藏，按键或点击
+    # 状态栏时只切换显示，不再每次 fork 新进程。下拉窗口被关闭后不立即重启，
+    # 过 respawn_delay 秒再在后台补上；在此之前切换则由 ScratchPad 按需启动。
+    # 只用 ScratchPad 的公开接口：dropdown_toggle 启动窗口，窗口出现时
+    # （window_new，按 dropdown_definitions 的 match 认出）再决定是否隐藏。
+    """
+
+    warm_delay = 5.0  # 启动后稍等再预热，不和自启动程序抢资源
+    respawn_delay = 30.0
+
+    def __init__(self, group_name: str):
+        self.group_name = group_name
+        self.warmed = 0
+        self.toggles = 0
+        self.cold_toggles = 0
+        self.pending = {}  # 已启动、窗口还没出现的下拉窗口 -> 出现后是否隐藏
+        self._handles = {}
+
+    def scratchpad(self, qtile):
+        pad = qtile.groups_map.get(self.group_name)
+        return pad if hasattr(pad, "dropdown_toggle") else None
+
+    @staticmethod
+    def match(win):
+        """
+        # 返回 win 对应的下拉窗口名称，不是下拉窗口时返回 None。
+        """
+        for name, _, params in dropdown_definitions:
+            if params["match"].compare(win):
+                return name
+        return None
+
+    def schedule(self, qtile, name=None, delay=None):
+        """
+        # delay 秒后在后台启动缺少的下拉窗口（name 为 None 时处理全部）。
+        """
+        key = name or "*"
+        if key in self._handles:
+            return
+        self._handles[key] = qtile.call_later(
+            self.warm_delay if delay is None else delay, self._fire, qtile, key, name
+        )
+
+    def _fire(self, qtile, key, name):
+        self._handles.pop(key, None)
+        self.warm(qtile, name)
+
+    def warm(self, qtile, name=None):
+        pad = self.scratchpad(qtile)
+        if pad is None:
+            return
+        names = [name] if name is not None else [name for name, _, _ in dropdown_definitions]
+        for name in names:
+            if name in pad.dropdowns or name in self.pending:
+                continue
+            # 还没有窗口时 dropdown_toggle 只负责启动，窗口出现后在 window_new 里隐藏
+            self.pending[name] = True
+            pad.dropdown_toggle(name)
+            self.warmed += 1
+
+    def toggle(self, qtile, name: str):
+        """
+        # 切换下拉窗口的显示。
+        """
+        pad = self.scratchpad(qtile)
+        if pad is None:
+            return
+        self.toggles += 1
+        if name in pad.dropdowns:
+            pad.dropdown_toggle(name)
+            return
+        self.cold_toggles += 1
+        if name in self.pending:
+            # 窗口还没出现：预热中的出现后直接显示，再按一次则出现后隐藏
+            self.pending[name] = not self.pending[name]
+            return
+        self.pending[name] = False
+        pad.dropdown_toggle(name)
+
+    def window_new(self, qtile, win):
+        name = self.match(win)
+        if name is None or name not in self.pending:
+            return
+        # 配置的 client_new 先于 ScratchPad 自己的运行，等它建好 DropDownToggler 再隐藏
+        if self.pending.pop(name):
+            qtile.call_soon(self._hide, qtile, name)
+
+    def _hide(self, qtile, name):
+        pad = self.scratchpad(qtile)
+        if pad is not None and name in pad.dropdowns:
+            pad.dropdowns[name].hide()
+
+    def window_killed(self, qtile, win):
+        pad = self.scratchpad(qtile)
+        if pad is None:
+            return
+        for name, dropdown in pad.dropdowns.items():
+            if dropdown.window is win:
+                self.schedule(qtile, name, self.respawn_delay)
+                return
+
+    def stop(self):
+        for handle in self._handles.values():
+            handle.cancel()
+        self._handles.clear()
+
+    def status(self) -> str:
+        lines = [
+            f"预热启动 {self.warmed} 次，切换 {self.toggles} 次（其中 {self.cold_toggles} 次窗口尚未就绪）",
+        ]
+        pad = self.scratchpad(qtile)
+        if pad is not None:
+            for name, _, _ in dropdown_definitions:
+                if name in pad.dropdowns:
+                    state = "显示中" if pad.dropdowns[name].visible else "已隐藏"
+                elif name in self.pending:
+                    state = "启动中"
+                else:
+                    state = "未启动"
+                lines.append(f"  {name}：{state}")
+        return "\n".join(lines)
+
+
+dropdown_warmer = reuse("dropdown_warmer", DropDownWarmer, "scratchpad")
+status_reports["dropdowns"] = ("d", dropdown_warmer.status)
+
+
+screenshotter = reuse("screenshotter", Screenshotter)
+status_reports["screenshot"] = ("a", screenshotter.status)
+
+
+def capture_screenshot(qtile):
+    """
+    # 选择区域截图，复制到剪贴板并存入历史。
+    """
+    screenshotter.capture(qtile, C(colors[5]))
+
+
+session_store = reuse("session_store", SessionStore, timer_wheel, GroupIndex.tracked)
+status_reports["session"] = ("n", session_store.status)
+
+
+def reload_config_incremental(qtile):
+    """
+    # 增量重新加载配置，必要时退回完整重新加载。
+    """
+    session_store.save(force=True)
+    config_reloader.reload(qtile)
+
+
+def reload_config_full(qtile):
+    """
+    # 完整重新加载配置，先写入会话快照，加载后按快照恢复布局。
+    """
+    session_store.save(force=True)
+    qtile.reload_config()
 
 
 keys = [
@@ -138,8 +570,8 @@ keys = [
     Key([mod], "k", lazy.layout.up(), desc="移动焦点到上边"),
     Key([mod], "d", lazy.layout.next(), desc="移动窗口焦点到其他窗口"),
     # 改变窗口大小
-    Key([mod], "period", lazy.function(columns_grow_current), desc="放大当前窗口"),
-    Key([mod], "comma", lazy.function(columns_shrink_current), desc="缩小当前窗口"),
+    Key([mod], "period", lazy.function(layout_ops.run, "grow"), desc="放大当前窗口"),
+    Key([mod], "comma", lazy.function(layout_ops.run, "shrink"), desc="缩小当前窗口"),
     # 移动窗口
     # Move windows between left/right columns or move up/down in current stack.
     # Moving out of range in Columns layout will create new column.
@@ -174,7 +606,11 @@ keys = [
     # 在不同组之间循环切换
     Key([mod], "Tab", lazy.function(switch_group_next), desc="在组之间向前切换"),
     Key([mod, "shift"], "Tab", lazy.function(switch_group_prev), desc="在组之间向后切换"),
+    Key([mod], "Escape", lazy.function(switch_group_recent), desc="切换到最近使用的组"),
+    Key(["mod1"], "Tab", lazy.function(focus_window_recent), desc="切换到最近使用的窗口"),
     Key([mod], "grave", lazy.function(swap_window_with_next), desc="与下一个窗口对调位置"),
+    Key([mod, "shift"], "grave", lazy.function(swap_window_with_prev), desc="与上一个窗口对调位置"),
+    Key([mod], "m", lazy.function(promote_window), desc="提升为主窗口"),
     Key([mod], "q", lazy.window.kill(), desc="关闭焦点窗口"),
     Key(
         [mod],
@@ -184,15 +620,15 @@ keys = [
     ),
     Key([mod], "t", lazy.window.toggle_floating(), desc="焦点窗口切换浮动"),
     Key([mod], "e", lazy.spawn("thunar"), desc="打开文件管理器"),
-    Key([mod, "control"], "r", lazy.reload_config(), desc="重新加载配置"),
+    Key([mod], "F10", lazy.function(dropdown_warmer.toggle, "mixer"), desc="切换下拉音量控制"),
+    Key([mod], "F11", lazy.function(dropdown_warmer.toggle, "btop"), desc="切换下拉 btop"),
+    Key([mod], "F12", lazy.function(dropdown_warmer.toggle, "term"), desc="切换下拉终端"),
+    Key([mod, "control"], "r", lazy.function(reload_config_incremental), desc="重新加载配置"),
+    Key([mod, "control", "shift"], "r", lazy.function(reload_config_full), desc="完整重新加载配置"),
     Key([mod, "control"], "q", lazy.shutdown(), desc="关闭 Qtile"),
     Key([mod], "Space", lazy.spawn("rofi -show drun -show-icons"), desc="启动启动器"),
-    Key(
-        [mod],
-        "a",
-        lazy.spawn('sh -c "maim -s | xclip -selection clipboard -t image/png -i"'),
-        desc="截图",
-    ),
+    Key([mod], "a", lazy.function(capture_screenshot), desc="截图"),
+    Key([mod, "shift"], "a", lazy.function(screenshotter.pick_history), desc="从截图历史复制"),
     Key([mod], "p", lazy.spawn("sh -c 'gpick -p'"), desc="选择颜色并复制到剪贴板"),
 ]
 
@@ -222,6 +658,7 @@ group_definitions = [
     ("9", {}),
 ]
 
+
 groups = [Group(name, **params) for name, params in group_definitions]
 
 for i in groups:
@@ -252,6 +689,14 @@ for i in groups:
         ]
     )
 
+# ScratchPad 不需要数字键，放在按键循环之后
+groups.append(
+    ScratchPad(
+        "scratchpad",
+        [DropDown(name, command, **params) for name, command, params in dropdown_definitions],
+    )
+)
+
 colors = [
     ["#1a1b26", "#1a1b26"],  # bg        (primary.background)
     ["#a9b1d6", "#a9b1d6"],  # fg        (primary.foreground)
@@ -289,7 +734,22 @@ def systray_widget():
     return widget.Spacer(length=0)
 
 
-def start_gnome_keyring():
+def setup_environment():
+    """
+    # 设置输入法环境变量并把 ~/.local/bin 加入 PATH。
+    """
+    # 设置 fcitx5 输入法所需的环境变量
+    os.environ["GTK_IM_MODULE"] = "fcitx"
+    os.environ["QT_IM_MODULE"] = "fcitx"
+    os.environ["XMODIFIERS"] = "@im=fcitx"
+
+    # 添加 ~/.local/bin 到 PATH
+    os.environ["PATH"] = (
+        f"{os.path.expanduser('~')}/.local/bin:{os.environ.get('PATH', '')}"
+    )
+
+
+async def start_gnome_keyring():
     """
     # 启动 gnome-keyring-daemon。
     """
@@ -299,122 +759,807 @@ def start_gnome_keyring():
         return
 
     try:
-        keyring_result = subprocess.run(
-            [keyring_exec, "--daemonize", "--start", "--components=pkcs11,secrets,ssh"],
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=5,
+        process = await asyncio.create_subprocess_exec(
+            keyring_exec,
+            "--daemonize",
+            "--start",
+            "--components=pkcs11,secrets,ssh",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-    except subprocess.TimeoutExpired:
+    except OSError as error:
+        print(f"gnome-keyring-daemon 启动失败: {error}")
+        return
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=5)
+    except asyncio.TimeoutError:
+        process.kill()
         print("gnome-keyring-daemon 启动超时。")
         return
-    except subprocess.CalledProcessError as error:
-        print(f"gnome-keyring-daemon 启动失败: {error}")
+
+    # Qtile 的 SIGCHLD 处理会抢先回收子进程，returncode 不可靠，以输出为准。
+    if process.returncode and not stdout:
+        print(f"gnome-keyring-daemon 启动失败: {stderr.decode(errors='replace').strip()}")
         return
 
-    for line in keyring_result.stdout.splitlines():
+    for line in stdout.decode(errors="replace").splitlines():
         if "=" in line:
             key, value = line.strip().split("=", 1)
             os.environ[key] = value
 
 
-def ensure_picom_running():
+supervised_daemons = [
+    Daemon("picom", ["picom"], config="~/.config/picom/picom.conf"),
+    Daemon("fcitx5", ["fcitx5", "-d"]),
+]
+
+# 重新加载配置时沿用正在运行的监管器，避免重复启动守护进程；configure 会启动
+# 新增的守护进程。监管器的代码变化时 reuse 停掉旧的，由新的接管仍在运行的进程
+supervisor = reuse("supervisor", Supervisor)
+supervisor.configure(supervised_daemons)
+if "supervisor" in reused_rebuilt:
+    supervisor.start()
+
+status_reports["supervisor"] = ("s", supervisor.status)
+
+
+autostart_steps = [
+    AutostartStep("environment", setup_environment),
+    # 需要 SSH_AUTH_SOCK 等密钥环变量的步骤应写 after=("keyring",)
+    AutostartStep("keyring", start_gnome_keyring, after=("environment",)),
+    AutostartStep("daemons", supervisor.start, after=("environment",)),
+]
+
+
+gpu_sampler = reuse("gpu_sampler", GpuSampler)
+
+
+class CachedLayout(TextLayout):
     """
-    # 启动 picom。
+    # layout_cache 里的布局，可能同时挂在多个绘制调用上，排版参数都在缓存键里。
+    # 与键相同的赋值直接跳过（GroupBox.drawbox 每次都会重设 text/colour/width），
+    # 字体只能通过换一个缓存项来改。holders 记录正在使用它的组件数，
+    # 被淘汰且没有组件使用时才 finalize。
     """
-    try:
-        picom_process = subprocess.run(
-            ["pgrep", "picom"],
-            capture_output=True,
-            text=True,
-        )
-    except FileNotFoundError:
-        picom_process = None
 
-    if picom_process and picom_process.stdout:
-        print("picom 已经在运行。")
-        return
+    def __init__(self, drawer, text, colour, font_family, font_size, font_shadow, markup=False, width=None):
+        TextLayout.__init__(self, drawer, text, colour, font_family, font_size, font_shadow, markup=markup)
+        self.holders = 0
+        self.evicted = False
+        self.fixed_width = width
+        if width is not None:
+            TextLayout.width.fset(self, width)
 
-    picom_exec = shutil.which("picom")
-    if not picom_exec:
-        print("picom 不存在，无法自动启动。")
-        return
+    @property
+    def text(self):
+        return self.layout.get_text()
 
-    picom_config = os.path.expanduser("~/.config/picom/picom.conf")
-    picom_cmd = [picom_exec]
-    if os.path.isfile(picom_config):
-        picom_cmd.extend(["--config", picom_config])
+    @text.setter
+    def text(self, value):
+        if value == getattr(self, "_shaped_text", None):
+            return
+        TextLayout.text.fset(self, value)
+        self._shaped_text = value
 
-    try:
-        subprocess.Popen(picom_cmd)
-        print(f"已启动 picom: {' '.join(picom_cmd)}")
-    except OSError as error:
-        print(f"启动 picom 失败: {error}")
+    @property
+    def width(self):
+        return TextLayout.width.fget(self)
+
+    @width.setter
+    def width(self, value):
+        if value != self.fixed_width:
+            raise ValueError("缓存的布局不能改宽度，应按新宽度从 layout_cache 取")
+
+    def reset_width(self):
+        if self.fixed_width is not None:
+            raise ValueError("缓存的布局不能改宽度，应按新宽度从 layout_cache 取")
 
 
-def ensure_fcitx_running(): 
+class LayoutCache:
     """
-    # 启动 fcitx5。
+    # 排版结果的 LRU 缓存，键为 (drawer, 文本, 字体, 字号, 颜色, 宽度)。
+    # Pango 布局绑定在创建它的 drawer 上，所以键里带上 drawer；命中时直接复用
+    # 已经排好版、量好尺寸的布局。组件用 hold 换上新布局、release 放下旧布局，
+    # 淘汰时还被组件使用的布局等最后一个使用者放下后再 finalize。
+    # hits/misses 用来调整 max_entries。
     """
-    try:
-        process = subprocess.run(
-            ["pgrep", "fcitx5"],
-            capture_output=True,
-            text=True,
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, drawer, text, font, size, colour, shadow=None, markup=False, width=None):
+        key = (drawer, text, font, size, hashable_colour(colour), hashable_colour(shadow), markup, width)
+        layout = self.entries.get(key)
+        if layout is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return layout
+        self.misses += 1
+        layout = CachedLayout(drawer, text, colour, font, size, shadow, markup=markup, width=width)
+        self.entries[key] = layout
+        if len(self.entries) > self.max_entries:
+            self._evict(self.entries.popitem(last=False)[1])
+            self.evictions += 1
+        return layout
+
+    def hold(self, current, layout):
+        """
+        # 组件把 current 换成 layout 时调用，返回 layout。
+        """
+        if layout is not current:
+            layout.holders += 1
+            self.release(current)
+        return layout
+
+    def release(self, layout):
+        if isinstance(layout, CachedLayout):
+            layout.holders -= 1
+            if layout.evicted and layout.holders == 0:
+                layout.finalize()
+        elif layout is not None:
+            # 基类 _configure 给组件建的布局只属于组件自己
+            layout.finalize()
+
+    def discard(self, drawer):
+        for key in [key for key in self.entries if key[0] is drawer]:
+            self._evict(self.entries.pop(key))
+
+    @staticmethod
+    def _evict(layout):
+        layout.evicted = True
+        if layout.holders == 0:
+            layout.finalize()
+
+    def status(self) -> str:
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0
+        return (
+            f"缓存 {len(self.entries)}/{self.max_entries} 项，命中率 {rate:.1f}%\n"
+            f"命中 {self.hits}，未命中 {self.misses}，淘汰 {self.evictions}"
         )
-    except FileNotFoundError:
-        process = None
 
-    if process and process.stdout:
-        print("fcitx5 已经在运行。")
-        return
 
-    try:
-        subprocess.Popen(["fcitx5", "-d"])
-    except OSError as error:
-        print(f"启动 fcitx5 失败: {error}")
+def hashable_colour(colour):
+    return tuple(colour) if isinstance(colour, list) else colour
+
 
+layout_cache = reuse("layout_cache", LayoutCache)
+status_reports["layouts"] = ("l", layout_cache.status)
 
-def get_gpu_usage():
+
+class CachedTextMixin:
     """
-    # 获取 GPU 使用率。
+    # 让 _TextBox 组件从 layout_cache 取排版结果：文本变化时换成缓存里的布局，
+    # 之前显示过的字符串不用再经过 Pango 排版和测量。
+    # 滚动或竖排换行的组件要自己改布局宽度，仍用基类自己的布局。
     """
-    try:
-        output = subprocess.check_output(
-            [
-                "nvidia-smi",
-                "--query-gpu=utilization.gpu",
-                "--format=csv,noheader,nounits",
-            ],
-            text=True,
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        if self._uses_cache():
+            self.layout = layout_cache.hold(self.layout, self._cached_layout())
+
+    def _uses_cache(self):
+        return not self.scroll and (self.bar.horizontal or self.rotate)
+
+    def _cached_layout(self):
+        return layout_cache.get(
+            self.drawer,
+            self.formatted_text,
+            self.font,
+            self.fontsize,
+            self.foreground,
+            self.fontshadow,
+            self.markup,
         )
-        usage = output.strip().splitlines()[0]
-        return f"GPU: {usage}%"
-    except (FileNotFoundError, subprocess.CalledProcessError, IndexError):
+
+    def refresh_layout(self):
+        """
+        # 字体、颜色等配置变化后换上对应的布局；缓存里的布局不能原地修改。
+        """
+        if not self.layout:
+            return
+        if isinstance(self.layout, CachedLayout):
+            self.layout = layout_cache.hold(self.layout, self._cached_layout())
+        else:
+            self.layout.colour = self.foreground
+            self.layout.font_family = self.font
+            self.layout.font_size = self.fontsize
+            self.layout.font_shadow = self.fontshadow
+
+    def _set_text(self, value):
+        if not isinstance(self.layout, CachedLayout):
+            base._TextBox.text.fset(self, value)
+            return
+        if len(value) > self.max_chars > 0:
+            value = value[: self.max_chars] + "…"
+        self._text = value
+        self.layout = layout_cache.hold(self.layout, self._cached_layout())
+
+    text = property(base._TextBox.text.fget, _set_text)
+
+    def draw(self):
+        if not deferred_draw(self):
+            super().draw()
+
+    def set_font(self, font=None, fontsize=0, fontshadow=""):
+        if font is not None:
+            self.font = font
+        if fontsize != 0:
+            self.fontsize = fontsize
+        if fontshadow != "":
+            self.fontshadow = fontshadow
+        self.refresh_layout()
+        self.bar.draw()
+
+    def finalize(self):
+        layout_cache.release(self.layout)
+        self.layout = None
+        layout_cache.discard(self.drawer)
+        super().finalize()
+
+
+class CachedGroupBox(widget.GroupBox):
+    """
+    # 从 layout_cache 取每个分组标签的布局，重绘时不再逐个重新排版。
+    """
+
+    def drawbox(self, offset, text, bordercolor, textcolor, highlight_color=None, width=None, **kwargs):
+        self.layout = layout_cache.hold(
+            self.layout,
+            layout_cache.get(
+                self.drawer,
+                self.fmt.format(text),
+                self.font,
+                self.fontsize,
+                textcolor,
+                self.fontshadow,
+                self.markup,
+                width,
+            ),
+        )
+        widget.GroupBox.drawbox(self, offset, text, bordercolor, textcolor, highlight_color, width, **kwargs)
+
+    def draw(self):
+        if not deferred_draw(self):
+            widget.GroupBox.draw(self)
+
+    def finalize(self):
+        layout_cache.release(self.layout)
+        self.layout = None
+        layout_cache.discard(self.drawer)
+        widget.GroupBox.finalize(self)
+
+
+class ThrottledWindowName(CachedTextMixin, widget.WindowName):
+    """
+    # 限速的窗口标题：Brave、跑进度条的终端每秒能改几十次标题。
+    # 两次刷新之间至少间隔 1/max_refresh_rate 秒，期间的变化合并成一次
+    # 尾部刷新（保证最终显示的是最新标题）；截断后的文本没变就不重绘。
+    """
+
+    defaults = [
+        ("max_refresh_rate", 4, "标题每秒最多刷新几次"),
+    ]
+
+    def __init__(self, **config):
+        widget.WindowName.__init__(self, **config)
+        self.add_defaults(ThrottledWindowName.defaults)
+        self._last_refresh = 0.0
+        self._trailing = None
+        self.refreshes = 0
+        self.throttled = 0
+        self.unchanged = 0
+
+    def hook_response(self, *args):
+        now = time.monotonic()
+        wait = self._last_refresh + 1 / self.max_refresh_rate - now
+        if wait <= 0 and self._trailing is None:
+            self._refresh()
+            return
+        self.throttled += 1
+        if self._trailing is None:
+            self._trailing = self.qtile.call_later(max(wait, 0), self._refresh)
+
+    def _refresh(self):
+        self._trailing = None
+        self._last_refresh = time.monotonic()
+        widget.WindowName.hook_response(self)
+
+    def update(self, text):
+        if text is None:
+            text = ""
+        if len(text) > self.max_chars > 0:
+            text = text[: self.max_chars] + "…"
+        if text == self.text:
+            self.unchanged += 1
+            return
+        self.refreshes += 1
+        widget.WindowName.update(self, text)
+
+    def finalize(self):
+        if self._trailing is not None:
+            self._trailing.cancel()
+            self._trailing = None
+        super().finalize()
+
+
+class CachedCurrentLayout(CachedTextMixin, widget.CurrentLayout):
+    pass
+
+
+class SampleText(CachedTextMixin, base._TextBox):
+    """
+    # 订阅共享采样源的文本组件，只在有新样本时重绘，不再各自开定时器。
+    """
+
+    defaults = [
+        ("source", None, "共享采样源，需提供 subscribe/unsubscribe 和 sample"),
+        ("func", None, "把样本格式化成文本的函数"),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "", **config)
+        self.add_defaults(SampleText.defaults)
+
+    def timer_setup(self):
+        self.source.subscribe(self.on_sample)
+        self.on_sample(self.source.sample)
+
+    def on_sample(self, sample):
+        self.update(self.func(sample))
+
+    def finalize(self):
+        self.source.unsubscribe(self.on_sample)
+        super().finalize()
+
+
+proc_collector = reuse("proc_collector", ProcCollector, timer_wheel)
+
+
+gpu_monitor = reuse("gpu_monitor", GpuMonitor, timer_wheel, gpu_sampler)
+status_reports["gpu"] = ("g", gpu_monitor.status)
+
+
+def get_gpu_usage(samples=None):
+    """
+    # 获取 GPU 使用率，多块显卡时依次列出。
+    """
+    samples = samples or gpu_monitor.sample
+    if not samples:
         return "GPU: n/a"
+    return "GPU: " + " ".join(f"{sample.usage:.0f}%" for sample in samples)
 
 
-def get_gpu_memory():
+def get_gpu_memory(samples=None):
     """
-    # 获取 GPU 内存使用率。
+    # 获取 GPU 显存占用，多块显卡时依次列出；核显没有独立显存时不显示。
     """
-    try:
-        output = subprocess.check_output(
-            [
-                "nvidia-smi",
-                "--query-gpu=memory.used,memory.total",
-                "--format=csv,noheader,nounits",
-            ],
-            text=True,
-        )
-        used, total = output.strip().splitlines()[0].split(",")
-        used = float(used.strip()) / 1024
-        # total = float(total.strip()) / 1024
-        return f"VRAM: {used:.2f}G"
-        # return f"VRAM: {used:.2f}GiB/{total:.2f}GiB"
-    except (FileNotFoundError, subprocess.CalledProcessError, IndexError, ValueError):
+    samples = [sample for sample in samples or gpu_monitor.sample or () if sample.memory_used]
+    if not samples:
         return "VRAM: n/a"
+    return "VRAM: " + " ".join(f"{sample.memory_used / 1024:.2f}G" for sample in samples)
+
+
+def human_bytes(num_bytes: float):
+    """
+    # 按 1000 进制换算字节数，返回 (数值, 单位)，与 widget.Net 的显示一致。
+    """
+    units = ["B", "kB", "MB", "GB", "TB"]
+    power = 0
+    while num_bytes >= 1000 and power < len(units) - 1:
+        num_bytes /= 1000
+        power += 1
+    return num_bytes, units[power]
+
+
+def format_net(snapshot):
+    if snapshot is None:
+        return "Net: n/a"
+    down, down_suffix = human_bytes(snapshot.net_down)
+    up, up_suffix = human_bytes(snapshot.net_up)
+    return f"Net: ↓{down:.1f}{down_suffix}/s ↑{up:.1f}{up_suffix}/s"
+
+
+def format_cpu(snapshot):
+    if snapshot is None:
+        return "CPU: n/a"
+    return f"CPU: {snapshot.cpu_percent}%"
+
+
+def format_memory(snapshot):
+    if snapshot is None:
+        return "Mem: n/a"
+    return f"Mem: {snapshot.mem_used / 1024 ** 3:.2f}G"
+
+
+class TopConsumers:
+    """
+    # 状态栏上 CPU、内存、网速组件的下钻弹窗，列出 CPU、RSS、I/O 最高的进程。
+    # 只在弹窗显示期间订阅 proc_collector，随它的采集周期增量更新 ProcessTable，
+    # 不 fork 任何进程；隐藏后清空进程表。
+    """
+
+    sections = {
+        "cpu": ("CPU", lambda state: f"{state.cpu:5.1f}%"),
+        "rss": ("内存", lambda state: "{:5.1f}{}".format(*human_bytes(state.rss))),
+        "io_rate": ("I/O", lambda state: "{:5.1f}{}/s".format(*human_bytes(state.io_rate))),
+    }
+
+    def __init__(self, source, count: int = 5, proc_root: str = "/proc"):
+        self.source = source
+        self.count = count
+        self.table = ProcessTable(proc_root)
+        self.popup = None
+        self.first = "cpu"
+        self.refreshes = 0
+        self.elapsed = 0.0
+
+    def toggle(self, qtile, first: str = "cpu"):
+        """
+        # 显示或隐藏弹窗，first 对应的一栏排在最前面。
+        """
+        if self.popup is not None:
+            self.hide()
+            return
+        self.first = first
+        self.popup = Popup(
+            qtile,
+            background=C(colors[0]),
+            foreground=C(colors[1]),
+            border=C(colors[9]),
+            border_width=1,
+            font="JetBrainsMono Nerd Font",
+            fontsize=13,
+            horizontal_padding=12,
+            vertical_padding=8,
+            wrap=False,
+        )
+        self.popup.win.process_button_click = lambda x, y, button: self.hide()
+        self.source.subscribe(self.refresh)
+        self.refresh()
+
+    def hide(self):
+        if self.popup is None:
+            return
+        self.source.unsubscribe(self.refresh)
+        self.popup.kill()
+        self.popup = None
+        self.table.clear()
+
+    def text(self) -> str:
+        order = [self.first, *(key for key in self.sections if key != self.first)]
+        lines = []
+        for key in order:
+            title, render = self.sections[key]
+            lines.append(f"<b>{title}</b>")
+            top = self.table.top(key, self.count)
+            lines.extend(f"{render(state):>10}  {pid:>7}  {html.escape(state.name)}" for pid, state in top)
+            if not top:
+                lines.append("        …")
+        return "\n".join(lines)
+
+    def refresh(self, snapshot=None):
+        if self.popup is None:
+            return
+        started = time.perf_counter()
+        try:
+            self.table.update()
+        except OSError as error:
+            print(f"读取进程表失败: {error}")
+            return
+        popup = self.popup
+        popup.layout.text = self.text()
+        popup.width = popup.layout.width + 2 * popup.horizontal_padding
+        popup.height = popup.layout.height + 2 * popup.vertical_padding
+        screen = popup.qtile.current_screen
+        top = screen.top.size if screen.top is not None else 0
+        popup.x = screen.x + screen.width - popup.width - 8
+        popup.y = screen.y + top + 4
+        popup.place()
+        popup.unhide()
+        popup.clear()
+        popup.draw_text()
+        popup.draw()
+        self.refreshes += 1
+        self.elapsed += time.perf_counter() - started
+
+    def stop(self):
+        self.hide()
+
+    def status(self) -> str:
+        table = self.table
+        average = 1000 * self.elapsed / self.refreshes if self.refreshes else 0
+        return (
+            f"弹窗{'显示中' if self.popup is not None else '已隐藏'}，刷新 {self.refreshes} 次，平均 {average:.1f} ms\n"
+            f"跟踪进程 {len(table.processes)} 个，已清理 {table.pruned} 个\n"
+            f"读取 io {table.io_reads} 次，跳过 {table.io_skipped} 次"
+        )
+
+
+top_consumers = reuse("top_consumers", TopConsumers, proc_collector)
+status_reports["top"] = ("o", top_consumers.status)
+
+
+volume_source = reuse("volume_source", VolumeSource)
+status_reports["volume"] = ("v", volume_source.status)
+
+
+def format_volume(sample):
+    if sample is None:
+        return "Vol: n/a"
+    return "Vol: M" if sample.muted else f"Vol: {sample.volume}%"
+
+
+def pactl_spawn(*args):
+    """
+    # 调整默认输出设备；界面由 pactl subscribe 的事件刷新。
+    """
+    return lambda: qtile.spawn(["pactl", *args])
+
+
+# 按各采样源的频率保留最近 10 分钟
+cpu_history = reuse("cpu_history", MetricHistory, proc_collector, lambda snapshot: snapshot.cpu_percent, capacity=600)
+net_history = reuse("net_history", MetricHistory, proc_collector, lambda snapshot: snapshot.net_down, capacity=600)
+gpu_history = reuse(
+    "gpu_history", MetricHistory, gpu_monitor, lambda samples: max(sample.usage for sample in samples), capacity=120
+)
+
+
+class Sparkline(base._Widget):
+    """
+    # 迷你柱状图组件，数据来自 MetricHistory 的环形缓冲区。
+    # 图像缓存在自己的 ImageSurface 里：新样本到来时把旧图左移一格，只画最新一列；
+    # 只有量程变化或重新配置时才整张重画。
+    """
+
+    defaults = [
+        ("history", None, "MetricHistory 数据源"),
+        ("graph_color", "7aa2f7", "柱子的颜色"),
+        ("max_value", None, "量程上限，None 表示按可见范围内的最大值自动缩放"),
+        ("step", 2, "每个样本占用的像素宽度"),
+        ("margin_y", 6, "上下留白"),
+    ]
+
+    def __init__(self, width: int = 40, **config):
+        base._Widget.__init__(self, width, **config)
+        self.add_defaults(Sparkline.defaults)
+        self._surface = None
+        self._scratch = None
+        self._scale = 0.0
+
+    def _configure(self, qtile, bar):
+        base._Widget._configure(self, qtile, bar)
+        self._surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, self.width, self.bar.height)
+        self._scratch = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, self.width, self.bar.height)
+
+    def timer_setup(self):
+        self.history.subscribe(self.on_sample)
+        self._redraw_all()
+        self.draw()
+
+    def finalize(self):
+        self.history.unsubscribe(self.on_sample)
+        base._Widget.finalize(self)
+
+    @property
+    def visible(self) -> int:
+        return self.width // self.step
+
+    def _wanted_scale(self) -> float:
+        if self.max_value is not None:
+            return float(self.max_value)
+        peak = max(self.history.buffer.latest(self.visible), default=0.0)
+        if peak > self._scale or peak < self._scale / 2:
+            return peak
+        return self._scale
+
+    def _draw_column(self, ctx, x: int, value: float):
+        ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+        self.drawer.set_source_rgb(self.background or self.bar.background, ctx)
+        ctx.rectangle(x, 0, self.step, self.bar.height)
+        ctx.fill()
+        span = self.bar.height - 2 * self.margin_y
+        if self._scale <= 0 or value <= 0:
+            return
+        height = max(1, round(span * min(value / self._scale, 1.0)))
+        self.drawer.set_source_rgb(self.graph_color, ctx)
+        ctx.rectangle(x, self.bar.height - self.margin_y - height, self.step, height)
+        ctx.fill()
+
+    def _redraw_all(self):
+        self._scale = self._wanted_scale()
+        ctx = cairocffi.Context(self._surface)
+        ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+        self.drawer.set_source_rgb(self.background or self.bar.background, ctx)
+        ctx.paint()
+        values = self.history.buffer.latest(self.visible)
+        for index, value in enumerate(values):
+            self._draw_column(ctx, self.width - (len(values) - index) * self.step, value)
+
+    def on_sample(self, value: float):
+        if self._surface is None:
+            return
+        scale = self._wanted_scale()
+        if scale != self._scale:
+            self._redraw_all()
+        else:
+            # 先把旧图左移一格拷到备用画布，再在最右侧补画最新一列
+            ctx = cairocffi.Context(self._scratch)
+            ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+            ctx.set_source_surface(self._surface, -self.step, 0)
+            ctx.paint()
+            self._draw_column(ctx, self.width - self.step, value)
+            self._surface, self._scratch = self._scratch, self._surface
+        self.draw()
+
+    def draw(self):
+        if self._surface is None or deferred_draw(self):
+            return
+        self.drawer.clear(self.background or self.bar.background)
+        self.drawer.ctx.set_source_surface(self._surface, 0, 0)
+        self.drawer.ctx.paint()
+        self.drawer.draw(offsetx=self.offsetx, offsety=self.offsety, width=self.width)
+
+
+def clock_period(fmt: str) -> int:
+    """
+    # 根据 strftime 格式推算显示内容最快多久变化一次：秒、分、时或天。
+    """
+    if any(code in fmt for code in ("%S", "%s", "%T", "%X", "%c", "%r", "%f")):
+        return 1
+    if any(code in fmt for code in ("%M", "%R")):
+        return 60
+    if any(code in fmt for code in ("%H", "%I", "%k", "%l", "%p")):
+        return 3600
+    return 86400
+
+
+def next_local_boundary(now: float, period: int) -> float:
+    """
+    # 按本地时区计算 now 之后下一个整 period 秒的时刻。
+    """
+    offset = time.localtime(now).tm_gmtoff
+    return (math.floor((now + offset) / period) + 1) * period - offset
+
+
+class BoundaryClock(CachedTextMixin, widget.Clock):
+    """
+    # 挂在共享定时器上的时钟，只在显示内容可能变化的时刻唤醒，
+    # 例如 "%m-%d %H:%M" 每分钟整点刷新一次，而不是每秒一次。
+    """
+
+    def timer_setup(self):
+        self.tick()
+        period = clock_period(self.format)
+        self._futures.append(
+            timer_wheel.at_boundary(
+                lambda now: next_local_boundary(now, period),
+                self.tick,
+                legacy_period=self.update_interval,
+            )
+        )
+
+
+poll_policy = reuse("poll_policy", PollPolicy, timer_wheel)
+poll_policy.register(proc_collector)
+poll_policy.register(gpu_sampler)
+poll_policy.register(gpu_monitor)
+
+
+class CoalescedBar(bar.Bar):
+    """
+    # 按帧合并重绘的状态栏。
+    # bar.draw()（组件宽度变化）和本配置组件的重绘请求（见 deferred_draw）都只做
+    # 标记，每个 frame_interval 最多真正绘制一次：只有组件请求时只重画这些组件
+    # 所在的区域，有 bar.draw() 时才整条重画。
+    # requests/frames/full_paints/widget_paints 记录请求次数和实际绘制次数。
+    """
+
+    defaults = [
+        ("frame_interval", 1 / 60, "两次绘制之间的最短间隔（秒）"),
+    ]
+
+    def __init__(self, widgets, size, **config):
+        bar.Bar.__init__(self, widgets, size, **config)
+        self.add_defaults(CoalescedBar.defaults)
+        self.requests = 0
+        self.frames = 0
+        self.full_paints = 0
+        self.widget_paints = 0
+        self._dirty = set()
+        self._full = False
+        self._frame = None
+        self._last_paint = 0.0
+        self.painting = False
+
+    def mark_dirty(self, widget_):
+        self.requests += 1
+        self._dirty.add(widget_)
+        self._schedule()
+
+    def draw(self):
+        if not self.widgets:
+            return
+        self.requests += 1
+        self._full = True
+        self._schedule()
+
+    def _schedule(self):
+        if self._frame is None:
+            delay = max(self._last_paint + self.frame_interval - time.monotonic(), 0)
+            self._frame = self.qtile.call_later(delay, self._flush)
+
+    def _flush(self):
+        self._frame = None
+        self._last_paint = time.monotonic()
+        self.frames += 1
+        if self._full:
+            self._full = False
+            self._dirty.clear()
+            self._actual_draw()
+            return
+        dirty, self._dirty = self._dirty, set()
+        self.painting = True
+        try:
+            for widget_ in dirty:
+                if widget_.configured and not widget_.finalized and widget_ in self.widgets:
+                    self.widget_paints += 1
+                    widget_.draw()
+        finally:
+            self.painting = False
+
+    def _actual_draw(self):
+        self.full_paints += 1
+        self.painting = True
+        try:
+            bar.Bar._actual_draw(self)
+        finally:
+            self.painting = False
+
+    def finalize(self):
+        if self._frame is not None:
+            self._frame.cancel()
+            self._frame = None
+        self._dirty.clear()
+        bar.Bar.finalize(self)
+
+
+def deferred_draw(widget_) -> bool:
+    """
+    # 本配置组件的 draw 开头调用：在 CoalescedBar 上且不是状态栏自己在绘制时，
+    # 只登记重绘请求并返回 True，由状态栏在下一帧统一绘制。
+    """
+    bar_ = getattr(widget_, "bar", None)
+    if isinstance(bar_, CoalescedBar) and not bar_.painting:
+        bar_.mark_dirty(widget_)
+        return True
+    return False
+
+
+def redraw_status() -> str:
+    bars = [bar_ for screen in qtile.screens if isinstance(bar_ := screen.top, CoalescedBar)]
+    requests = sum(bar_.requests for bar_ in bars)
+    frames = sum(bar_.frames for bar_ in bars)
+    full = sum(bar_.full_paints for bar_ in bars)
+    partial = sum(bar_.widget_paints for bar_ in bars)
+    saved = 100 * (1 - frames / requests) if requests else 0
+    titles = [w for bar_ in bars for w in bar_.widgets if isinstance(w, ThrottledWindowName)]
+    return (
+        f"重绘请求 {requests} 次，实际绘制 {frames} 帧（节省 {saved:.0f}%）\n"
+        f"整条重画 {full} 次，局部重画组件 {partial} 次\n"
+        f"标题刷新 {sum(w.refreshes for w in titles)} 次，"
+        f"限速合并 {sum(w.throttled for w in titles)} 次，"
+        f"截断后未变 {sum(w.unchanged for w in titles)} 次"
+    )
+
+
+status_reports["redraws"] = ("r", redraw_status)
 
 
 layout_theme = {
@@ -451,14 +1596,75 @@ widget_defaults = dict(
 
 extension_defaults = widget_defaults.copy()
 
-screens = [
-    Screen(
-        top=bar.Bar(
+
+wallpaper_cache = reuse("wallpaper_cache", WallpaperCache)
+status_reports["wallpaper"] = ("b", wallpaper_cache.status)
+
+
+class CachedWallpaperScreen(Screen):
+    """
+    # 从 wallpaper_cache 取预先缩放好的像素绘制壁纸（仅 X11；其他后端或出错时
+    # 退回 qtile 自带的绘制）。
+    """
+
+    def paint(self, path: str, mode=None):
+        if self.qtile is None:
+            return
+        if self.qtile.core.name != "x11":
+            Screen.paint(self, path, mode)
+            return
+        try:
+            image, mapped, data = wallpaper_cache.surface(path, mode, self.width, self.height)
+        except Exception as error:
+            print(f"壁纸缓存不可用，改为直接绘制：{error}")
+            Screen.paint(self, path, mode)
+            return
+        painter = self.qtile.core.painter
+        try:
+            # 依赖 qtile 的私有接口，版本变化导致调用失败时退回自带的绘制
+            root_pixmap, surface = painter._get_root_pixmap_and_surface(self)
+            context = cairocffi.Context(surface)
+            context.translate(self.x, self.y)
+            context.set_source_surface(image)
+            context.paint()
+            surface.finish()
+            painter._update_root_pixmap(root_pixmap)
+        except Exception as error:
+            print(f"壁纸缓存绘制失败，改为直接绘制：{error}")
+            Screen.paint(self, path, mode)
+        finally:
+            image.finish()
+            data.release()
+            mapped.close()
+
+
+def monitor_count(qtile) -> int:
+    """
+    # 当前连接的显示器数量；与 qtile 一样把左上角坐标相同的输出视为同一屏幕。
+    """
+    core = getattr(qtile, "core", None)
+    if core is None:
+        return 1
+    try:
+        outputs = core.get_screen_info()
+    except Exception:
+        return 1
+    return max(len({(output.x, output.y) for output in outputs}), 1)
+
+
+def make_screen(index: int):
+    """
+    # 生成第 index 个显示器的屏幕和状态栏。所有状态栏的组件都订阅同一组
+    # 采样源（proc_collector、gpu_monitor 和各个 history），多一个显示器
+    # 只多一份绘制，不会多一份采样。
+    """
+    return CachedWallpaperScreen(
+        top=CoalescedBar(
             widgets=[
                 widget.Spacer(length=8),
                 
                 widget.Prompt(font="Ubuntu Mono", fontsize=14, foreground=colors[1]),
-                widget.GroupBox(
+                CachedGroupBox(
                     fontsize=16,
                     margin_y=5,
                     margin_x=5,
@@ -482,7 +1688,7 @@ screens = [
                     padding=2,
                     fontsize=14,
                 ),
-                widget.CurrentLayout(foreground=colors[1], padding=5),
+                CachedCurrentLayout(foreground=colors[1], padding=5),
                 widget.TextBox(
                     text="|",
                     font="JetBrainsMono Nerd Font Propo Bold",
@@ -490,18 +1696,19 @@ screens = [
                     padding=2,
                     fontsize=14,
                 ),
-                widget.WindowName(foreground=colors[6], padding=8, max_chars=40),
+                ThrottledWindowName(foreground=colors[6], padding=8, max_chars=40),
                 # make_sep(),
-                widget.Net(
+                SampleText(
+                    source=proc_collector,
+                    func=format_net,
                     foreground=colors[5],
                     padding=8,
-                    format="Net: ↓{down:.1f}{down_suffix}/s ↑{up:.1f}{up_suffix}/s",
-                    update_interval=1,
-                    use_bits=False,
                     mouse_callbacks={
-                        "Button1": lambda: qtile.cmd_spawn(myTerm + " -e btop")
+                        "Button1": lambda: top_consumers.toggle(qtile, "io_rate"),
+                        "Button3": lambda: dropdown_warmer.toggle(qtile, "btop"),
                     },
                 ),
+                Sparkline(history=net_history, graph_color=colors[5]),
                 # widget.GenPollText(
                 #     update_interval = 300,
                 #     func = get_kernel_version,
@@ -510,38 +1717,40 @@ screens = [
                 #     fmt = '{}',
                 # ),
                 # make_sep(),
-                # uv tool install qtile --with psutil
-                widget.CPU(
-                    update_interval=5,
+                SampleText(
+                    source=proc_collector,
+                    func=format_cpu,
                     foreground=colors[4],
                     padding=8,
                     mouse_callbacks={
-                        "Button1": lambda: qtile.cmd_spawn(myTerm + " -e btop")
+                        "Button1": lambda: top_consumers.toggle(qtile, "cpu"),
+                        "Button3": lambda: dropdown_warmer.toggle(qtile, "btop"),
                     },
-                    format="CPU: {load_percent}%",
                 ),
+                Sparkline(history=cpu_history, graph_color=colors[4], max_value=100),
                 make_sep(),
-                widget.Memory(
-                    update_interval=5,
+                SampleText(
+                    source=proc_collector,
+                    func=format_memory,
                     foreground=colors[8],
                     padding=8,
                     mouse_callbacks={
-                        "Button1": lambda: qtile.cmd_spawn(myTerm + " -e btop")
+                        "Button1": lambda: top_consumers.toggle(qtile, "rss"),
+                        "Button3": lambda: dropdown_warmer.toggle(qtile, "btop"),
                     },
-                    measure_mem="G",
-                    format="Mem: {MemUsed:.2f}{mm}",
                 ),
                 make_sep(),
-                widget.GenPollText(
-                    update_interval=5,
+                SampleText(
+                    source=gpu_monitor,
                     func=get_gpu_usage,
                     foreground=colors[3],
                     padding=8,
                     fmt="{}",
                 ),
+                Sparkline(history=gpu_history, graph_color=colors[3], max_value=100),
                 make_sep(),
-                widget.GenPollText(
-                    update_interval=5,
+                SampleText(
+                    source=gpu_monitor,
                     func=get_gpu_memory,
                     foreground=colors[6],
                     padding=8,
@@ -587,19 +1796,27 @@ screens = [
                 #     },
                 # ),
                 make_sep(),
-                widget.Volume(
+                SampleText(
+                    source=volume_source,
+                    func=format_volume,
                     foreground=colors[7],
                     padding=8,
-                    fmt="Vol: {}",
+                    mouse_callbacks={
+                        "Button1": pactl_spawn("set-sink-mute", "@DEFAULT_SINK@", "toggle"),
+                        "Button3": lambda: dropdown_warmer.toggle(qtile, "mixer"),
+                        "Button4": pactl_spawn("set-sink-volume", "@DEFAULT_SINK@", "+2%"),
+                        "Button5": pactl_spawn("set-sink-volume", "@DEFAULT_SINK@", "-2%"),
+                    },
                 ),
                 make_sep(),
-                widget.Clock(
+                BoundaryClock(
                     foreground=colors[8],
                     padding=8,
-                    mouse_callbacks = {"Button1": lambda: qtile.cmd_spawn(myTerm + " -e btop")},
+                    mouse_callbacks = {"Button1": lambda: dropdown_warmer.toggle(qtile, "btop")},
                     format="%m-%d %H:%M",
                 ),
-                systray_widget(),
+                # 托盘只能有一个，放在主屏幕上
+                systray_widget() if index == 0 else widget.Spacer(length=0),
                 widget.Spacer(length=8),
                 widget.Image(
                     filename="~/.config/qtile/icons/syaofox.png",
@@ -622,8 +1839,22 @@ screens = [
         ),
         wallpaper="/home/syaofox/.config/walls/eva.jpg",
         wallpaper_mode="fill",
-    ),
-]
+    )
+
+
+screens = [make_screen(index) for index in range(monitor_count(qtile))]
+
+
+def sync_screens(qtile):
+    """
+    # 显示器热插拔时按数量补齐或裁掉 screens；裁掉的屏幕由 qtile 随后回收，
+    # 重新插上时生成新的状态栏。
+    """
+    configured = qtile.config.screens
+    count = monitor_count(qtile)
+    del configured[count:]
+    configured.extend(make_screen(index) for index in range(len(configured), count))
+
 
 # Drag floating layouts.
 mouse = [
@@ -645,7 +1876,22 @@ follow_mouse_focus = False
 bring_front_click = False
 floats_kept_above = True
 cursor_warp = False
-floating_layout = layout.Floating(
+
+
+class IndexedFloating(layout.Floating):
+    """
+    # 用 RuleIndex 判断新窗口是否浮动，代替逐条比较 float_rules。
+    """
+
+    def __init__(self, **config):
+        layout.Floating.__init__(self, **config)
+        self.rule_index = RuleIndex("浮动规则", [(True, rule) for rule in self.float_rules])
+
+    def match(self, win):
+        return self.rule_index.target(win) is not None
+
+
+floating_layout = IndexedFloating(
     float_rules=[
         # Run the utility of `xprop` to see the wm class and name of an X client.
         *layout.Floating.default_float_rules,
@@ -659,6 +1905,7 @@ floating_layout = layout.Floating(
         Match(wm_class="xviewer"),  # xviewer
     ]
 )
+status_reports["rules"] = ("w", floating_layout.rule_index.status)
 auto_fullscreen = True
 focus_on_window_activation = "smart"
 reconfigure_screens = True
@@ -677,56 +1924,433 @@ wl_xcursor_size = 24
 wmname = "LG3D"
 
 
+def config_hooks():
+    """
+    # 本文件中用 @hook.subscribe 注册的函数：[(事件名, 函数)]。
+    """
+    registry = hook.subscriptions.get("qtile", {})
+    return [
+        (event, func)
+        for event, funcs in registry.items()
+        for func in funcs
+        if isinstance(func, types.FunctionType) and func.__module__ == __name__
+    ]
+
+
+def key_identity(key):
+    return (tuple(sorted(key.modifiers)), key.key)
+
+
+def key_content(key):
+    if isinstance(key, KeyChord):
+        return ("chord", key.name, key.mode, [(key_identity(k), key_content(k)) for k in key.submappings])
+    return ("key", key.desc, key.swallow, key.commands)
+
+
+def widget_value(widget_, name):
+    try:
+        return getattr(widget_, name)
+    except AttributeError:
+        return widget_._user_config.get(name)
+
+
+class ConfigReloader:
+    """
+    # 增量重新加载配置（Mod+Ctrl+r）。
+    # 重新执行 config.py 后与上一次加载的结果比较：按键只重新绑定变化的，
+    # 浮动规则直接换上新的索引，状态栏组件只把变化的参数设置到现有组件上并重绘，
+    # 采样源等共享对象由 reuse 沿用，startup hook 只运行新增的和代码变化的。
+    # 分组、布局、鼠标绑定、状态栏结构或组件类的代码有变化时退回 qtile 的
+    # 完整重新加载（Mod+Ctrl+Shift+r 总是完整加载）。
+    """
+
+    watched = (
+        "keys", "screens", "group_definitions", "dropdown_definitions", "layouts",
+        "layout_theme", "widget_defaults", "mouse", "floating_layout",
+    )
+
+    def __init__(self):
+        self.history = []
+
+    def reload(self, qtile):
+        started = time.perf_counter()
+        namespace = vars(sys.modules[__name__])
+        old = {name: namespace.get(name) for name in self.watched}
+        old_classes = {
+            name: value
+            for name, value in namespace.items()
+            if isinstance(value, type) and value.__module__ == __name__
+        }
+        removed = config_hooks()
+        registry = hook.subscriptions.get("qtile", {})
+        for event, func in removed:
+            registry[event].remove(func)
+        try:
+            qtile.config.load()
+        except Exception as error:
+            for event, func in removed:
+                registry.setdefault(event, []).append(func)
+            print(f"重新加载配置失败：{error}")
+            send_notification("配置错误", str(error))
+            return
+
+        # 重新注册的 hook 排到了最后，恢复成完整加载时配置 hook 在前的顺序
+        ours = {func for _, func in config_hooks()}
+        for funcs in registry.values():
+            funcs.sort(key=lambda func: func not in ours)
+
+        reason = self._full_reload_reason(qtile, old, old_classes, namespace)
+        if reason:
+            qtile.reload_config()
+            self._record("完整", started, reason)
+            return
+
+        # 代码没变的类换回旧的类对象，现有组件的 isinstance 判断保持成立
+        for name, cls in old_classes.items():
+            new = namespace.get(name)
+            if isinstance(new, type) and new is not cls and code_fingerprint(new) == code_fingerprint(cls):
+                namespace[name] = cls
+
+        changes = [
+            self._apply_keys(qtile, old["keys"], namespace),
+            self._apply_rules(qtile, old["floating_layout"], namespace["floating_layout"]),
+            self._apply_widgets(old["screens"], namespace["screens"]),
+        ]
+        namespace["screens"] = qtile.config.screens = old["screens"]
+        changes.append(self._rerun_startup(removed, config_hooks()))
+        self._record("增量", started, "，".join(change for change in changes if change) or "没有变化")
+
+    def _full_reload_reason(self, qtile, old, old_classes, namespace):
+        if reused_rebuilt:
+            return f"共享对象重建：{', '.join(reused_rebuilt)}"
+        if qtile.chord_stack:
+            return "正处于按键组合模式"
+        for name in ("group_definitions", "dropdown_definitions", "layout_theme", "widget_defaults"):
+            if not same_config_value(old[name], namespace[name]):
+                return f"{name} 变化"
+        def describe(items, params):
+            return [(type(item).__qualname__, params(item)) for item in items]
+
+        if not same_config_value(describe(old["mouse"], vars), describe(namespace["mouse"], vars)):
+            return "鼠标绑定变化"
+        user_config = lambda item: item._user_config
+        if not same_config_value(describe(old["layouts"], user_config), describe(namespace["layouts"], user_config)):
+            return "布局变化"
+        if not same_config_value(type(old["floating_layout"]), type(namespace["floating_layout"])):
+            return "浮动布局代码变化"
+        old_screens, new_screens = old["screens"], namespace["screens"]
+        if len(old_screens) != len(new_screens):
+            return "屏幕数量变化"
+        for old_screen, new_screen in zip(old_screens, new_screens):
+            if (old_screen.wallpaper, old_screen.wallpaper_mode) != (new_screen.wallpaper, new_screen.wallpaper_mode):
+                return "壁纸变化"
+            for position in ("top", "bottom", "left", "right"):
+                old_bar, new_bar = getattr(old_screen, position), getattr(new_screen, position)
+                if old_bar is None and new_bar is None:
+                    continue
+                if old_bar is None or new_bar is None or not same_config_value(type(old_bar), type(new_bar)):
+                    return "状态栏变化"
+                if old_bar.size != new_bar.size or not same_config_value(old_bar._user_config, new_bar._user_config):
+                    return "状态栏参数变化"
+                if len(old_bar.widgets) != len(new_bar.widgets):
+                    return "状态栏组件数量变化"
+                for old_widget, new_widget in zip(old_bar.widgets, new_bar.widgets):
+                    if not same_config_value(type(old_widget), type(new_widget)):
+                        return f"组件 {type(new_widget).__name__} 变化"
+        return None
+
+    @staticmethod
+    def _rerun_startup(old_hooks, new_hooks):
+        # 恢复会话、预热下拉窗口等 startup hook 不能在运行中的会话里重复执行，
+        # 只运行新增的和代码变化的；它们用到的共享对象重建时已经退回完整加载
+        previous = {func.__name__: func for event, func in old_hooks if event == "startup"}
+        rerun = []
+        for event, func in new_hooks:
+            if event != "startup":
+                continue
+            old_func = previous.get(func.__name__)
+            if old_func is None or not same_config_value(old_func, func):
+                func()
+                rerun.append(func.__name__)
+        return f"startup hook {', '.join(rerun)}" if rerun else ""
+
+    def _apply_keys(self, qtile, old_keys, namespace):
+        previous = {key_identity(key): key for key in old_keys}
+        merged, changed = [], 0
+        for key in namespace["keys"]:
+            old_key = previous.pop(key_identity(key), None)
+            if old_key is not None and same_config_value(key_content(old_key), key_content(key)):
+                merged.append(old_key)
+                continue
+            if old_key is not None:
+                qtile.ungrab_key(old_key)
+            qtile.grab_key(key)
+            merged.append(key)
+            changed += 1
+        for old_key in previous.values():
+            qtile.ungrab_key(old_key)
+            changed += 1
+        namespace["keys"] = qtile.config.keys = merged
+        return f"按键 {changed} 个" if changed else ""
+
+    def _apply_rules(self, qtile, old_floating, new_floating):
+        if [repr(rule) for rule in old_floating.float_rules] == [repr(rule) for rule in new_floating.float_rules]:
+            return ""
+        for group in qtile.groups:
+            floating = group.floating_layout
+            if hasattr(floating, "rule_index"):
+                floating.float_rules = new_floating.float_rules
+                floating.rule_index = new_floating.rule_index
+        return "浮动规则"
+
+    def _apply_widgets(self, old_screens, new_screens):
+        changed = 0
+        for old_screen, new_screen in zip(old_screens, new_screens):
+            for position in ("top", "bottom", "left", "right"):
+                old_bar, new_bar = getattr(old_screen, position), getattr(new_screen, position)
+                if old_bar is None:
+                    continue
+                redraw = False
+                for live, fresh in zip(old_bar.widgets, new_bar.widgets):
+                    names = [
+                        name
+                        for name in live._user_config.keys() | fresh._user_config.keys()
+                        if not same_config_value(widget_value(live, name), widget_value(fresh, name))
+                    ]
+                    if not names:
+                        continue
+                    live._user_config = fresh._user_config
+                    for name in names:
+                        setattr(live, name, widget_value(fresh, name))
+                    self._refresh_widget(live)
+                    changed += 1
+                    redraw = True
+                if redraw:
+                    old_bar.draw()
+        return f"组件 {changed} 个" if changed else ""
+
+    @staticmethod
+    def _refresh_widget(live):
+        if isinstance(live, CachedTextMixin):
+            live.refresh_layout()
+        elif isinstance(getattr(live, "layout", None), TextLayout) and not isinstance(live, CachedGroupBox):
+            # 组件自己的布局，可以原地修改；CachedGroupBox 每次绘制都按配置重新取布局
+            live.layout.colour = live.foreground
+            live.layout.font_family = live.font
+            live.layout.font_size = live.fontsize
+        if hasattr(live, "_redraw_all"):
+            live._redraw_all()
+
+    def _record(self, kind, started, detail):
+        elapsed = time.perf_counter() - started
+        self.history = [*self.history[-9:], (kind, elapsed, config_import_seconds, detail)]
+        print(f"{kind}重新加载配置完成，耗时 {elapsed * 1000:.0f} ms：{detail}")
+
+    def status(self) -> str:
+        lines = [f"导入 config.py 耗时 {config_import_seconds * 1000:.1f} ms"]
+        lines.extend(
+            f"{kind}重新加载 {elapsed * 1000:.0f} ms（其中导入 {imported * 1000:.0f} ms）：{detail}"
+            for kind, elapsed, imported, detail in reversed(self.history)
+        )
+        return "\n".join(lines)
+
+
+config_reloader = reuse("config_reloader", ConfigReloader)
+status_reports["config"] = ("p", config_reloader.status)
+
+
+class KeyLatency:
+    """
+    # 按键到重新布局完成的耗时统计（需设置环境变量 QTILE_KEY_LATENCY=1 才启用）。
+    # 每个按键的命令前后各插入一个计时命令：开始时记时间，结束后等事件循环
+    # 把本轮的重绘/布局处理完（列宽调整等按帧合并的操作则等到那一帧应用）
+    # 再记录到该按键的直方图里。
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self._start = None
+
+    def instrument(self, bindings):
+        for binding in bindings:
+            if isinstance(binding, KeyChord):
+                self.instrument(binding.submappings)
+                continue
+            label = "+".join([*binding.modifiers, binding.key])
+            if binding.desc:
+                label = f"{label} {binding.desc}"
+            commands = list(binding.commands)
+
+            def runs(commands=commands):
+                # 只有原命令会执行时才计时，保持 qtile 对“未执行不吞键”的判断
+                return any(command.check(qtile) for command in commands)
+
+            binding.commands = [
+                lazy.function(self.start, label).when(func=runs),
+                *commands,
+                lazy.function(self.finish, label).when(func=runs),
+            ]
+
+    def start(self, qtile, label):
+        self._start = (label, time.perf_counter())
+
+    def finish(self, qtile, label):
+        if self._start is None or self._start[0] != label:
+            return
+        _, started = self._start
+        self._start = None
+        qtile.call_soon(self._settle, qtile, label, started)
+
+    def _settle(self, qtile, label, started):
+        if column_resizer.scheduled:
+            qtile.call_later(column_resizer.frame_interval, self._settle, qtile, label, started)
+            return
+        histogram = self.histograms.get(label)
+        if histogram is None:
+            histogram = self.histograms[label] = LatencyHistogram()
+        histogram.record((time.perf_counter() - started) * 1e6)
+
+    def status(self) -> str:
+        if not self.histograms:
+            return "未启用或尚无记录（启动 Qtile 前设置 QTILE_KEY_LATENCY=1）"
+        rows = sorted(
+            self.histograms.items(), key=lambda item: item[1].percentile(99), reverse=True
+        )
+        return "\n".join(
+            f"{label}：{h.total} 次，p50 {h.percentile(50) / 1000:.1f} ms，"
+            f"p99 {h.percentile(99) / 1000:.1f} ms，最大 {h.max / 1000:.1f} ms"
+            for label, h in rows
+        )
+
+
+key_latency = reuse("key_latency", KeyLatency)
+status_reports["keys"] = ("k", key_latency.status)
+
+
+keys.append(
+    KeyChord(
+        [mod],
+        "s",
+        [
+            Key([], key, lazy.function(show_status, name), desc=f"显示 {name} 状态")
+            for name, (key, _) in status_reports.items()
+        ],
+        name="状态",
+        desc="查看内部状态",
+    )
+)
+
+if os.environ.get("QTILE_KEY_LATENCY") == "1":
+    key_latency.instrument(keys)
+
+
 @hook.subscribe.startup_once
 def autostart():
-    # 设置 fcitx5 输入法所需的环境变量
-    os.environ["GTK_IM_MODULE"] = "fcitx"
-    os.environ["QT_IM_MODULE"] = "fcitx"
-    os.environ["XMODIFIERS"] = "@im=fcitx"
+    create_task(run_autostart(autostart_steps))
+
+
+@hook.subscribe.startup
+def start_poll_policy():
+    poll_policy.start(qtile)
+
+
+@hook.subscribe.client_focus
+@hook.subscribe.client_killed
+@hook.subscribe.float_change
+@hook.subscribe.focus_change
+@hook.subscribe.setgroup
+def update_poll_policy(*args):
+    poll_policy.update(qtile)
+
+
+@hook.subscribe.screen_change
+def generate_screens(*args):
+    # 在 qtile 自己的 reconfigure_screens 之前运行（配置中的 hook 先注册）
+    sync_screens(qtile)
+
+
+@hook.subscribe.startup
+def rebuild_group_index():
+    group_index.rebuild(qtile)
+
+
+@hook.subscribe.group_window_add
+def index_window_add(group, win):
+    group_index.window_added(qtile, group, win)
+
+
+@hook.subscribe.group_window_remove
+def index_window_remove(group, win):
+    group_index.window_removed(qtile, group, win)
+
+
+@hook.subscribe.startup
+def restore_session():
+    session_store.restore(qtile)
+
+
+@hook.subscribe.client_new
+def restore_client_new(win):
+    # 在 DGroups 按分组 matches 分配之前运行（已有组的窗口它会跳过），认领到的
+    # 窗口回到快照中的组；下拉窗口由 ScratchPad 自己的 client_new 接管（它也在
+    # 配置的 hook 之后运行）
+    if dropdown_warmer.match(win) is None:
+        session_store.claim(win)
+
+
+@hook.subscribe.client_managed
+def restore_client_managed(win):
+    session_store.window_managed(qtile, win)
+
+
+@hook.subscribe.group_window_add
+@hook.subscribe.group_window_remove
+@hook.subscribe.layout_change
+@hook.subscribe.float_change
+def session_changed(*args):
+    session_store.changed()
+
+
+@hook.subscribe.restart
+@hook.subscribe.shutdown
+def flush_session():
+    session_store.save(force=True)
+
+
+@hook.subscribe.client_new
+def index_client_new(win):
+    group_index.window_new(win)
+
+
+@hook.subscribe.client_killed
+def index_client_killed(win):
+    group_index.window_killed(qtile, win)
+
+
+@hook.subscribe.client_focus
+def index_client_focus(win):
+    group_index.window_used(win)
+
+
+@hook.subscribe.setgroup
+def index_setgroup():
+    group_index.group_used(qtile.current_group)
+
+
+@hook.subscribe.startup
+def warm_dropdowns():
+    dropdown_warmer.schedule(qtile)
+
+
+@hook.subscribe.client_new
+def dropdown_client_new(win):
+    dropdown_warmer.window_new(qtile, win)
+
+
+@hook.subscribe.client_killed
+def respawn_dropdown(win):
+    # 在 ScratchPad 自己的 client_killed 之前运行，此时下拉窗口还在表里
+    dropdown_warmer.window_killed(qtile, win)
 
-    # 添加 ~/.local/bin 到 PATH
-    os.environ["PATH"] = (
-        f"{os.path.expanduser('~')}/.local/bin:{os.environ.get('PATH', '')}"
-    )
 
-    start_gnome_keyring()
-
-    #    # 设置屏幕分辨率
-    #    try:
-    #        if not os.environ.get("WAYLAND_DISPLAY"):
-    #            subprocess.run(
-    #                ["xrandr", "-s", "1920x1080", "-r", "60"],
-    #                check=True,
-    #                timeout=5,
-    #            )
-    #    except FileNotFoundError:
-    #        print("xrandr 不存在，无法设置屏幕分辨率。")
-    #    except subprocess.TimeoutExpired:
-    #        print("设置屏幕分辨率超时。")
-    #    except subprocess.CalledProcessError as error:
-    #        print(f"设置屏幕分辨率失败: {error}")
-    #
-    #    # 启动 gnome-keyring 守护进程，并写入返回的环境变量
-    #    try:
-    #        keyring_result = subprocess.run(
-    #            ["/usr/bin/gnome-keyring-daemon", "--daemonize", "--start"],
-    #            check=True,
-    #            capture_output=True,
-    #            text=True,
-    #            timeout=5,
-    #        )
-    #
-    #        for line in keyring_result.stdout.splitlines():
-    #            if "=" in line:
-    #                key, value = line.strip().split("=", 1)
-    #                os.environ[key] = value
-    #
-    #    except FileNotFoundError:
-    #        print("gnome-keyring-daemon 不存在，无法自动启动。")
-    #    except subprocess.TimeoutExpired:
-    #        print("gnome-keyring-daemon 启动超时。")
-    #    except subprocess.CalledProcessError as error:
-    #        print(f"gnome-keyring-daemon 启动失败: {error}")
-
-    ensure_fcitx_running()
-    ensure_picom_running()
+config_import_seconds = time.perf_counter() - config_import_started
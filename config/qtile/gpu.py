@@ -0,0 +1,379 @@
+from metrics import MetricSource
+from sysinfo import ProcReader
+from typing import NamedTuple
+import asyncio
+import os
+import re
+import time
+
+
+class GpuSample(NamedTuple):
+    index: int
+    usage: float
+    memory_used: float  # MiB
+    memory_total: float
+    name: str = ""
+
+
+def parse_gpu_line(line: str):
+    """
+    # 解析一行 nvidia-smi CSV 输出：index, utilization.gpu, memory.used, memory.total。
+    """
+    try:
+        index, usage, used, total = (field.strip() for field in line.split(","))
+        return GpuSample(int(index), float(usage), float(used), float(total), f"nvidia{index}")
+    except ValueError:
+        return None
+
+
+class GpuSampler(MetricSource):
+    """
+    # 常驻的 nvidia-smi 采样器，只在 GpuMonitor 找到 nvidia 驱动的显卡时启用。
+    # 只启动一个 `nvidia-smi --loop-ms` 子进程并按行读取输出，每块显卡的样本
+    # 解析后推送给订阅者；子进程退出或启动失败（驱动还没装好、命令不存在）后
+    # 从 retry_delay 秒开始按指数退避自动重启。
+    # command 可以替换成输出固定 CSV 的假脚本，方便脱离显卡测试。
+    """
+
+    def __init__(self, command=None, interval_ms: int = 5000, retry_delay: float = 1):
+        MetricSource.__init__(self)
+        self.command = command
+        self.interval_ms = interval_ms
+        self.retry_delay = retry_delay
+        self.restarts = 0
+        self._task = None
+        self._process = None
+
+    def build_command(self, interval_ms: float):
+        if self.command:
+            return self.command
+        return [
+            "nvidia-smi",
+            "--query-gpu=index,utilization.gpu,memory.used,memory.total",
+            "--format=csv,noheader,nounits",
+            f"--loop-ms={int(interval_ms)}",
+        ]
+
+    def start(self):
+        if self.scaled(self.interval_ms) is None:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def on_policy_change(self, resumed: bool):
+        # 采样间隔写在 nvidia-smi 的参数里，只能重启子进程；新进程会立即输出一次
+        if self.listeners:
+            self.stop()
+            self.start()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+        self._process = None
+
+    async def _run(self):
+        delay = self.retry_delay
+        while True:
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    *self.build_command(self.scaled(self.interval_ms) or self.interval_ms),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError as error:
+                print(f"启动 nvidia-smi 失败: {error}，{delay} 秒后重试。")
+            else:
+                async for raw in self._process.stdout:
+                    sample = parse_gpu_line(raw.decode(errors="replace"))
+                    if sample:
+                        self._publish(sample)
+                        delay = self.retry_delay
+
+                await self._process.wait()
+                print(f"nvidia-smi 已退出 ({self._process.returncode})，{delay} 秒后重启。")
+            self.restarts += 1
+            self._publish(None)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+
+DRM_UNITS = {b"": 1, b"KiB": 1024, b"MiB": 1024**2, b"GiB": 1024**3}
+
+
+def parse_drm_fdinfo(text: bytes):
+    """
+    # 解析 /proc/<pid>/fdinfo/<fd> 中的 DRM 使用统计（drm-usage-stats）。
+    # 返回 (pdev, client_id, {引擎: 忙碌纳秒}, {引擎: (周期, 总周期)}, 显存常驻字节)，
+    # 不是 DRM 客户端时返回 None。
+    """
+    pdev = client = None
+    engines, cycles, totals = {}, {}, {}
+    resident = 0
+    for line in text.splitlines():
+        key, _, value = line.partition(b":")
+        value = value.strip()
+        if key == b"drm-pdev":
+            pdev = value.decode()
+        elif key == b"drm-client-id":
+            client = int(value)
+        elif key.startswith(b"drm-engine-") and not key.startswith(b"drm-engine-capacity-"):
+            engines[key[11:].decode()] = int(value.split()[0])
+        elif key.startswith(b"drm-cycles-"):
+            cycles[key[11:].decode()] = int(value)
+        elif key.startswith(b"drm-total-cycles-"):
+            totals[key[17:].decode()] = int(value)
+        elif key.startswith(b"drm-resident-") and (b"vram" in key or b"local" in key):
+            number, _, unit = value.partition(b" ")
+            resident += int(number) * DRM_UNITS.get(unit.strip(), 1)
+    if pdev is None or client is None:
+        return None
+    return pdev, client, engines, {name: (cycles[name], totals[name]) for name in cycles if name in totals}, resident
+
+
+class DrmCard:
+    """
+    # /sys/class/drm/cardN 对应的一块显卡。gpu_busy_percent 和 mem_info_vram_*
+    # 是 amdgpu 提供的，i915/xe 等没有这些文件的驱动由 fdinfo 统计补上。
+    """
+
+    def __init__(self, name: str, device: str):
+        self.name = name
+        uevent = {}
+        with open(os.path.join(device, "uevent"), "rb") as f:
+            for line in f.read().splitlines():
+                key, _, value = line.partition(b"=")
+                uevent[key] = value.decode()
+        self.driver = uevent.get(b"DRIVER", "")
+        self.pdev = uevent.get(b"PCI_SLOT_NAME", "")
+        self.busy = self._reader(device, "gpu_busy_percent")
+        self.vram_used = self._reader(device, "mem_info_vram_used")
+        total = self._reader(device, "mem_info_vram_total")
+        self.vram_total = int(total.read()) if total is not None else 0
+        if total is not None:
+            total.close()
+
+    @staticmethod
+    def _reader(device, name):
+        path = os.path.join(device, name)
+        return ProcReader(path) if os.path.exists(path) else None
+
+    @property
+    def needs_fdinfo(self) -> bool:
+        return self.driver != "nvidia" and (self.busy is None or self.vram_used is None)
+
+    def close(self):
+        for reader in (self.busy, self.vram_used):
+            if reader is not None:
+                reader.close()
+
+
+class GpuMonitor(MetricSource):
+    """
+    # 与驱动无关的 GPU 采集器，每个样本是所有显卡的 GpuSample 元组。
+    # 直接读 sysfs（gpu_busy_percent、mem_info_vram_used），没有这些文件的显卡
+    # 用各进程 DRM fdinfo 中引擎忙碌时间的差值算使用率；fdinfo 路径每隔
+    # rescan_every 个周期才重新扫描一次 /proc/*/fd，其余周期只读已知的文件，
+    # 客户端的上一次计数按 (pdev, client-id) 保存，客户端退出后随之丢弃。
+    # 只有存在 nvidia 驱动的显卡（或者一块显卡都找不到）时才订阅 nvidia-smi。
+    # sysfs_root/proc_root 可以指向假的目录树，方便脱离显卡测试。
+    """
+
+    def __init__(self, wheel, nvidia=None, interval: float = 5, sysfs_root: str = "/sys", proc_root: str = "/proc",
+                 rescan_every: int = 6):
+        MetricSource.__init__(self)
+        self.wheel = wheel
+        self.nvidia = nvidia
+        self.interval = interval
+        self.sysfs_root = sysfs_root
+        self.proc_root = proc_root
+        self.rescan_every = rescan_every
+        self.cards = None
+        self.nvidia_samples = {}
+        self.fdinfo_paths = []
+        self.scans = 0
+        self._clients = {}
+        self._last = None
+        self._ticks = 0
+        self._job = None
+        self._nvidia_active = False
+
+    def start(self):
+        if self._job is not None:
+            return
+        if self.cards is None:
+            self.discover()
+        self._schedule()
+        self.tick()
+
+    def _schedule(self):
+        interval = self.scaled(self.interval)
+        if interval is not None:
+            self._job = self.wheel.every(interval, self.tick)
+
+    def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if self._nvidia_active:
+            self._nvidia_active = False
+            self.nvidia.unsubscribe(self._on_nvidia)
+        for card in self.cards or ():
+            card.close()
+        self.cards = None
+        self.nvidia_samples.clear()
+        self._clients.clear()
+        self._last = None
+
+    def on_policy_change(self, resumed: bool):
+        if not self.listeners:
+            return
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if resumed and self.scaled(self.interval) is not None:
+            self.tick()
+        self._schedule()
+
+    def discover(self):
+        drm = os.path.join(self.sysfs_root, "class", "drm")
+        try:
+            names = [name for name in os.listdir(drm) if re.fullmatch(r"card\d+", name)]
+        except OSError:
+            names = []
+        self.cards = []
+        for name in sorted(names, key=lambda name: int(name[4:])):
+            try:
+                self.cards.append(DrmCard(name, os.path.join(drm, name, "device")))
+            except (OSError, ValueError) as error:
+                print(f"读取显卡 {name} 失败: {error}")
+        wants_nvidia = not self.cards or any(card.driver == "nvidia" for card in self.cards)
+        if wants_nvidia and self.nvidia is not None and not self._nvidia_active:
+            self._nvidia_active = True
+            self.nvidia.subscribe(self._on_nvidia)
+
+    def _on_nvidia(self, sample):
+        if sample is None:
+            self.nvidia_samples.clear()
+        else:
+            self.nvidia_samples[sample.index] = sample
+
+    def scan_fdinfo(self):
+        """
+        # 找出所有打开了 /dev/dri/* 的 (pid, fd)，只记录 fdinfo 路径。
+        """
+        self.scans += 1
+        paths = []
+        try:
+            pids = [pid for pid in os.listdir(self.proc_root) if pid.isdigit()]
+        except OSError:
+            pids = []
+        for pid in pids:
+            fd_dir = os.path.join(self.proc_root, pid, "fd")
+            try:
+                fds = os.listdir(fd_dir)
+            except OSError:
+                continue
+            for fd in fds:
+                try:
+                    target = os.readlink(os.path.join(fd_dir, fd))
+                except OSError:
+                    continue
+                if target.startswith("/dev/dri/"):
+                    paths.append(os.path.join(self.proc_root, pid, "fdinfo", fd))
+        self.fdinfo_paths = paths
+
+    def _read_clients(self):
+        clients = {}
+        alive = []
+        for path in self.fdinfo_paths:
+            try:
+                with open(path, "rb") as f:
+                    parsed = parse_drm_fdinfo(f.read())
+            except (OSError, ValueError):
+                continue
+            alive.append(path)
+            if parsed is not None:
+                pdev, client, engines, cycles, resident = parsed
+                # 同一个客户端可能被多个 fd 共享（dup/fork），按 client-id 去重
+                clients[(pdev, client)] = (engines, cycles, resident)
+        self.fdinfo_paths = alive
+        return clients
+
+    def _fdinfo_usage(self, clients, elapsed_ns):
+        """
+        # 返回 {pdev: (使用率, 显存常驻字节)}，使用率取最忙的引擎。
+        """
+        busy = {}
+        resident = {}
+        for key, (engines, cycles, used) in clients.items():
+            pdev = key[0]
+            resident[pdev] = resident.get(pdev, 0) + used
+            previous = self._clients.get(key)
+            if previous is None:
+                continue
+            per_engine = busy.setdefault(pdev, {})
+            if elapsed_ns > 0:
+                for name, value in engines.items():
+                    if name in previous[0]:
+                        delta = max(value - previous[0][name], 0)
+                        per_engine[name] = per_engine.get(name, 0.0) + delta / elapsed_ns
+            for name, (value, total) in cycles.items():
+                if name in previous[1]:
+                    old_value, old_total = previous[1][name]
+                    if total > old_total:
+                        delta = max(value - old_value, 0)
+                        per_engine[name] = per_engine.get(name, 0.0) + delta / (total - old_total)
+        self._clients = clients
+        return {
+            pdev: (min(max(busy.get(pdev, {}).values(), default=0.0), 1.0) * 100, resident.get(pdev, 0))
+            for pdev in resident.keys() | busy.keys()
+        }
+
+    def tick(self):
+        if self.cards is None:
+            return
+        now = time.monotonic_ns()
+        elapsed, self._last = (now - self._last if self._last is not None else 0), now
+        usage = {}
+        if any(card.needs_fdinfo for card in self.cards):
+            if self._ticks % self.rescan_every == 0:
+                self.scan_fdinfo()
+            usage = self._fdinfo_usage(self._read_clients(), elapsed)
+        self._ticks += 1
+
+        samples = []
+        for card in self.cards:
+            if card.driver == "nvidia":
+                continue
+            fd_usage, fd_resident = usage.get(card.pdev, (0.0, 0))
+            try:
+                busy = float(card.busy.read()) if card.busy is not None else fd_usage
+                used = int(card.vram_used.read()) if card.vram_used is not None else fd_resident
+            except (OSError, ValueError) as error:
+                print(f"读取显卡 {card.name} 失败: {error}")
+                continue
+            samples.append(GpuSample(len(samples), busy, used / 2**20, card.vram_total / 2**20, card.name))
+        for _, sample in sorted(self.nvidia_samples.items()):
+            samples.append(sample._replace(index=len(samples)))
+        self._publish(tuple(samples) or None)
+
+    def status(self) -> str:
+        lines = []
+        for card in self.cards or ():
+            source = "nvidia-smi" if card.driver == "nvidia" else ("fdinfo" if card.needs_fdinfo else "sysfs")
+            lines.append(f"{card.name}：{card.driver or '?'} {card.pdev}，{source}")
+        if not lines:
+            lines.append("没有找到 DRM 显卡")
+        lines.append(
+            f"nvidia-smi：{'已订阅' if self._nvidia_active else '未使用'}，"
+            f"DRM 客户端 {len(self._clients)} 个，fdinfo {len(self.fdinfo_paths)} 个，扫描 {self.scans} 次"
+        )
+        for sample in self.sample or ():
+            lines.append(
+                f"  {sample.name}：{sample.usage:.0f}%，显存 {sample.memory_used / 1024:.2f}"
+                f"/{sample.memory_total / 1024:.2f} GiB"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,459 @@
+from array import array
+import asyncio
+import math
+import time
+
+
+class WheelJob:
+    """
+    # 共享定时器上的一个任务，接口与 asyncio 的 TimerHandle 相同（cancel/cancelled），
+    # 可以直接放进组件的 _futures 里随组件一起取消。
+    """
+
+    __slots__ = ("wheel", "callback", "period", "boundary", "legacy_period", "tick", "runs", "_cancelled")
+
+    def __init__(self, wheel, callback, period, boundary, legacy_period):
+        self.wheel = wheel
+        self.callback = callback
+        self.period = period
+        self.boundary = boundary
+        self.legacy_period = legacy_period
+        self.tick = None
+        self.runs = 0
+        self._cancelled = False
+
+    def next_due(self, now: float) -> float:
+        if self.boundary is not None:
+            return self.boundary(now)
+        return (math.floor(now / self.period) + 1) * self.period
+
+    def cancel(self):
+        if not self._cancelled:
+            self._cancelled = True
+            self.wheel.remove(self)
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+
+class TimerWheel:
+    """
+    # 状态栏的共享定时器。
+    # 所有到期时间按墙上时间量化到 resolution 的整数倍放进槽位，同一槽位的任务
+    # 合并成一次唤醒；周期任务对齐到周期的整数倍，所以 1 秒和 5 秒的任务会
+    # 落在同一时刻。整个定时器同一时间只挂一个 call_later。
+    """
+
+    def __init__(self, resolution: float = 0.05):
+        self.resolution = resolution
+        self.slots = {}
+        self.wakeups = 0
+        self._since = time.monotonic()
+        self._handle = None
+        self._armed_tick = None
+        self._firing = False
+
+    def every(self, period: float, callback, legacy_period=None) -> WheelJob:
+        """
+        # 每隔 period 秒调用一次 callback。
+        """
+        job = WheelJob(self, callback, period, None, legacy_period or period)
+        self._insert(job, job.next_due(time.time()))
+        return job
+
+    def at_boundary(self, boundary, callback, legacy_period: float) -> WheelJob:
+        """
+        # 在 boundary(now) 给出的下一个时刻调用 callback，之后依次类推。
+        """
+        job = WheelJob(self, callback, None, boundary, legacy_period)
+        self._insert(job, job.next_due(time.time()))
+        return job
+
+    def stop(self):
+        for slot in list(self.slots.values()):
+            for job in list(slot):
+                job.cancel()
+
+    def remove(self, job: WheelJob):
+        slot = self.slots.get(job.tick)
+        if slot and job in slot:
+            slot.remove(job)
+            if not slot:
+                del self.slots[job.tick]
+        job.tick = None
+        self._arm()
+
+    def _insert(self, job: WheelJob, due: float):
+        job.tick = math.ceil(due / self.resolution - 1e-6)
+        self.slots.setdefault(job.tick, []).append(job)
+        self._arm()
+
+    def _arm(self):
+        if self._firing:
+            return
+        tick = min(self.slots) if self.slots else None
+        if tick == self._armed_tick:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._armed_tick = tick
+        if tick is not None:
+            delay = max(tick * self.resolution - time.time(), 0)
+            self._handle = asyncio.get_running_loop().call_later(delay, self._fire)
+
+    def _fire(self):
+        armed, self._armed_tick, self._handle = self._armed_tick, None, None
+        self.wakeups += 1
+        # 以槽位时刻而不是当前时间推算下次到期，call_later 提前几毫秒触发也不会重复执行
+        reference = max(time.time(), armed * self.resolution) + 1e-6
+        self._firing = True
+        for tick in sorted(tick for tick in self.slots if tick <= armed):
+            for job in self.slots.pop(tick):
+                job.tick = None
+                job.runs += 1
+                try:
+                    job.callback()
+                except Exception as error:
+                    print(f"定时任务 {job.callback} 出错: {error}")
+                if not job._cancelled and job.tick is None:
+                    self._insert(job, job.next_due(reference))
+        self._firing = False
+        self._arm()
+
+    def status(self) -> str:
+        minutes = max((time.monotonic() - self._since) / 60, 1 / 60)
+        jobs = [job for slot in self.slots.values() for job in slot]
+        before = sum(60 / job.legacy_period for job in jobs)
+        runs = sum(job.runs for job in jobs)
+        return (
+            f"任务 {len(jobs)} 个\n"
+            f"合并前（各自计时）约 {before:.1f} 次唤醒/分钟\n"
+            f"合并后实测 {self.wakeups / minutes:.1f} 次唤醒/分钟，执行任务 {runs / minutes:.1f} 次/分钟"
+        )
+
+
+class MetricSource:
+    """
+    # 共享采样源的基类：缓存最新样本，推送给订阅者。
+    # 第一个订阅者出现时开始采样，最后一个退订后再过 stop_grace 秒才停止：完整
+    # 重新加载配置时旧组件先 finalize 退订，新组件随后才在 timer_setup 中重新
+    # 订阅，这段时间内采样（以及 nvidia-smi 等子进程）不会中断。
+    """
+
+    policy = None
+    stop_grace = 2.0
+
+    def __init__(self):
+        self.sample = None
+        self.listeners = []
+        self._stop_handle = None
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+        self.start()
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+        if self.listeners or self._stop_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.stop()
+            return
+        self._stop_handle = loop.call_later(self.stop_grace, self._stop_if_idle)
+
+    def _stop_if_idle(self):
+        self._stop_handle = None
+        if not self.listeners:
+            self.stop()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def scaled(self, interval: float):
+        """
+        # 按轮询策略换算采样间隔，返回 None 表示当前应暂停采样。
+        """
+        if self.policy is None:
+            return interval
+        return self.policy.interval(interval)
+
+    def on_policy_change(self, resumed: bool):
+        """
+        # 轮询策略变化时调用；resumed 为 True 时应立即刷新一次。
+        """
+
+    def _publish(self, sample):
+        self.sample = sample
+        for callback in list(self.listeners):
+            callback(sample)
+
+
+class RingBuffer:
+    """
+    # 定长环形缓冲区，数据存放在 array('f') 中，写入样本不产生新对象。
+    """
+
+    __slots__ = ("values", "capacity", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.values = array("f", bytes(4 * capacity))
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value: float):
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self, n: int):
+        """
+        # 按时间顺序返回最近 n 个样本。
+        """
+        n = min(n, self.count)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.values[start : start + n]
+        return self.values[start:] + self.values[: self.head]
+
+
+class MetricHistory(MetricSource):
+    """
+    # 单项指标的历史记录：订阅上游采样源，把 extract 取出的数值写入环形缓冲区，
+    # 再把新数值推送给图表组件。
+    """
+
+    def __init__(self, source, extract, capacity: int):
+        MetricSource.__init__(self)
+        self.source = source
+        self.extract = extract
+        self.buffer = RingBuffer(capacity)
+        self._active = False
+
+    def start(self):
+        if not self._active:
+            self._active = True
+            self.source.subscribe(self._on_sample)
+
+    def stop(self):
+        if self._active:
+            self._active = False
+            self.source.unsubscribe(self._on_sample)
+
+    def _on_sample(self, sample):
+        if sample is None:
+            return
+        value = self.extract(sample)
+        self.buffer.append(value)
+        self._publish(value)
+
+
+class LatencyHistogram:
+    """
+    # HDR 风格的延迟直方图（单位微秒）：每个 2 的幂区间再分 16 格，
+    # 相对误差约 6%，记录一次只是一次数组加一。
+    """
+
+    sub_buckets = 16
+    max_shift = 20  # 最大约 32 秒
+
+    def __init__(self):
+        self.counts = array("L", [0]) * ((self.max_shift + 2) * self.sub_buckets)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def index(self, value: int) -> int:
+        shift = max(value.bit_length() - 5, 0)
+        if shift > self.max_shift:
+            return len(self.counts) - 1
+        return shift * self.sub_buckets + (value >> shift)
+
+    def upper_bound(self, index: int) -> int:
+        shift = max(index // self.sub_buckets - 1, 0)
+        return ((index - shift * self.sub_buckets + 1) << shift) - 1
+
+    def record(self, micros: float):
+        value = int(micros)
+        self.counts[self.index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> int:
+        target = math.ceil(self.total * p / 100)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(self.upper_bound(i), self.max)
+        return 0
+
+
+def x_idle_seconds(qtile):
+    """
+    # 通过 XScreenSaver 扩展查询用户空闲时长（秒），不支持时返回 None。
+    """
+    try:
+        import xcffib.screensaver # pyright: ignore[reportMissingImports]
+
+        conn = qtile.core.conn.conn
+        reply = conn(xcffib.screensaver.key).QueryInfo(qtile.core._root.wid).reply()
+    except Exception:
+        return None
+    return reply.ms_since_user_input / 1000
+
+
+class PollPolicy:
+    """
+    # 自适应轮询策略，按每个状态栏分别判断。
+    # 某个屏幕上的焦点窗口全屏时，把这个屏幕状态栏上组件的间隔放大
+    # fullscreen_factor 倍；状态栏被隐藏或 X 空闲超过 idle_after 秒时暂停它的
+    # 组件。恢复正常时立即刷新一次，再回到原来的间隔。状态栏上自带定时器的组件
+    # （带 update_interval 的 Clock 等）由策略直接调整。
+    # 通过 register 接入的采样源由所有状态栏共用，按最需要数据的那个状态栏来定：
+    # 任意一个状态栏正常显示就按原间隔采样，全部隐藏时才暂停。
+    """
+
+    # 状态从左到右越来越不需要数据
+    states = ("normal", "fullscreen", "hidden", "idle")
+
+    def __init__(self, wheel, fullscreen_factor: float = 5, idle_after: float = 300, idle_check: float = 10):
+        self.wheel = wheel
+        self.fullscreen_factor = fullscreen_factor
+        self.idle_after = idle_after
+        self.idle_check = idle_check
+        self.factor = 1
+        self.suspended = False
+        self.state = "normal"
+        self.bar_states = {}
+        self.sources = []
+        self._saved_intervals = {}
+        self._idle_job = None
+
+    def register(self, source):
+        source.policy = self
+        if source not in self.sources:
+            self.sources.append(source)
+
+    def interval(self, interval: float):
+        if self.suspended:
+            return None
+        return interval * self.factor
+
+    def start(self, qtile):
+        self.stop()
+        # 重新加载配置后从正常状态重新判断，恢复组件原来的间隔
+        for screen, bar_ in screen_bars(qtile):
+            self._apply_bar(bar_, self.bar_states.get(bar_, "normal"), "normal")
+        if self.state != "normal":
+            self._apply_sources("normal")
+        self.bar_states.clear()
+        self._saved_intervals.clear()
+        self._check_idle(qtile)
+
+    def stop(self):
+        if self._idle_job is not None:
+            self._idle_job.cancel()
+            self._idle_job = None
+
+    def _check_idle(self, qtile):
+        idle = x_idle_seconds(qtile)
+        self.update(qtile, idle=idle is not None and idle >= self.idle_after)
+        # 空闲时缩短检查间隔，用户回来后能尽快恢复
+        period = 1 if self.state == "idle" else self.idle_check
+        if self._idle_job is None or self._idle_job.period != period:
+            self.stop()
+            self._idle_job = self.wheel.every(period, lambda: self._check_idle(qtile))
+
+    def update(self, qtile, idle=None):
+        if idle is None:
+            idle = self.state == "idle"
+        bar_states = {}
+        for screen, bar_ in screen_bars(qtile):
+            state = bar_states[bar_] = self.bar_state(screen, bar_, idle)
+            self._apply_bar(bar_, self.bar_states.get(bar_, "normal"), state)
+        self.bar_states = bar_states
+        if bar_states:
+            state = min(bar_states.values(), key=self.states.index)
+        else:
+            state = "idle" if idle else "normal"
+        if state != self.state:
+            self._apply_sources(state)
+
+    @staticmethod
+    def bar_state(screen, bar_, idle: bool) -> str:
+        if idle:
+            return "idle"
+        if not bar_.is_show():
+            return "hidden"
+        group = getattr(screen, "group", None)
+        window = group.current_window if group is not None else None
+        if window is not None and window.fullscreen:
+            return "fullscreen"
+        return "normal"
+
+    def settings(self, state: str):
+        """
+        # 返回状态对应的 (是否暂停, 间隔倍数)。
+        """
+        return state in ("idle", "hidden"), self.fullscreen_factor if state == "fullscreen" else 1
+
+    def _apply_sources(self, state):
+        suspended, factor = self.settings(state)
+        resumed = not suspended and (self.suspended or factor < self.factor)
+        self.state, self.suspended, self.factor = state, suspended, factor
+        for source in self.sources:
+            source.on_policy_change(resumed)
+
+    def _apply_bar(self, bar_, old, state):
+        if state == old:
+            return
+        was_suspended, old_factor = self.settings(old)
+        suspended, factor = self.settings(state)
+        resumed = not suspended and (was_suspended or factor < old_factor)
+        for widget_ in bar_.widgets:
+            interval = getattr(widget_, "update_interval", None)
+            if not isinstance(interval, (int, float)):
+                continue
+            original = self._saved_intervals.setdefault(widget_, interval)
+            if suspended:
+                cancel_widget_timers(widget_)
+                continue
+            widget_.update_interval = original * factor
+            if factor == 1:
+                del self._saved_intervals[widget_]
+            if resumed:
+                cancel_widget_timers(widget_)
+                widget_.timer_setup()
+
+
+def screen_bars(qtile):
+    """
+    # 遍历所有屏幕上的状态栏，返回 (屏幕, 状态栏)；只有间隙没有状态栏的边跳过。
+    """
+    for screen in qtile.screens:
+        for position in ("top", "bottom", "left", "right"):
+            bar_ = getattr(screen, position, None)
+            if getattr(bar_, "widgets", None) is not None:
+                yield screen, bar_
+
+
+def cancel_widget_timers(widget_):
+    for future in widget_._futures:
+        future.cancel()
+    widget_._futures.clear()
@@ -0,0 +1,108 @@
+import re
+import time
+
+
+class RuleIndex:
+    """
+    # 把一组 (目标, Match) 规则编译成索引：单一属性的精确字符串放进字典，
+    # 正则按属性合并成一个预编译的交替式，其余规则（多个条件、func 等）
+    # 才逐条 compare。命中多条时取排在最前的规则，与逐条匹配的结果一致。
+    """
+
+    indexed = ("wm_class", "title", "wm_type")
+
+    def __init__(self, name: str, rules):
+        self.name = name
+        self.rules = list(rules)
+        self.hits = [0] * len(self.rules)
+        self.lookups = 0
+        self.elapsed = 0.0
+        self.exact = {prop: {} for prop in self.indexed}
+        self.patterns = {}
+        self.generic = []
+        self._compile()
+
+    def _compile(self):
+        regexes = {}
+        for i, (_, match) in enumerate(self.rules):
+            props = getattr(match, "_rules", None) or {}
+            if len(props) != 1 or next(iter(props)) not in self.indexed:
+                self.generic.append(i)
+                continue
+            prop, value = next(iter(props.items()))
+            if isinstance(value, str):
+                self.exact[prop].setdefault(value, i)
+            elif isinstance(value, re.Pattern) and not value.groups:
+                # 带分组的正则合并后组号会错位（反向引用失效），只合并无分组的
+                regexes.setdefault((prop, value.flags), []).append((i, value.pattern))
+            else:
+                self.generic.append(i)
+        for (prop, flags), items in regexes.items():
+            try:
+                merged = re.compile("|".join(f"(?P<r{i}>{pattern})" for i, pattern in items), flags)
+            except re.error:
+                # 带内联标志等无法合并的正则退回逐条匹配
+                self.generic.extend(i for i, _ in items)
+                continue
+            self.patterns.setdefault(prop, []).append(merged)
+        self.generic.sort()
+
+    @staticmethod
+    def _values(win, prop):
+        if prop == "title":
+            value = win.name
+            return (value,) if value is not None else ()
+        if prop == "wm_type":
+            value = win.get_wm_type()
+            return (value,) if value is not None else ()
+        return win.get_wm_class() or ()
+
+    def _find(self, win):
+        best = len(self.rules)
+        for prop in self.indexed:
+            values = self._values(win, prop)
+            exact = self.exact[prop]
+            for value in values:
+                best = min(best, exact.get(value, best))
+            for merged in self.patterns.get(prop, ()):
+                for value in values:
+                    found = merged.match(value)
+                    if found:
+                        best = min(best, int(found.lastgroup[1:]))
+        for i in self.generic:
+            if i >= best:
+                break
+            if self.rules[i][1].compare(win):
+                best = i
+                break
+        return best if best < len(self.rules) else None
+
+    def target(self, win):
+        """
+        # 返回第一条匹配规则的目标，没有匹配时返回 None。
+        """
+        start = time.perf_counter()
+        index = self._find(win)
+        self.elapsed += time.perf_counter() - start
+        self.lookups += 1
+        if index is None:
+            return None
+        self.hits[index] += 1
+        return self.rules[index][0]
+
+    def status(self) -> str:
+        average = 1e6 * self.elapsed / self.lookups if self.lookups else 0
+        lines = [
+            f"{self.name}：{len(self.rules)} 条规则（精确 "
+            f"{sum(len(table) for table in self.exact.values())}，"
+            f"正则组 {sum(len(p) for p in self.patterns.values())}，逐条 {len(self.generic)}）",
+            f"查询 {self.lookups} 次，平均 {average:.1f} µs",
+        ]
+        lines.extend(
+            f"  {hits:>5}  {match!r}"
+            for hits, (_, match) in sorted(
+                zip(self.hits, self.rules), key=lambda item: item[0], reverse=True
+            )
+            if hits
+        )
+        return "\n".join(lines)
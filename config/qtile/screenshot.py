@@ -0,0 +1,516 @@
+from libqtile.utils import create_task, send_notification # pyright: ignore[reportMissingImports]
+import asyncio
+import cairocffi
+import io
+import os
+import struct
+import time
+
+
+class NativeUnavailable(RuntimeError):
+    """
+    # 内置截图依赖的 qtile/xcffib 内部接口不可用（版本变化、非 X11 等）。
+    """
+
+
+def x_change_property(conn, window: int, prop: int, type_: int, fmt: int, data: bytes):
+    """
+    # 直接发送 ChangeProperty（PropMode.Replace）。xcffib 自带的封装逐字节打包
+    # 数据，几 MB 的图片要花上秒级时间；超长时 xcb 会自动使用 BIG-REQUESTS。
+    """
+    header = struct.pack("=xB2xIIIB3xI", 0, window, prop, type_, fmt, len(data) * 8 // fmt)
+    try:
+        conn.core.send_request(18, io.BytesIO(header + data))
+    except (AttributeError, TypeError):
+        # xcffib 改了内部的 send_request，退回公开但较慢的封装
+        from xcffib.xproto import PropMode  # pyright: ignore[reportMissingImports]
+
+        values = data if fmt == 8 else struct.unpack(f"={len(data) // 4}I", data)
+        conn.core.ChangeProperty(PropMode.Replace, window, prop, type_, fmt, len(values), values)
+
+
+def x_get_image(conn, root: int, x: int, y: int, width: int, height: int) -> bytearray:
+    """
+    # 从 X 服务器读取根窗口上一块区域的像素（ZPixmap，每像素 4 字节 BGRX，
+    # 与 cairo 的 RGB24 相同）。直接拷贝回复的原始缓冲区，不让 xcffib 把
+    # 几百万个字节拆成 Python 列表。cdata/known_max 是 xcffib 的内部属性，
+    # 没有时抛出 NativeUnavailable，由调用方改用 maim。
+    """
+    from xcffib import ffi as xcb_ffi  # pyright: ignore[reportMissingImports]
+    from xcffib.xproto import ImageFormat  # pyright: ignore[reportMissingImports]
+
+    cookie = conn.core.GetImage(ImageFormat.ZPixmap, root, x, y, width, height, 0xFFFFFFFF)
+    reply = cookie.conn.wait_for_reply(cookie.sequence)
+    try:
+        raw = xcb_ffi.buffer(reply.cdata, reply.known_max)
+    except (AttributeError, TypeError) as error:
+        raise NativeUnavailable(f"xcffib 的回复缓冲区不可用：{error}") from error
+    depth = bytes(raw[0:2])[1]
+    pixels = bytearray(raw[32:])
+    if depth not in (24, 32) or len(pixels) != width * height * 4:
+        raise ValueError(f"不支持的像素格式：深度 {depth}，{len(pixels)} 字节")
+    return pixels
+
+
+def encode_png(pixels: bytearray, width: int, height: int) -> bytes:
+    """
+    # 把 BGRX 像素编码成 PNG，在线程池里调用。
+    """
+    surface = cairocffi.ImageSurface.create_for_data(pixels, cairocffi.FORMAT_RGB24, width, height, width * 4)
+    output = io.BytesIO()
+    surface.write_to_png(output)
+    surface.finish()
+    return output.getvalue()
+
+
+class ScreenshotHistory:
+    """
+    # 截图历史：每张截图保存成一个 PNG 文件，总大小超过 max_bytes 时删除最旧的。
+    # add 和 read 会在线程池里调用。
+    """
+
+    def __init__(self, directory: str = "~/.cache/qtile/screenshots", max_bytes: int = 200 * 1024 * 1024):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.evictions = 0
+
+    def add(self, png: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        path = os.path.join(
+            self.directory, time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}.png"
+        )
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(png)
+        os.replace(temporary, path)
+        self._evict(keep=path)
+        return path
+
+    @staticmethod
+    def read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def entries(self):
+        """
+        # [(路径, 大小, mtime)]，最新的在前。
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".png")]
+        except FileNotFoundError:
+            return []
+        stats = [(entry.path, entry.stat()) for entry in entries]
+        stats.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        return [(path, stat.st_size, stat.st_mtime) for path, stat in stats]
+
+    def _evict(self, keep: str):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.unlink(path)
+            total -= size
+            self.evictions += 1
+
+
+class ClipboardOwner:
+    """
+    # 由 WM 自己持有 CLIPBOARD 选区并响应粘贴请求（仅 X11），不再留一个 xclip
+    # 进程。qtile 按 handle_<事件名> 在 core 上分发没有对应窗口的事件，这里把
+    # SelectionRequest/SelectionClear 的处理函数挂到 core 上；数据超过 chunk
+    # 时按 ICCCM 的 INCR 协议分块发送，PropertyNotify 先经过这里再交给 qtile。
+    # 按 ICCCM 2.1 用服务器时间戳（core.get_valid_timestamp）取得选区，早于这个
+    # 时间的请求一律拒绝。这些都是 qtile 的内部接口，缺少时 own 抛出 NativeUnavailable。
+    """
+
+    chunk = 256 * 1024
+
+    def __init__(self, mime: str = "image/png"):
+        self.mime = mime
+        self.data = b""
+        self.core = None
+        self.window = None
+        self.acquired = 0  # 取得选区时的服务器时间戳
+        self.transfers = {}  # (请求窗口, 属性) -> 剩余数据
+        self.served = 0
+        self.incremental = 0
+        self.refused = 0
+
+    def _install(self, qtile):
+        core = qtile.core
+        if self.core is core:
+            return
+        if core.name != "x11" or not all(
+            callable(getattr(type(core), name, None)) for name in ("handle_PropertyNotify", "get_valid_timestamp")
+        ):
+            raise NativeUnavailable("qtile 的 core 不支持挂接 X 事件")
+        self.core = core
+        self.window = core.conn.create_window(-1, -1, 1, 1)
+        core.handle_SelectionRequest = self.handle_request
+        core.handle_SelectionClear = self.handle_clear
+        core.handle_PropertyNotify = self.handle_property
+
+    def own(self, qtile, data: bytes):
+        self._install(qtile)
+        conn = self.core.conn
+        clipboard = conn.atoms["CLIPBOARD"]
+        # ICCCM 不允许用 CurrentTime 取得选区；时间戳比上一次选区变化还早时服务器
+        # 会忽略请求，所以再查一次确认。之后被别的程序接管时会收到 SelectionClear
+        timestamp = self.core.get_valid_timestamp()
+        conn.conn.core.SetSelectionOwner(self.window.wid, clipboard, timestamp)
+        if conn.conn.core.GetSelectionOwner(clipboard).reply().owner != self.window.wid:
+            raise RuntimeError("没能取得剪贴板")
+        self.data = data
+        self.acquired = timestamp
+
+    def handle_request(self, event):
+        from xcffib.xproto import CW, EventMask, SelectionNotifyEvent  # pyright: ignore[reportMissingImports]
+
+        conn = self.core.conn
+        atoms = conn.atoms
+        # 过时的客户端不给属性名时用 target 作属性名
+        prop = event.property or event.target
+        if event.owner != self.window.wid or not self.data or 0 < event.time < self.acquired:
+            prop = 0
+        elif event.target == atoms["TARGETS"]:
+            targets = struct.pack("=3I", atoms["TARGETS"], atoms["TIMESTAMP"], atoms[self.mime])
+            x_change_property(conn.conn, event.requestor, prop, atoms["ATOM"], 32, targets)
+        elif event.target == atoms["TIMESTAMP"]:
+            x_change_property(conn.conn, event.requestor, prop, atoms["INTEGER"], 32, struct.pack("=I", self.acquired))
+        elif event.target == atoms[self.mime]:
+            self.served += 1
+            # 请求窗口是 qtile 管理的窗口时不能改它的事件掩码，只能一次发完
+            if len(self.data) <= self.chunk or event.requestor in self.core.qtile.windows_map:
+                x_change_property(conn.conn, event.requestor, prop, atoms[self.mime], 8, self.data)
+            else:
+                self.incremental += 1
+                conn.conn.core.ChangeWindowAttributes(event.requestor, CW.EventMask, [EventMask.PropertyChange])
+                self.transfers[(event.requestor, prop)] = memoryview(self.data)
+                x_change_property(conn.conn, event.requestor, prop, atoms["INCR"], 32, struct.pack("=I", len(self.data)))
+        else:
+            self.refused += 1
+            prop = 0
+        notify = SelectionNotifyEvent.synthetic(event.time, event.requestor, event.selection, event.target, prop)
+        conn.conn.core.SendEvent(False, event.requestor, EventMask.NoEvent, notify.pack())
+        conn.flush()
+
+    def handle_property(self, event):
+        from xcffib.xproto import CW, Property  # pyright: ignore[reportMissingImports]
+
+        key = (event.window, event.atom)
+        remaining = self.transfers.get(key)
+        if remaining is None:
+            return type(self.core).handle_PropertyNotify(self.core, event)
+        if event.state != Property.Delete:
+            return
+        conn = self.core.conn
+        # 最后发一个空块表示结束
+        piece, self.transfers[key] = remaining[: self.chunk], remaining[self.chunk :]
+        x_change_property(conn.conn, event.window, event.atom, conn.atoms[self.mime], 8, bytes(piece))
+        if not piece:
+            del self.transfers[key]
+            conn.conn.core.ChangeWindowAttributes(event.window, CW.EventMask, [0])
+        conn.flush()
+
+    def handle_clear(self, event):
+        # 别的程序接管了剪贴板
+        if self.window is not None and event.owner == self.window.wid:
+            self.data = b""
+            self.transfers.clear()
+
+    def stop(self):
+        if self.core is None:
+            return
+        for name in ("handle_SelectionRequest", "handle_SelectionClear", "handle_PropertyNotify"):
+            vars(self.core).pop(name, None)
+        self.core.conn.conn.core.DestroyWindow(self.window.wid)
+        self.core = self.window = None
+        self.data = b""
+        self.transfers.clear()
+
+
+class RegionSelector:
+    """
+    # 在 WM 里直接选择截图区域：抓住指针和键盘，拖动时用四个内部窗口在选区
+    # 外侧画出边框。只点击不拖动时选中指针下的窗口（没有窗口时选中整个屏幕），
+    # 右键或 Esc 取消。选择期间 core 上的鼠标和按键事件都交给这里处理，
+    # core 没有这些处理函数时抛出 NativeUnavailable。
+    """
+
+    events = ("ButtonPress", "ButtonRelease", "MotionNotify", "KeyPress")
+    border = 2
+
+    def __init__(self, qtile, colour: str, on_done):
+        self.qtile = qtile
+        self.pixel = 0xFF000000 | int(colour.lstrip("#")[:6], 16)
+        self.on_done = on_done
+        self.origin = None
+        self.edges = []
+
+    def start(self) -> bool:
+        from xcffib.xproto import EventMask, GrabMode, GrabStatus, Time  # pyright: ignore[reportMissingImports]
+
+        core = self.qtile.core
+        if core.name != "x11" or not all(callable(getattr(type(core), f"handle_{name}", None)) for name in self.events):
+            raise NativeUnavailable("qtile 的 core 不支持挂接 X 事件")
+        conn = core.conn
+        root = conn.default_screen.root.wid
+        mask = EventMask.ButtonPress | EventMask.ButtonRelease | EventMask.PointerMotion
+        reply = conn.conn.core.GrabPointer(
+            False, root, mask, GrabMode.Async, GrabMode.Async, 0, conn.cursors["crosshair"], Time.CurrentTime
+        ).reply()
+        if reply.status != GrabStatus.Success:
+            return False
+        reply = conn.conn.core.GrabKeyboard(False, root, Time.CurrentTime, GrabMode.Async, GrabMode.Async).reply()
+        if reply.status != GrabStatus.Success:
+            conn.conn.core.UngrabPointer(Time.CurrentTime)
+            return False
+        for name in self.events:
+            setattr(core, f"handle_{name}", getattr(self, f"_{name}"))
+        return True
+
+    def _rect(self, event):
+        x0, y0 = self.origin
+        x1, y1 = event.root_x, event.root_y
+        return min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1
+
+    def _ButtonPress(self, event):  # noqa: N802
+        if event.detail != 1:
+            self.finish(None)
+            return
+        self.origin = (event.root_x, event.root_y)
+
+    def _MotionNotify(self, event):  # noqa: N802
+        if self.origin is not None:
+            self._draw(*self._rect(event))
+
+    def _ButtonRelease(self, event):  # noqa: N802
+        if event.detail != 1 or self.origin is None:
+            return
+        x, y, width, height = self._rect(event)
+        if width <= 3 and height <= 3:
+            x, y, width, height = self._window_at(event.child, event.root_x, event.root_y)
+        self.finish((x, y, width, height))
+
+    def _KeyPress(self, event):  # noqa: N802
+        # 只认 Esc：按住 Mod+a 时的自动重复不应取消选择
+        from libqtile.backend.x11.xkeysyms import keysyms  # pyright: ignore[reportMissingImports]
+
+        if self.qtile.core.conn.keycode_to_keysym(event.detail, 0) == keysyms["Escape"]:
+            self.finish(None)
+
+    def _window_at(self, child: int, x: int, y: int):
+        if child:
+            geometry = self.qtile.core.conn.conn.core.GetGeometry(child).reply()
+            border = geometry.border_width
+            return geometry.x, geometry.y, geometry.width + 2 * border, geometry.height + 2 * border
+        screen = self.qtile.find_screen(x, y) or self.qtile.current_screen
+        return screen.x, screen.y, screen.width, screen.height
+
+    def _draw(self, x, y, width, height):
+        if not self.edges:
+            for _ in range(4):
+                edge = self.qtile.core.create_internal(x, y, 1, 1)
+                edge.window.set_attribute(backpixel=self.pixel)
+                edge.unhide()
+                self.edges.append(edge)
+        b = self.border
+        rects = (
+            (x - b, y - b, width + 2 * b, b),
+            (x - b, y + height, width + 2 * b, b),
+            (x - b, y, b, height),
+            (x + width, y, b, height),
+        )
+        for edge, (ex, ey, ew, eh) in zip(self.edges, rects):
+            edge.place(ex, ey, max(ew, 1), max(eh, 1), 0, None)
+
+    def finish(self, region):
+        from xcffib.xproto import Time  # pyright: ignore[reportMissingImports]
+
+        core = self.qtile.core
+        for name in self.events:
+            vars(core).pop(f"handle_{name}", None)
+        core.conn.conn.core.UngrabPointer(Time.CurrentTime)
+        core.conn.conn.core.UngrabKeyboard(Time.CurrentTime)
+        for edge in self.edges:
+            edge.kill()
+        self.edges = []
+        core.conn.flush()
+        self.on_done(region)
+
+
+class Screenshotter:
+    """
+    # 内置截图（X11）：选好区域后直接用 GetImage 从 X 服务器读取像素，PNG
+    # 编码和写入历史放在线程池里，不阻塞事件循环；编码完成后由 ClipboardOwner
+    # 持有剪贴板，不需要常驻的 xclip 进程。
+    # 内置路径用到了 qtile/xcffib 的内部接口，任何一处不可用（Wayland、版本
+    # 变化）都退回原来的 maim | xclip；剪贴板单独失败时只把 PNG 交给 xclip。
+    """
+
+    capture_delay = 0.05  # 等合成器擦掉选框后再读像素
+    fallback_command = "maim {geometry} | xclip -selection clipboard -t image/png -i"
+
+    def __init__(self):
+        self.clipboard = ClipboardOwner()
+        self.history = ScreenshotHistory()
+        self.selector = None
+        self.captures = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.unavailable = None  # 内置截图不可用的原因
+        self.grab_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.last = None  # (宽, 高, PNG 字节数)
+
+    def capture(self, qtile, colour: str):
+        """
+        # 选择区域并截图到剪贴板和历史，colour 是选框的颜色。
+        """
+        if self.selector is not None:
+            return
+        if self.unavailable is not None:
+            self.fallback(qtile)
+            return
+        self.selector = RegionSelector(qtile, colour, lambda region: self._selected(qtile, region))
+        try:
+            started = self.selector.start()
+        except Exception as error:
+            self.selector = None
+            self._unavailable(error)
+            self.fallback(qtile)
+            return
+        if not started:
+            self.selector = None
+            send_notification("截图", "无法抓取指针或键盘")
+
+    def fallback(self, qtile, region=None):
+        """
+        # 用 maim | xclip 截图，region 为 None 时由 maim 自己选择区域。
+        """
+        if region is None:
+            geometry = "-s"
+        else:
+            x, y, width, height = region
+            geometry = f"-g {width}x{height}+{x}+{y}"
+        self.fallbacks += 1
+        qtile.spawn(self.fallback_command.format(geometry=geometry), shell=True)
+
+    def _unavailable(self, error):
+        self.unavailable = str(error)
+        print(f"内置截图不可用，改用 maim：{error}")
+
+    def _selected(self, qtile, region):
+        self.selector = None
+        if region is not None:
+            qtile.call_later(self.capture_delay, self._grab, qtile, region)
+
+    def _grab(self, qtile, region):
+        x, y, width, height = region
+        started = time.perf_counter()
+        conn = qtile.core.conn
+        try:
+            pixels = x_get_image(conn.conn, conn.default_screen.root.wid, x, y, width, height)
+        except NativeUnavailable as error:
+            self._unavailable(error)
+            self.fallback(qtile, region)
+            return
+        except Exception as error:
+            self._failed(error)
+            return
+        self.grab_seconds = time.perf_counter() - started
+        create_task(self._store(qtile, pixels, width, height))
+
+    async def _store(self, qtile, pixels, width, height):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            png = await loop.run_in_executor(None, encode_png, pixels, width, height)
+            self.encode_seconds = time.perf_counter() - started
+            await self._copy(qtile, png)
+            await loop.run_in_executor(None, self.history.add, png)
+        except Exception as error:
+            self._failed(error)
+            return
+        self.captures += 1
+        self.last = (width, height, len(png))
+        send_notification("截图", f"{width}×{height} 已复制到剪贴板")
+
+    async def _copy(self, qtile, png: bytes):
+        try:
+            self.clipboard.own(qtile, png)
+            return
+        except Exception as error:
+            print(f"无法由 qtile 持有剪贴板，改用 xclip：{error}")
+        process = await asyncio.create_subprocess_exec(
+            "xclip", "-selection", "clipboard", "-t", "image/png", "-i", stdin=asyncio.subprocess.PIPE
+        )
+        await process.communicate(png)
+
+    def _failed(self, error):
+        self.failures += 1
+        print(f"截图失败：{error}")
+        send_notification("截图失败", str(error))
+
+    def pick_history(self, qtile):
+        """
+        # 用 rofi 从截图历史里选一张重新放到剪贴板。
+        """
+        create_task(self._pick(qtile))
+
+    async def _pick(self, qtile):
+        entries = self.history.entries()
+        if not entries:
+            send_notification("截图", "还没有截图历史")
+            return
+        lines = "\n".join(
+            f"{time.strftime('%m-%d %H:%M:%S', time.localtime(mtime))}  {size / 1024:.0f} KiB"
+            for _, size, mtime in entries
+        )
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "rofi", "-dmenu", "-i", "-format", "i", "-p", "截图历史",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+        except OSError as error:
+            self._failed(error)
+            return
+        stdout, _ = await process.communicate(lines.encode())
+        # 取消时 rofi 没有输出；returncode 会被 qtile 的 SIGCHLD 处理抢走，不可靠
+        choice = stdout.decode().strip()
+        if not choice.isdigit() or int(choice) >= len(entries):
+            return
+        path = entries[int(choice)][0]
+        try:
+            png = await asyncio.get_running_loop().run_in_executor(None, self.history.read, path)
+            await self._copy(qtile, png)
+        except OSError as error:
+            self._failed(error)
+            return
+        send_notification("截图", f"{os.path.basename(path)} 已复制到剪贴板")
+
+    def stop(self):
+        self.clipboard.stop()
+
+    def status(self) -> str:
+        entries = self.history.entries()
+        lines = [
+            f"截图 {self.captures} 张，失败 {self.failures} 次，maim {self.fallbacks} 次",
+            f"历史 {len(entries)} 张，{sum(size for _, size, _ in entries) / 2**20:.1f}/"
+            f"{self.history.max_bytes / 2**20:.0f} MiB，淘汰 {self.history.evictions}",
+            f"剪贴板请求 {self.clipboard.served} 次（分块 {self.clipboard.incremental}，拒绝 {self.clipboard.refused}）",
+        ]
+        if self.unavailable is not None:
+            lines.append(f"内置截图不可用：{self.unavailable}")
+        if self.last is not None:
+            width, height, size = self.last
+            lines.append(
+                f"上一张 {width}×{height}，{size / 1024:.0f} KiB，读取 {self.grab_seconds * 1000:.1f} ms，"
+                f"编码 {self.encode_seconds * 1000:.1f} ms"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,407 @@
+from typing import NamedTuple
+import os
+import struct
+import time
+
+
+class GroupSnapshot(NamedTuple):
+    name: str
+    layout: str
+    members: tuple  # 组里所有窗口（含浮动窗口）在窗口表中的序号
+    columns: tuple  # Columns 布局：((宽度, 是否拆分, ((序号, 高度), ...)), ...)
+    ratio: float  # MonadTall 主区比例，没有该布局时为 0
+    sizes: tuple  # MonadTall 副区窗口的相对高度
+    tiled: tuple  # MonadTall 的窗口顺序
+
+
+class SessionStore:
+    """
+    # 会话快照：每个组用哪个布局、Columns 的列宽/拆分/窗口高度、MonadTall 的
+    # 比例和窗口顺序，以及每个窗口在哪个组。布局变化后去抖写入一个紧凑的二进制
+    # 文件（临时文件 + os.replace，内容没变就不写），重新加载配置或重启前立即写入。
+    # 启动后一次性恢复：重新加载或重启前就存在的窗口先按 pid + wm_class、再按
+    # wm_class 认领，放回原来的组并重建布局；之后一段时间内新出现的窗口在
+    # client_new 时只按 pid + wm_class 认领，重新登录后新启动的同类程序不会被
+    # 错认成快照里的窗口。
+    """
+
+    magic = b"QSN1"
+    debounce = 2.0
+    check_interval = 30  # lazy.layout 的调整没有 hook，定期比较一次
+    restore_window = 120  # 启动后多长时间内到来的窗口还按快照认领
+    apply_delay = 0.1
+
+    def __init__(self, wheel, tracked, path: str = "~/.cache/qtile/session.bin"):
+        self.wheel = wheel
+        self.tracked = tracked  # 判断组是否参与快照（排除 ScratchPad）
+        self.path = os.path.expanduser(path) if path else None
+        self.qtile = None
+        self.last_bytes = None
+        self.written = 0
+        self.skipped = 0
+        self.save_seconds = 0.0
+        self.snapshots = {}
+        self.owners = {}
+        self.by_pid = {}
+        self.by_class = {}
+        self.claimed = {}
+        self.restored = 0
+        self.deadline = 0.0
+        self._handle = None
+        self._job = None
+        self._apply_handle = None
+        self._apply_queue = set()
+
+    def start(self, qtile):
+        self.qtile = qtile
+        if self._job is None and self.path is not None:
+            self._job = self.wheel.every(self.check_interval, self.save)
+
+    def stop(self):
+        for handle in (self._handle, self._apply_handle, self._job):
+            if handle is not None:
+                handle.cancel()
+        self._handle = self._apply_handle = self._job = None
+
+    @staticmethod
+    def window_key(win):
+        wm_class = "\x1f".join(win.get_wm_class() or ())
+        try:
+            pid = int(win.get_pid() or 0)
+        except (TypeError, ValueError):
+            pid = 0
+        return pid, wm_class
+
+    @staticmethod
+    def _pack_text(parts: list, text: str):
+        data = text.encode()[:255]
+        parts.append(struct.pack("<B", len(data)))
+        parts.append(data)
+
+    def encode(self, qtile) -> bytes:
+        refs = {}
+        table = []
+        groups = []
+        for group in qtile.groups:
+            if not self.tracked(group):
+                continue
+            members = []
+            for win in group.windows:
+                if not hasattr(win, "togroup") or not win.get_wm_class():
+                    continue
+                refs[win] = len(table)
+                table.append(self.window_key(win))
+                members.append(refs[win])
+            groups.append((group, members))
+
+        parts = [self.magic, struct.pack("<HH", len(table), len(groups))]
+        for pid, wm_class in table:
+            parts.append(struct.pack("<I", pid & 0xFFFFFFFF))
+            self._pack_text(parts, wm_class)
+        for group, members in groups:
+            self._pack_text(parts, group.name)
+            self._pack_text(parts, group.layout.name)
+            parts.append(struct.pack(f"<H{len(members)}H", len(members), *members))
+            columns = next((obj for obj in group.layouts if obj.name == "columns"), None)
+            column_list = columns.columns if columns is not None else ()
+            parts.append(struct.pack("<H", len(column_list)))
+            for column in column_list:
+                entries = [(refs[win], column.heights.get(win, 100)) for win in column.clients if win in refs]
+                parts.append(struct.pack("<hBH", int(column.width), bool(column.split), len(entries)))
+                for ref, height in entries:
+                    parts.append(struct.pack("<Hh", ref, int(height)))
+            monad = next((obj for obj in group.layouts if obj.name == "monadtall"), None)
+            if monad is None:
+                parts.append(struct.pack("<fHH", 0.0, 0, 0))
+                continue
+            sizes = list(monad.relative_sizes)
+            tiled = [refs[win] for win in monad.clients.clients if win in refs]
+            parts.append(struct.pack(f"<fH{len(sizes)}f", monad.ratio, len(sizes), *sizes))
+            parts.append(struct.pack(f"<H{len(tiled)}H", len(tiled), *tiled))
+        return b"".join(parts)
+
+    def decode(self, data: bytes):
+        if data[:4] != self.magic:
+            raise ValueError("不是会话快照文件")
+        offset = 4
+
+        def unpack(fmt):
+            nonlocal offset
+            values = struct.unpack_from(fmt, data, offset)
+            offset += struct.calcsize(fmt)
+            return values
+
+        def text():
+            nonlocal offset
+            (length,) = unpack("<B")
+            offset += length
+            if offset > len(data):
+                raise ValueError("会话快照被截断")
+            return data[offset - length:offset].decode()
+
+        count, group_count = unpack("<HH")
+        table = []
+        for _ in range(count):
+            (pid,) = unpack("<I")
+            table.append((pid, text()))
+        snapshots = []
+        for _ in range(group_count):
+            name, layout_name = text(), text()
+            (length,) = unpack("<H")
+            members = unpack(f"<{length}H")
+            (column_count,) = unpack("<H")
+            columns = []
+            for _ in range(column_count):
+                width, split, length = unpack("<hBH")
+                entries = unpack("<" + "Hh" * length)
+                columns.append((width, bool(split), tuple(zip(entries[::2], entries[1::2]))))
+            ratio, length = unpack("<fH")
+            sizes = unpack(f"<{length}f")
+            (length,) = unpack("<H")
+            tiled = unpack(f"<{length}H")
+            snapshots.append(GroupSnapshot(name, layout_name, members, tuple(columns), ratio, sizes, tiled))
+        if any(ref >= count for snapshot in snapshots for ref in snapshot.members):
+            raise ValueError("会话快照引用了不存在的窗口")
+        return table, snapshots
+
+    def changed(self):
+        if self.path is not None and self.qtile is not None and self._handle is None:
+            self._handle = self.qtile.call_later(self.debounce, self.save)
+
+    def restoring(self) -> bool:
+        if self.owners and time.monotonic() > self.deadline:
+            self._finish()
+        return bool(self.owners)
+
+    def save(self, force: bool = False):
+        """
+        # 写入快照。还在等窗口认领时不写，免得把只恢复了一半的状态存下来；
+        # 重新加载和重启前的 force 写入除外。
+        """
+        self._handle = None
+        if self.path is None or self.qtile is None or (not force and self.restoring()):
+            return
+        started = time.perf_counter()
+        try:
+            data = self.encode(self.qtile)
+        except (struct.error, AttributeError) as error:
+            print(f"生成会话快照失败: {error}")
+            return
+        if data == self.last_bytes:
+            self.skipped += 1
+            return
+        temporary = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary, "wb") as file:
+                file.write(data)
+            os.replace(temporary, self.path)
+        except OSError as error:
+            print(f"写入会话快照失败: {error}")
+            return
+        self.last_bytes = data
+        self.written += 1
+        self.save_seconds = time.perf_counter() - started
+
+    def load(self):
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+            loaded = self.decode(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error, ValueError) as error:
+            print(f"读取会话快照失败: {error}")
+            return None
+        self.last_bytes = data
+        return loaded
+
+    def restore(self, qtile):
+        """
+        # startup hook：完整重新加载和重启后布局对象是新建的，按快照一次性恢复；
+        # 增量重新加载沿用了原来的布局对象，直接跳过。
+        """
+        self.start(qtile)
+        layouts = [obj for group in qtile.groups if self.tracked(group) for obj in group.layouts]
+        if all(getattr(obj, "_session_restored", False) for obj in layouts):
+            return
+        for obj in layouts:
+            obj._session_restored = True
+        loaded = self.load()
+        if loaded is None:
+            return
+        table, snapshots = loaded
+        self.snapshots = {
+            snapshot.name: snapshot
+            for snapshot in snapshots
+            if self.tracked(qtile.groups_map.get(snapshot.name))
+        }
+        self.owners = {ref: snapshot.name for snapshot in self.snapshots.values() for ref in snapshot.members}
+        self.by_pid, self.by_class, self.claimed = {}, {}, {}
+        for ref in sorted(self.owners):
+            pid, wm_class = table[ref]
+            self.by_pid.setdefault((pid, wm_class), []).append(ref)
+            self.by_class.setdefault(wm_class, []).append(ref)
+        self.deadline = time.monotonic() + self.restore_window
+
+        touched = set()
+        windows = list(qtile.windows_map.values())
+        # 先全部按 pid 认领，剩下的再按 wm_class，换了 pid 的窗口不会占掉别人的位置
+        for by_class in (False, True):
+            for win in windows:
+                name = self.claim(win, by_class)
+                if name is not None:
+                    touched.add(name)
+        for name, snapshot in self.snapshots.items():
+            group = qtile.groups_map[name]
+            if snapshot.layout != group.layout.name and any(obj.name == snapshot.layout for obj in group.layouts):
+                group.layout = snapshot.layout
+            if name in touched:
+                self.apply(qtile, group)
+        if len(self.claimed) == len(self.owners):
+            self._finish()
+
+    def claim(self, win, by_class: bool = False):
+        """
+        # 按 pid + wm_class（by_class 为 True 时再按 wm_class）认领快照中的窗口
+        # 并放回原来的组，返回组名。
+        """
+        if not self.restoring() or not hasattr(win, "togroup"):
+            return None
+        if win.group is not None and not self.tracked(win.group):
+            return None
+        pid, wm_class = self.window_key(win)
+        if not wm_class or win.wid in self.claimed.values():
+            return None
+        candidates = self.by_pid.get((pid, wm_class), [])
+        if by_class:
+            candidates = candidates + self.by_class.get(wm_class, [])
+        ref = next((ref for ref in candidates if ref not in self.claimed), None)
+        if ref is None:
+            return None
+        self.claimed[ref] = win.wid
+        self.restored += 1
+        name = self.owners[ref]
+        if win.group is None or win.group.name != name:
+            win.togroup(name)
+        return name
+
+    def window_managed(self, qtile, win):
+        # 新窗口被认领后等它加入布局，同一组的多个窗口合并成一次恢复
+        if win.wid not in self.claimed.values() or win.group is None:
+            return
+        self._apply_queue.add(win.group.name)
+        if self._apply_handle is None:
+            self._apply_handle = qtile.call_later(self.apply_delay, self._apply_queued, qtile)
+
+    def _apply_queued(self, qtile):
+        self._apply_handle = None
+        names, self._apply_queue = self._apply_queue, set()
+        for name in names:
+            group = qtile.groups_map.get(name)
+            if group is not None:
+                self.apply(qtile, group)
+        if self.owners and len(self.claimed) == len(self.owners):
+            self._finish()
+
+    def _finish(self):
+        self.snapshots, self.owners, self.by_pid, self.by_class = {}, {}, {}, {}
+        self.claimed = {}
+        self.changed()
+
+    def apply(self, qtile, group):
+        snapshot = self.snapshots.get(group.name)
+        if snapshot is None:
+            return
+        windows = {}
+        for ref, wid in self.claimed.items():
+            win = qtile.windows_map.get(wid)
+            if win is not None and win.group is group and self.owners.get(ref) == group.name:
+                windows[ref] = win
+        for obj in group.layouts:
+            if obj.name == "columns" and snapshot.columns:
+                self._apply_columns(obj, snapshot, windows)
+            elif obj.name == "monadtall" and snapshot.ratio:
+                self._apply_monad(obj, snapshot, windows)
+        group.layout_all()
+
+    @staticmethod
+    def _rescale(values: list, total: int) -> list:
+        """
+        # 按比例缩放成整数且总和为 total（余数加到第一个）。
+        """
+        current = sum(values)
+        if current <= 0:
+            values = [1] * len(values)
+            current = len(values)
+        scaled = [max(1, int(value * total / current)) for value in values]
+        scaled[0] += total - sum(scaled)
+        return scaled
+
+    def _apply_columns(self, layout_, snapshot, windows):
+        tiled = [win for column in layout_.columns for win in column.clients]
+        tiled_set = set(tiled)
+        placed = set()
+        columns = []
+        column_type = type(layout_.columns[0])
+        for width, split, entries in snapshot.columns:
+            column = column_type(split, layout_.insert_position, width)
+            for ref, height in entries:
+                win = windows.get(ref)
+                if win in tiled_set and win not in placed:
+                    placed.add(win)
+                    column.clients.append(win)
+                    column.heights[win] = height
+            if column.clients:
+                columns.append(column)
+        if not columns:
+            return
+        for win in tiled:
+            if win not in placed:
+                columns[-1].clients.append(win)
+                columns[-1].heights[win] = 100
+        for column in columns:
+            heights = self._rescale([column.heights[win] for win in column.clients], 100 * len(column.clients))
+            column.heights = dict(zip(column.clients, heights))
+        for column, width in zip(columns, self._rescale([column.width for column in columns], 100 * len(columns))):
+            column.width = width
+        focused = layout_.cc.cw if layout_.columns else None
+        layout_.columns = columns
+        layout_.current = 0
+        if focused is not None:
+            layout_.focus(focused)
+
+    @staticmethod
+    def _apply_monad(layout_, snapshot, windows):
+        clients = layout_.clients
+        present = set(clients.clients)
+        order = list(dict.fromkeys(
+            windows[ref] for ref in snapshot.tiled if windows.get(ref) in present
+        ))
+        if order:
+            focused = clients.current_client
+            ordered = set(order)
+            clients.clients[:] = order + [win for win in clients.clients if win not in ordered]
+            if focused is not None:
+                clients.current_client = focused
+        layout_.ratio = max(layout_.min_ratio, min(layout_.max_ratio, snapshot.ratio))
+        if snapshot.sizes and len(snapshot.sizes) == len(clients.clients) - 1:
+            total = sum(snapshot.sizes)
+            layout_.relative_sizes = [size / total for size in snapshot.sizes]
+            layout_.do_normalize = False
+
+    def status(self) -> str:
+        size = len(self.last_bytes) if self.last_bytes else 0
+        lines = [
+            f"快照 {self.path or '已禁用'}，{size} 字节",
+            f"写入 {self.written} 次（上次 {self.save_seconds * 1000:.1f} ms），内容未变跳过 {self.skipped} 次",
+            f"恢复时认领窗口 {self.restored} 个",
+        ]
+        if self.restoring():
+            lines.append(
+                f"等待认领 {len(self.owners) - len(self.claimed)} 个窗口，"
+                f"剩余 {self.deadline - time.monotonic():.0f} 秒"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,285 @@
+from metrics import MetricSource
+from typing import NamedTuple
+import heapq
+import os
+import time
+
+
+class SystemSnapshot(NamedTuple):
+    timestamp: float
+    cpu_percent: float
+    mem_total: int
+    mem_used: int
+    net_down: float  # 字节/秒
+    net_up: float
+
+
+class ProcReader:
+    """
+    # 保持 procfs 文件常开，每次从偏移 0 重新读取，省掉反复 open/close。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def read(self) -> bytes:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        return os.pread(self._fd, 65536, 0)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def parse_cpu_times(stat: bytes):
+    """
+    # 解析 /proc/stat 第一行，返回 (忙碌时间, 总时间)。
+    """
+    fields = [int(value) for value in stat.split(b"\n", 1)[0].split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    # guest/guest_nice 已经计入 user/nice
+    total = sum(fields[:8])
+    return total - idle, total
+
+
+def parse_meminfo(meminfo: bytes):
+    """
+    # 解析 /proc/meminfo，返回 (总内存, 已用内存)，单位字节；已用 = 总量 - 可用。
+    """
+    values = {}
+    for line in meminfo.splitlines():
+        key, _, rest = line.partition(b":")
+        if key in (b"MemTotal", b"MemAvailable"):
+            values[key] = int(rest.split()[0]) * 1024
+            if len(values) == 2:
+                break
+    total = values.get(b"MemTotal", 0)
+    return total, total - values.get(b"MemAvailable", total)
+
+
+def parse_net_bytes(net_dev: bytes):
+    """
+    # 汇总 /proc/net/dev 中除 lo 以外所有网卡的 (接收, 发送) 字节数。
+    """
+    down = up = 0
+    for line in net_dev.splitlines()[2:]:
+        name, _, counters = line.partition(b":")
+        if name.strip() == b"lo":
+            continue
+        fields = counters.split()
+        down += int(fields[0])
+        up += int(fields[8])
+    return down, up
+
+
+class ProcCollector(MetricSource):
+    """
+    # /proc 指标采集器。
+    # 每个周期只读一次 /proc/stat、/proc/meminfo 和 /proc/net/dev，计算差值后
+    # 发布一个不可变的 SystemSnapshot，CPU、内存和网速组件都从同一份快照渲染。
+    """
+
+    def __init__(self, wheel, interval: float = 1, proc_root: str = "/proc"):
+        MetricSource.__init__(self)
+        self.wheel = wheel
+        self.interval = interval
+        self._readers = [
+            ProcReader(os.path.join(proc_root, name)) for name in ("stat", "meminfo", "net/dev")
+        ]
+        self._previous = None
+        self._job = None
+
+    def start(self):
+        if self._job is not None:
+            return
+        if self._previous is None:
+            self._previous = self._read()
+        self._schedule()
+
+    def _schedule(self):
+        interval = self.scaled(self.interval)
+        if interval is not None:
+            self._job = self.wheel.every(interval, self.tick)
+
+    def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        self._previous = None
+        for reader in self._readers:
+            reader.close()
+
+    def on_policy_change(self, resumed: bool):
+        if not self.listeners:
+            return
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if resumed and self.scaled(self.interval) is not None:
+            self.tick()
+        self._schedule()
+
+    def _read(self):
+        stat, meminfo, net_dev = (reader.read() for reader in self._readers)
+        return (time.monotonic(), parse_cpu_times(stat), parse_meminfo(meminfo), parse_net_bytes(net_dev))
+
+    def tick(self):
+        try:
+            current = self._read()
+        except (OSError, ValueError, IndexError) as error:
+            print(f"读取 /proc 失败: {error}")
+            return
+        previous, self._previous = self._previous, current
+
+        elapsed = current[0] - previous[0] or self.interval
+        busy = current[1][0] - previous[1][0]
+        total = current[1][1] - previous[1][1]
+        self._publish(
+            SystemSnapshot(
+                timestamp=current[0],
+                cpu_percent=round(busy * 100 / total, 1) if total > 0 else 0.0,
+                mem_total=current[2][0],
+                mem_used=current[2][1],
+                net_down=max(current[3][0] - previous[3][0], 0) / elapsed,
+                net_up=max(current[3][1] - previous[3][1], 0) / elapsed,
+            )
+        )
+
+
+def parse_pid_stat(stat: bytes):
+    """
+    # 解析 /proc/<pid>/stat，返回 (进程名, utime+stime, starttime, rss 页数)。
+    # 进程名可能包含空格和括号，以最后一个 ")" 为界。
+    """
+    left = stat.index(b"(")
+    right = stat.rindex(b")")
+    fields = stat[right + 2 :].split()
+    return (
+        stat[left + 1 : right].decode(errors="replace"),
+        int(fields[11]) + int(fields[12]),
+        int(fields[19]),
+        int(fields[21]),
+    )
+
+
+def parse_pid_io(io_text: bytes) -> int:
+    """
+    # 解析 /proc/<pid>/io，返回真正落到存储上的读写字节数之和。
+    """
+    total = 0
+    for line in io_text.splitlines():
+        key, _, value = line.partition(b":")
+        if key in (b"read_bytes", b"write_bytes"):
+            total += int(value)
+    return total
+
+
+class ProcessState:
+    __slots__ = ("name", "start", "cpu_ticks", "io_bytes", "io_time", "cpu", "rss", "io_rate")
+
+    def __init__(self, name, start, cpu_ticks, rss, io_bytes, io_time):
+        self.name = name
+        self.start = start
+        self.cpu_ticks = cpu_ticks
+        self.io_bytes = io_bytes
+        self.io_time = io_time  # 上次读 io 的时间，跳过几轮后按实际跨度算速率
+        self.cpu = 0.0
+        self.rss = rss
+        self.io_rate = 0.0
+
+
+class ProcessTable:
+    """
+    # 按进程统计 CPU、RSS 和 I/O 的增量表。
+    # 每次 update 只列一次 /proc：新出现的 pid 建表项（进程名只解析一次），消失
+    # 或被复用（starttime 变了）的 pid 删掉；已有的 pid 读 stat 算 CPU 差值。
+    # io 与 CPU 无关地按时间限流：距上次读取不到 io_interval 秒的进程沿用上次的
+    # 速率（下次读到时按两次读取的实际间隔算）；没有权限读 io 的进程以后也不再尝试。
+    """
+
+    io_interval = 3.0
+
+    def __init__(self, proc_root: str = "/proc"):
+        self.proc_root = proc_root
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.processes = {}
+        self.io_reads = 0
+        self.io_skipped = 0
+        self.pruned = 0
+        self._last = None
+
+    def _read(self, pid: int, name: str):
+        try:
+            fd = os.open(f"{self.proc_root}/{pid}/{name}", os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            return None
+        try:
+            return os.read(fd, 4096)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+    def _read_io(self, pid: int):
+        self.io_reads += 1
+        data = self._read(pid, "io")
+        return parse_pid_io(data) if data else None
+
+    def update(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._last if self._last is not None else 0
+        self._last = now
+        pids = {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+        for pid in self.processes.keys() - pids:
+            del self.processes[pid]
+            self.pruned += 1
+
+        for pid in pids:
+            stat = self._read(pid, "stat")
+            try:
+                name, cpu_ticks, start, rss = parse_pid_stat(stat)
+            except (TypeError, ValueError, IndexError):
+                # 读的时候进程刚好退出
+                if self.processes.pop(pid, None) is not None:
+                    self.pruned += 1
+                continue
+            state = self.processes.get(pid)
+            if state is None or state.start != start:
+                self.processes[pid] = ProcessState(
+                    name, start, cpu_ticks, rss * self.page_size, self._read_io(pid), now
+                )
+                continue
+            state.rss = rss * self.page_size
+            delta = cpu_ticks - state.cpu_ticks
+            state.cpu_ticks = cpu_ticks
+            state.cpu = delta * 100 / self.clock_ticks / elapsed if elapsed > 0 else 0.0
+            if state.io_bytes is None or now - state.io_time < self.io_interval:
+                self.io_skipped += 1
+                continue
+            io_bytes = self._read_io(pid)
+            if io_bytes is None:
+                state.io_bytes = None
+                state.io_rate = 0.0
+                continue
+            span = now - state.io_time
+            state.io_rate = (io_bytes - state.io_bytes) / span if span > 0 else 0.0
+            state.io_bytes = io_bytes
+            state.io_time = now
+
+    def top(self, key: str, count: int):
+        """
+        # 按 key（cpu、rss 或 io_rate）返回最大的 count 个 [(pid, ProcessState)]，跳过为 0 的。
+        """
+        return [
+            (pid, state)
+            for pid, state in heapq.nlargest(count, self.processes.items(), key=lambda item: getattr(item[1], key))
+            if getattr(state, key) > 0
+        ]
+
+    def clear(self):
+        self.processes.clear()
+        self._last = None
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入 config.py 同目录的模块（metrics、tiling 等），它们不依赖 qtile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def config():
+    """
+    # 用 benchmark 的假 libqtile 导入 config.py，结束后恢复 sys.modules。
+    """
+    import benchmark
+
+    saved = dict(sys.modules)
+    module, _, _ = benchmark.load_config()
+    yield module
+    sys.modules.clear()
+    sys.modules.update(saved)
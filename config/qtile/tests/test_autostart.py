@@ -0,0 +1,28 @@
+from autostart import Daemon, Supervisor
+
+
+def test_configure_starts_added_daemons_only_while_running(monkeypatch):
+    supervisor = Supervisor([Daemon("picom", ["picom"])])
+    started = []
+    monkeypatch.setattr(supervisor, "start", lambda: started.append(list(supervisor.daemons)))
+    supervisor.configure([Daemon("picom", ["picom"]), Daemon("fcitx5", ["fcitx5", "-d"])])
+    assert started == []
+    supervisor.running = True
+    supervisor.configure([Daemon("picom", ["picom"]), Daemon("dunst", ["dunst"])])
+    assert started == [["picom", "dunst"]]
+    assert supervisor.restarts == {"picom": 0, "fcitx5": 0, "dunst": 0}
+
+
+class Handle:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_stop_cancels_pending_restarts():
+    supervisor = Supervisor([Daemon("picom", ["picom"])])
+    supervisor.running = True
+    handle = supervisor._pending["picom"] = Handle()
+    supervisor.stop()
+    assert handle.cancelled and supervisor._pending == {} and not supervisor.running
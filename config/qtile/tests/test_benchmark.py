@@ -0,0 +1,27 @@
+import benchmark
+
+
+def result(p95_rel=0.3, blocks=0.0, relayouts=1.0):
+    return {"p95_rel": p95_rel, "blocks_per_call": blocks, "relayouts_per_call": relayouts}
+
+
+baseline = {"swap": {"400": {"blocks_per_call": 0.0, "relayouts_per_call": 1.0, "p95_rel": 0.3}}}
+
+
+def test_compare_gates_on_counters_per_window_count():
+    assert benchmark.compare({"swap": {400: result()}}, baseline) == []
+    # 基线里没有的场景或窗口数不比较
+    assert benchmark.compare({"new": {400: result(relayouts=9.0)}, "swap": {1600: result(blocks=9.0)}}, baseline) == []
+    failures = benchmark.compare({"swap": {400: result(blocks=2.5, relayouts=2.0)}}, baseline)
+    assert len(failures) == 2 and all(failure.startswith("swap@400:") for failure in failures)
+
+
+def test_compare_gates_on_relative_p95_with_tolerance():
+    assert benchmark.compare({"swap": {400: result(p95_rel=0.5)}}, baseline, tolerance=1.0) == []
+    failures = benchmark.compare({"swap": {400: result(p95_rel=0.7)}}, baseline, tolerance=1.0)
+    assert len(failures) == 1 and "p95" in failures[0]
+    assert len(benchmark.compare({"swap": {400: result(p95_rel=0.5)}}, baseline, tolerance=0.5)) == 1
+
+
+def test_calibrate_returns_a_positive_time():
+    assert benchmark.calibrate(rounds=5) > 0
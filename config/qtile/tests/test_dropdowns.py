@@ -0,0 +1,65 @@
+import types
+
+import benchmark
+
+
+class FakeScratchPad:
+    """
+    # 只提供 DropDownWarmer 用到的公开接口。
+    """
+
+    def __init__(self):
+        self.dropdowns = {}
+        self.toggled = []
+
+    def dropdown_toggle(self, name):
+        self.toggled.append(name)
+
+
+class FakeQtile:
+    def __init__(self, pad):
+        self.groups_map = {"scratchpad": pad}
+        self.soon = []
+
+    def call_soon(self, func, *args):
+        self.soon.append((func, args))
+
+
+def arrive(qtile, warmer, name, wm_class):
+    # 先运行配置的 client_new，再由 ScratchPad 建 DropDownToggler
+    win = benchmark.FakeWindow(1, wm_class)
+    warmer.window_new(qtile, win)
+    hidden = []
+    pad = qtile.groups_map["scratchpad"]
+    pad.dropdowns[name] = types.SimpleNamespace(window=win, hide=lambda: hidden.append(name))
+    for func, args in qtile.soon:
+        func(*args)
+    qtile.soon.clear()
+    return hidden
+
+
+def test_warmed_dropdowns_are_hidden_when_they_appear(config):
+    warmer = config.DropDownWarmer("scratchpad")
+    pad = FakeScratchPad()
+    qtile = FakeQtile(pad)
+    warmer.warm(qtile)
+    assert pad.toggled == ["btop", "term", "mixer"]
+    assert warmer.pending == {"btop": True, "term": True, "mixer": True}
+    warmer.warm(qtile)
+    assert warmer.warmed == 3
+
+    # 窗口出现之前按下切换键：出现后保持显示
+    warmer.toggle(qtile, "term")
+    assert warmer.cold_toggles == 1 and len(pad.toggled) == 3
+    assert arrive(qtile, warmer, "term", "dropdown-term") == []
+    assert arrive(qtile, warmer, "btop", "dropdown-btop") == ["btop"]
+    assert warmer.pending == {"mixer": True}
+
+    warmer.toggle(qtile, "btop")
+    assert pad.toggled[-1] == "btop" and warmer.cold_toggles == 1
+
+
+def test_match_recognizes_dropdown_windows(config):
+    warmer = config.DropDownWarmer("scratchpad")
+    assert warmer.match(benchmark.FakeWindow(1, "pavucontrol")) == "mixer"
+    assert warmer.match(benchmark.FakeWindow(2, "alacritty")) is None
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import types
+
+import gpu
+from gpu import GpuMonitor, GpuSample, GpuSampler, parse_drm_fdinfo, parse_gpu_line
+
+
+def script(path, body):
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_parse_gpu_line():
+    assert parse_gpu_line("0, 37, 1024, 8192\n") == GpuSample(0, 37.0, 1024.0, 8192.0, "nvidia0")
+    assert parse_gpu_line("1, [N/A], 10, 4096") is None
+    assert parse_gpu_line("NVIDIA-SMI has failed") is None
+
+
+async def collect(source, until, timeout=5):
+    """
+    # 订阅 source，直到 until(收到的样本) 为真或超时，然后退订并停止。
+    """
+    samples = []
+    source.subscribe(samples.append)
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not until(samples) and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    source.listeners.clear()
+    process = source._process
+    source.stop()
+    if process is not None:
+        # 等被杀掉的子进程回收后再关闭事件循环
+        await process.wait()
+    return samples
+
+
+def test_sampler_publishes_fake_nvidia_smi_output_and_restarts(tmp_path):
+    command = script(tmp_path / "nvidia-smi", "printf '0, 37, 1024, 8192\\n1, 5, 10, 4096\\n'\n")
+    sampler = GpuSampler(command=[command], retry_delay=0.01)
+    samples = asyncio.run(collect(sampler, lambda samples: samples.count(None) >= 2))
+    assert samples[:3] == [
+        GpuSample(0, 37.0, 1024.0, 8192.0, "nvidia0"),
+        GpuSample(1, 5.0, 10.0, 4096.0, "nvidia1"),
+        None,
+    ]
+    assert sampler.restarts >= 2
+
+
+def test_sampler_retries_when_nvidia_smi_is_missing(tmp_path):
+    path = tmp_path / "nvidia-smi"
+    sampler = GpuSampler(command=[str(path)], retry_delay=0.01)
+
+    def until(samples):
+        # 启动失败几次之后再装上命令，采样器应该自己恢复
+        if sampler.restarts >= 2 and not path.exists():
+            script(path, "printf '0, 50, 1, 2\\n'\n")
+        return any(samples)
+
+    samples = asyncio.run(collect(sampler, until))
+    assert samples[0] is None
+    assert GpuSample(0, 50.0, 1.0, 2.0, "nvidia0") in samples
+    assert sampler._task is None and sampler._process is None
+
+
+FDINFO = """pos:\t0
+drm-driver:\ti915
+drm-pdev:\t0000:00:02.0
+drm-client-id:\t{client}
+drm-engine-render:\t{render} ns
+drm-engine-video:\t{video} ns
+drm-engine-capacity-video:\t2
+drm-cycles-compute:\t{cycles}
+drm-total-cycles-compute:\t{total}
+drm-resident-local0:\t{resident} KiB
+drm-resident-system0:\t4096 KiB
+"""
+
+
+def fdinfo(client=7, render=0, video=0, cycles=0, total=0, resident=1024):
+    return FDINFO.format(
+        client=client, render=render, video=video, cycles=cycles, total=total, resident=resident
+    ).encode()
+
+
+def test_parse_drm_fdinfo():
+    pdev, client, engines, cycles, resident = parse_drm_fdinfo(fdinfo(render=5000, cycles=10, total=40))
+    assert (pdev, client) == ("0000:00:02.0", 7)
+    assert engines == {"render": 5000, "video": 0}
+    assert cycles == {"compute": (10, 40)}
+    assert resident == 1024 * 1024
+    assert parse_drm_fdinfo(b"pos:\t0\nflags:\t02100002\n") is None
+
+
+class FakeWheel:
+    def __init__(self):
+        self.jobs = []
+
+    def every(self, interval, callback):
+        job = types.SimpleNamespace(interval=interval, callback=callback, cancelled=False)
+        job.cancel = lambda: setattr(job, "cancelled", True)
+        self.jobs.append(job)
+        return job
+
+
+class FakeSampler:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self.listeners.remove(callback)
+
+
+def card(sysfs, name, driver, pdev, **files):
+    device = sysfs / "class" / "drm" / name / "device"
+    device.mkdir(parents=True)
+    (device / "uevent").write_text(f"DRIVER={driver}\nPCI_SLOT_NAME={pdev}\n")
+    for file, value in files.items():
+        (device / file).write_text(f"{value}\n")
+    return device
+
+
+def drm_client(proc, pid, fd, text):
+    (proc / pid / "fd").mkdir(parents=True, exist_ok=True)
+    (proc / pid / "fdinfo").mkdir(exist_ok=True)
+    os.symlink("/dev/dri/renderD128", proc / pid / "fd" / fd)
+    (proc / pid / "fdinfo" / fd).write_bytes(text)
+
+
+def test_monitor_reads_sysfs_and_fdinfo(tmp_path, monkeypatch):
+    sysfs, proc = tmp_path / "sys", tmp_path / "proc"
+    amd = card(
+        sysfs, "card1", "amdgpu", "0000:03:00.0",
+        gpu_busy_percent=42, mem_info_vram_used=2 * 2**30, mem_info_vram_total=8 * 2**30,
+    )
+    card(sysfs, "card0", "i915", "0000:00:02.0")
+    (sysfs / "class" / "drm" / "card0-eDP-1").mkdir()
+    drm_client(proc, "100", "5", fdinfo())
+    # 同一个客户端 dup 出来的 fd 只算一次
+    drm_client(proc, "100", "6", fdinfo())
+    (proc / "100" / "fd" / "0").symlink_to("/dev/null")
+    (proc / "self").mkdir()
+
+    clock = iter([0, 10**9])
+    monkeypatch.setattr(gpu.time, "monotonic_ns", lambda: next(clock))
+    sampler = FakeSampler()
+    monitor = GpuMonitor(FakeWheel(), sampler, sysfs_root=str(sysfs), proc_root=str(proc))
+    samples = []
+    monitor.subscribe(samples.append)
+    assert [card.name for card in monitor.cards] == ["card0", "card1"]
+    assert [card.needs_fdinfo for card in monitor.cards] == [True, False]
+    assert sampler.listeners == []
+    assert len(monitor.fdinfo_paths) == 2
+
+    # 一秒内 render 引擎忙 0.25 秒，compute 周期占 60%，取最忙的引擎
+    for fd in ("5", "6"):
+        (proc / "100" / "fdinfo" / fd).write_bytes(fdinfo(render=250_000_000, cycles=60, total=100))
+    (amd / "gpu_busy_percent").write_text("7\n")
+    monitor.tick()
+    intel, radeon = samples[-1]
+    assert intel == GpuSample(0, 60.0, 1.0, 0.0, "card0")
+    assert radeon == GpuSample(1, 7.0, 2048.0, 8192.0, "card1")
+    assert monitor.scans == 1
+
+    monitor.stop()
+    assert monitor.cards is None and monitor.wheel.jobs[0].cancelled
+
+
+def test_monitor_falls_back_to_nvidia_smi(tmp_path):
+    sysfs = tmp_path / "sys"
+    card(sysfs, "card0", "nvidia", "0000:01:00.0")
+    sampler = FakeSampler()
+    monitor = GpuMonitor(FakeWheel(), sampler, sysfs_root=str(sysfs), proc_root=str(tmp_path / "proc"))
+    samples = []
+    monitor.subscribe(samples.append)
+    assert samples == [None]
+    sampler.listeners[0](GpuSample(0, 12.0, 100.0, 6144.0, "nvidia0"))
+    monitor.tick()
+    assert samples[-1] == (GpuSample(0, 12.0, 100.0, 6144.0, "nvidia0"),)
+    monitor.stop()
+    assert sampler.listeners == []
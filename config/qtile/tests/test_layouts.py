@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture
+def finalized(config, monkeypatch):
+    layouts = []
+    monkeypatch.setattr(config.CachedLayout, "finalize", lambda self: layouts.append(self))
+    return layouts
+
+
+def test_same_key_shares_one_layout(config, finalized):
+    cache = config.LayoutCache()
+    drawer = object()
+    first = cache.get(drawer, "1", "sans", 13, ["#ffffff"])
+    assert cache.get(drawer, "1", "sans", 13, ("#ffffff",)) is first
+    assert cache.get(drawer, "1", "sans", 13, "#ffffff", width=20) is not first
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_evicted_layout_is_finalized_after_last_holder_releases_it(config, finalized):
+    cache = config.LayoutCache(max_entries=1)
+    drawer = object()
+    held = cache.hold(None, cache.get(drawer, "a", "sans", 13, "#fff"))
+    idle = cache.get(drawer, "b", "sans", 13, "#fff")
+    assert held.evicted and finalized == []
+    cache.get(drawer, "c", "sans", 13, "#fff")
+    assert finalized == [idle]
+    cache.hold(held, cache.get(drawer, "c", "sans", 13, "#fff"))
+    assert finalized == [idle, held]
+
+
+def test_discard_keeps_held_layouts_until_released(config, finalized):
+    cache = config.LayoutCache()
+    drawer, other = object(), object()
+    held = cache.hold(None, cache.get(drawer, "a", "sans", 13, "#fff"))
+    idle = cache.get(drawer, "b", "sans", 13, "#fff")
+    kept = cache.get(other, "a", "sans", 13, "#fff")
+    cache.discard(drawer)
+    assert finalized == [idle]
+    assert list(cache.entries.values()) == [kept]
+    cache.release(held)
+    assert finalized == [idle, held]
+
+
+def test_cached_layout_refuses_width_changes(config, finalized):
+    layout = config.LayoutCache().get(object(), "a", "sans", 13, "#fff", width=20)
+    layout.width = 20
+    with pytest.raises(ValueError):
+        layout.width = 30
+    with pytest.raises(ValueError):
+        layout.reset_width()
+
+
+def test_cached_layout_without_width_allows_reset(config, finalized):
+    layout = config.LayoutCache().get(object(), "a", "sans", 13, "#fff")
+    layout.reset_width()
+    with pytest.raises(ValueError):
+        layout.width = 30
@@ -0,0 +1,300 @@
+import types
+
+import metrics
+from metrics import LatencyHistogram, MetricSource, PollPolicy, RingBuffer, TimerWheel
+
+
+def test_ring_buffer_keeps_latest_in_order():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0
+    assert list(buffer.latest(3)) == []
+    for value in range(1, 7):
+        buffer.append(value)
+    assert len(buffer) == 4
+    assert list(buffer.latest(4)) == [3, 4, 5, 6]
+    assert list(buffer.latest(2)) == [5, 6]
+    assert list(buffer.latest(10)) == [3, 4, 5, 6]
+
+
+def test_latency_histogram_bounds_and_percentiles():
+    histogram = LatencyHistogram()
+    for value in (0, 1, 15, 16, 31, 32, 1000, 123456):
+        assert histogram.upper_bound(histogram.index(value)) >= value
+        # 每个 2 的幂区间分 16 格，上界相对误差不超过 1/16
+        assert histogram.upper_bound(histogram.index(value)) <= value + max(value // 16, 1)
+
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert histogram.total == 1000
+    assert histogram.max == 1000
+    assert histogram.percentile(100) == 1000
+    assert 500 <= histogram.percentile(50) <= 500 * 1.07
+    assert 990 <= histogram.percentile(99) <= 1000
+    assert LatencyHistogram().percentile(50) == 0
+
+
+def test_latency_histogram_clamps_huge_values():
+    histogram = LatencyHistogram()
+    histogram.record(10**12)
+    assert histogram.counts[-1] == 1
+    # 超出范围的值都计入最后一格，百分位不超过最后一格的上界
+    assert histogram.percentile(50) == histogram.upper_bound(len(histogram.counts) - 1)
+
+
+class FakeLoop:
+    """
+    # 记录 call_later 的假事件循环，由测试推进时间并触发。
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.pending = []
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, callback):
+        handle = types.SimpleNamespace(when=self.now + delay, callback=callback, cancelled=False)
+        handle.cancel = lambda: setattr(handle, "cancelled", True)
+        self.pending.append(handle)
+        return handle
+
+    def run_until(self, deadline):
+        while True:
+            live = [handle for handle in self.pending if not handle.cancelled]
+            if not live or min(handle.when for handle in live) > deadline:
+                break
+            handle = min(live, key=lambda handle: handle.when)
+            self.pending.remove(handle)
+            self.now = handle.when
+            handle.callback()
+        self.now = deadline
+
+
+def fake_loop(monkeypatch):
+    loop = FakeLoop()
+    monkeypatch.setattr(metrics.asyncio, "get_running_loop", lambda: loop)
+    monkeypatch.setattr(metrics.time, "time", loop.time)
+    return loop
+
+
+def test_timer_wheel_coalesces_jobs_into_one_wakeup(monkeypatch):
+    loop = fake_loop(monkeypatch)
+    wheel = TimerWheel(resolution=0.05)
+    runs = {"fast": 0, "slow": 0}
+    fast = wheel.every(1, lambda: runs.__setitem__("fast", runs["fast"] + 1))
+    slow = wheel.every(5, lambda: runs.__setitem__("slow", runs["slow"] + 1))
+    # 整个定时器同一时间只挂一个 call_later
+    assert len([handle for handle in loop.pending if not handle.cancelled]) == 1
+
+    loop.run_until(1010.0)
+    assert runs == {"fast": 10, "slow": 2}
+    # 5 秒的任务对齐到 1 秒任务的槽位，不额外唤醒
+    assert wheel.wakeups == 10
+
+    fast.cancel()
+    assert fast.cancelled()
+    loop.run_until(1020.0)
+    assert runs == {"fast": 10, "slow": 4}
+    assert wheel.wakeups == 12
+    slow.cancel()
+    assert wheel.slots == {}
+    assert all(handle.cancelled for handle in loop.pending)
+
+
+def test_timer_wheel_survives_failing_job(monkeypatch, capsys):
+    loop = fake_loop(monkeypatch)
+    wheel = TimerWheel(resolution=0.05)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    job = wheel.every(1, fail)
+    loop.run_until(1003.0)
+    wheel.stop()
+    assert len(calls) == 3
+    assert job.cancelled()
+    assert "boom" in capsys.readouterr().out
+
+
+def test_timer_wheel_boundary_jobs(monkeypatch):
+    loop = fake_loop(monkeypatch)
+    wheel = TimerWheel(resolution=0.05)
+    fired = []
+    # 每 7 秒的边界（例如整分钟），与周期任务共用同一个定时器
+    wheel.at_boundary(lambda now: (now // 7 + 1) * 7, lambda: fired.append(loop.now), legacy_period=7)
+    loop.run_until(1022.0)
+    assert fired == [1001.0, 1008.0, 1015.0, 1022.0]
+
+
+class FakeWheel:
+    def __init__(self):
+        self.jobs = []
+
+    def every(self, period, callback):
+        job = types.SimpleNamespace(period=period, callback=callback, cancel=lambda: self.jobs.remove(job))
+        self.jobs.append(job)
+        return job
+
+
+class FakeSource(MetricSource):
+    def __init__(self):
+        MetricSource.__init__(self)
+        self.changes = []
+
+    def on_policy_change(self, resumed):
+        self.changes.append(resumed)
+
+
+class FakeWidget:
+    def __init__(self, interval):
+        self.update_interval = interval
+        self._futures = []
+        self.setups = 0
+
+    def timer_setup(self):
+        self.setups += 1
+        self._futures.append(types.SimpleNamespace(cancel=lambda: None))
+
+
+class FakeBar:
+    def __init__(self, widgets):
+        self.widgets = widgets
+        self.shown = True
+
+    def is_show(self):
+        return self.shown
+
+
+def fake_screen(widgets):
+    top = FakeBar(widgets)
+    group = types.SimpleNamespace(current_window=types.SimpleNamespace(fullscreen=False))
+    return types.SimpleNamespace(top=top, bottom=None, left=None, right=types.SimpleNamespace(), group=group)
+
+
+def fake_qtile(widgets, *others):
+    screen = fake_screen(widgets)
+    return types.SimpleNamespace(
+        current_window=screen.group.current_window, current_screen=screen, screens=[screen, *others]
+    )
+
+
+def test_poll_policy_scales_and_suspends(monkeypatch):
+    idle = {"seconds": 0}
+    monkeypatch.setattr(metrics, "x_idle_seconds", lambda qtile: idle["seconds"])
+    wheel = FakeWheel()
+    policy = PollPolicy(wheel, fullscreen_factor=5, idle_after=300, idle_check=10)
+    source = FakeSource()
+    policy.register(source)
+    policy.register(source)
+    assert policy.sources == [source] and source.policy is policy
+
+    clock = FakeWidget(1)
+    qtile = fake_qtile([clock, types.SimpleNamespace(update_interval=None)])
+    policy.start(qtile)
+    assert [job.period for job in wheel.jobs] == [10]
+    assert source.scaled(2) == 2
+
+    qtile.current_window.fullscreen = True
+    policy.update(qtile)
+    assert policy.state == "fullscreen"
+    assert source.scaled(2) == 10
+    assert clock.update_interval == 5
+    assert source.changes == [False]
+
+    qtile.current_screen.top.shown = False
+    policy.update(qtile)
+    assert policy.state == "hidden"
+    assert source.scaled(2) is None
+
+    qtile.current_screen.top.shown = True
+    qtile.current_window.fullscreen = False
+    policy.update(qtile)
+    assert policy.state == "normal"
+    assert source.changes == [False, False, True]
+    assert clock.update_interval == 1
+    assert clock.setups == 1
+
+    # 空闲时把检查间隔缩短到 1 秒，回来后恢复
+    idle["seconds"] = 400
+    wheel.jobs[0].callback()
+    assert policy.state == "idle" and [job.period for job in wheel.jobs] == [1]
+    idle["seconds"] = 0
+    wheel.jobs[0].callback()
+    assert policy.state == "normal" and [job.period for job in wheel.jobs] == [10]
+    policy.stop()
+    assert wheel.jobs == []
+
+
+class CountingSource(MetricSource):
+    def __init__(self):
+        MetricSource.__init__(self)
+        self.starts = 0
+        self.stops = 0
+
+    def start(self):
+        self.starts += 1
+
+    def stop(self):
+        self.stops += 1
+
+
+def test_metric_source_keeps_running_across_resubscribe(monkeypatch):
+    loop = fake_loop(monkeypatch)
+    source = CountingSource()
+    old, new = [], []
+    source.subscribe(old.append)
+    # 完整重新加载：旧组件退订，新组件随后重新订阅，中间不停止
+    source.unsubscribe(old.append)
+    assert source.stops == 0
+    source.subscribe(new.append)
+    loop.run_until(loop.now + MetricSource.stop_grace * 2)
+    assert source.stops == 0
+
+    source._publish(42)
+    assert (old, new) == ([], [42])
+    source.unsubscribe(new.append)
+    loop.run_until(loop.now + MetricSource.stop_grace - 0.5)
+    assert source.stops == 0
+    loop.run_until(loop.now + 1)
+    assert source.stops == 1
+
+
+def test_metric_source_stops_immediately_without_loop():
+    source = CountingSource()
+    source.subscribe(print)
+    source.unsubscribe(print)
+    assert source.stops == 1
+
+
+def test_poll_policy_decides_per_bar():
+    policy = PollPolicy(FakeWheel(), fullscreen_factor=5)
+    source = FakeSource()
+    policy.register(source)
+    first, second = FakeWidget(1), FakeWidget(2)
+    other = fake_screen([second])
+    qtile = fake_qtile([first], other)
+
+    # 另一个屏幕上的全屏窗口只放慢那个屏幕的状态栏
+    other.group.current_window.fullscreen = True
+    policy.update(qtile)
+    assert (first.update_interval, second.update_interval) == (1, 10)
+    assert policy.state == "normal" and source.scaled(2) == 2
+
+    # 共用的采样源按最需要数据的状态栏来定
+    qtile.current_screen.top.shown = False
+    policy.update(qtile)
+    assert policy.bar_states == {qtile.current_screen.top: "hidden", other.top: "fullscreen"}
+    assert policy.state == "fullscreen" and source.scaled(2) == 10
+    other.top.shown = False
+    policy.update(qtile)
+    assert policy.state == "hidden" and source.scaled(2) is None
+
+    qtile.current_screen.top.shown = other.top.shown = True
+    other.group.current_window.fullscreen = False
+    policy.update(qtile)
+    assert (first.update_interval, second.update_interval) == (1, 2)
+    assert (first.setups, second.setups) == (1, 1)
+    assert policy.state == "normal" and source.changes == [False, False, True]
@@ -0,0 +1,53 @@
+import types
+
+import pytest
+
+
+@pytest.fixture
+def coalesced(config):
+    bar_ = config.CoalescedBar([], 24)
+    bar_.widgets, bar_.frame_interval = [], 1 / 60
+    calls = []
+    bar_.qtile = types.SimpleNamespace(call_later=lambda delay, callback: calls.append(callback) or object())
+    bar_.calls = calls
+    return bar_
+
+
+class FakeWidget:
+    configured = True
+    finalized = False
+
+    def __init__(self, config, bar_):
+        self.config = config
+        self.bar = bar_
+        self.paints = 0
+        bar_.widgets.append(self)
+
+    def draw(self):
+        # 与本配置组件的 draw 一样，先交给状态栏合并
+        if not self.config.deferred_draw(self):
+            self.paints += 1
+
+
+def test_widget_draws_are_coalesced_into_one_frame(config, coalesced):
+    first, second = FakeWidget(config, coalesced), FakeWidget(config, coalesced)
+    for _ in range(3):
+        first.draw()
+    second.draw()
+    assert len(coalesced.calls) == 1 and (first.paints, second.paints) == (0, 0)
+
+    coalesced.calls.pop()()
+    assert (first.paints, second.paints) == (1, 1)
+    assert (coalesced.requests, coalesced.frames, coalesced.widget_paints) == (4, 1, 2)
+    assert coalesced.full_paints == 0
+
+
+def test_bar_draw_replaces_pending_widget_draws(config, coalesced):
+    widget_ = FakeWidget(config, coalesced)
+    widget_.draw()
+    coalesced.draw()
+    coalesced.draw()
+    assert len(coalesced.calls) == 1
+    coalesced.calls.pop()()
+    assert (coalesced.frames, coalesced.full_paints, coalesced.widget_paints) == (1, 1, 0)
+    assert not coalesced.painting
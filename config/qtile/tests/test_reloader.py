@@ -0,0 +1,157 @@
+import types
+
+import pytest
+
+
+class Bar:
+    def __init__(self, widgets, size=26, **config):
+        self.widgets = widgets
+        self.size = size
+        self._user_config = config
+
+
+class Screen:
+    def __init__(self, top=None, wallpaper="~/wall.png"):
+        self.top = top
+        self.bottom = self.left = self.right = None
+        self.wallpaper = wallpaper
+        self.wallpaper_mode = "fill"
+
+
+class Clock:
+    pass
+
+
+class Volume:
+    pass
+
+
+class Layout:
+    def __init__(self, **config):
+        self._user_config = config
+
+
+class Floating:
+    def __init__(self, rules):
+        self.float_rules = rules
+
+
+def watched(config, **overrides):
+    values = {
+        "keys": [],
+        "screens": [Screen(Bar([Clock(), Volume()]))],
+        "group_definitions": [("1", {"layout": "columns"})],
+        "dropdown_definitions": [],
+        "layouts": [Layout(border_width=2)],
+        "layout_theme": {"margin": 4},
+        "widget_defaults": {"fontsize": 13},
+        "mouse": [],
+        "floating_layout": Floating([]),
+    }
+    assert set(values) == set(config.ConfigReloader.watched)
+    values.update(overrides)
+    return values
+
+
+def reason(config, old, new, chord=()):
+    qtile = types.SimpleNamespace(chord_stack=list(chord))
+    return config.ConfigReloader()._full_reload_reason(qtile, old, {}, new)
+
+
+def test_unchanged_config_reloads_incrementally(config, monkeypatch):
+    monkeypatch.setattr(config, "reused_rebuilt", [])
+    assert reason(config, watched(config), watched(config)) is None
+    # 只改了按键和组件参数也可以增量加载
+    assert reason(config, watched(config), watched(config, keys=[object()])) is None
+
+
+@pytest.mark.parametrize(
+    "overrides, expected",
+    [
+        ({"group_definitions": [("1", {"layout": "max"})]}, "group_definitions 变化"),
+        ({"widget_defaults": {"fontsize": 14}}, "widget_defaults 变化"),
+        ({"mouse": [types.SimpleNamespace(button="Button1")]}, "鼠标绑定变化"),
+        ({"layouts": [Layout(border_width=3)]}, "布局变化"),
+        ({"floating_layout": Layout()}, "浮动布局代码变化"),
+        ({"screens": []}, "屏幕数量变化"),
+        ({"screens": [Screen(Bar([Clock(), Volume()]), wallpaper="~/other.png")]}, "壁纸变化"),
+        ({"screens": [Screen(None)]}, "状态栏变化"),
+        ({"screens": [Screen(Bar([Clock(), Volume()], size=30))]}, "状态栏参数变化"),
+        ({"screens": [Screen(Bar([Clock()]))]}, "状态栏组件数量变化"),
+        ({"screens": [Screen(Bar([Clock(), Clock()]))]}, "组件 Clock 变化"),
+    ],
+)
+def test_structural_changes_need_full_reload(config, monkeypatch, overrides, expected):
+    monkeypatch.setattr(config, "reused_rebuilt", [])
+    assert reason(config, watched(config), watched(config, **overrides)) == expected
+
+
+def test_rebuilt_shared_objects_and_chords_need_full_reload(config, monkeypatch):
+    monkeypatch.setattr(config, "reused_rebuilt", ["gpu_monitor"])
+    assert reason(config, watched(config), watched(config)) == "共享对象重建：gpu_monitor"
+    monkeypatch.setattr(config, "reused_rebuilt", [])
+    assert reason(config, watched(config), watched(config), chord=["status"]) == "正处于按键组合模式"
+
+
+def test_widget_class_code_change_needs_full_reload(config, monkeypatch):
+    monkeypatch.setattr(config, "reused_rebuilt", [])
+    old = watched(config, screens=[Screen(Bar([config.SampleText.__new__(config.SampleText)]))])
+    changed = type("SampleText", (config.SampleText,), {"__module__": "config", "on_sample": lambda self, sample: None})
+    new = watched(config, screens=[Screen(Bar([changed.__new__(changed)]))])
+    assert reason(config, old, new) == "组件 SampleText 变化"
+
+
+def test_apply_rules_swaps_index_on_every_group(config):
+    Match = config.Match
+    old = config.IndexedFloating(float_rules=[Match(wm_class="confirm")])
+    new = config.IndexedFloating(float_rules=[Match(wm_class="confirm"), Match(title="画中画")])
+    indexed = types.SimpleNamespace(floating_layout=config.IndexedFloating(float_rules=list(old.float_rules)))
+    plain = types.SimpleNamespace(floating_layout=types.SimpleNamespace(float_rules=[]))
+    qtile = types.SimpleNamespace(groups=[indexed, plain])
+    reloader = config.ConfigReloader()
+
+    assert reloader._apply_rules(qtile, old, config.IndexedFloating(float_rules=list(old.float_rules))) == ""
+    assert indexed.floating_layout.float_rules == old.float_rules
+
+    assert reloader._apply_rules(qtile, old, new) == "浮动规则"
+    assert indexed.floating_layout.float_rules is new.float_rules
+    assert indexed.floating_layout.rule_index is new.rule_index
+    assert plain.floating_layout.float_rules == []
+
+
+def test_only_new_or_changed_startup_hooks_rerun(config):
+    calls = []
+
+    def restore_session():
+        calls.append("restore")
+
+    def warm_dropdowns():
+        calls.append("warm")
+
+    def edited():
+        calls.append("warm")
+        calls.append("again")
+
+    def start_poll_policy():
+        calls.append("poll")
+
+    def reloaded(func, name=None):
+        # 重新执行 config.py 得到的是代码相同的新函数对象
+        return types.FunctionType(func.__code__, func.__globals__, name or func.__name__, None, func.__closure__)
+
+    old = [("startup", restore_session), ("startup", warm_dropdowns), ("client_new", restore_session)]
+    new = [
+        ("startup", reloaded(restore_session)),
+        ("startup", reloaded(edited, "warm_dropdowns")),
+        ("startup", start_poll_policy),
+        ("client_new", reloaded(restore_session)),
+    ]
+    detail = config.ConfigReloader._rerun_startup(old, new)
+    assert calls == ["warm", "again", "poll"]
+    assert detail == "startup hook warm_dropdowns, start_poll_policy"
+    assert config.ConfigReloader._rerun_startup(old, [("startup", reloaded(restore_session))]) == ""
+
+
+def test_shared_state_is_kept_across_reloads(config):
+    for name in ("column_resizer", "group_index", "supervisor"):
+        assert config.reusable[name][2] is getattr(config, name)
@@ -0,0 +1,82 @@
+import itertools
+import re
+
+import pytest
+
+from rules import RuleIndex
+
+# 与真实的 Match.compare 对照，需要能导入 libqtile
+Match = pytest.importorskip("libqtile.config").Match
+
+
+class Window:
+    def __init__(self, wm_class, name, wm_type, pid=1):
+        self.wm_class = wm_class
+        self.name = name
+        self.wm_type = wm_type
+        self.pid = pid
+        self.wid = pid
+
+    def get_wm_class(self):
+        return self.wm_class
+
+    def get_wm_type(self):
+        return self.wm_type
+
+    def get_wm_role(self):
+        return None
+
+    def get_pid(self):
+        return self.pid
+
+
+RULES = [
+    Match(wm_class="ssh-askpass"),
+    Match(title="pinentry"),
+    Match(wm_type="dialog"),
+    Match(wm_class=re.compile(r"file_progress|download")),
+    Match(title=re.compile(r"Picture.in.Picture")),
+    Match(title=re.compile(r"(?i)^settings")),
+    Match(title=re.compile(r"(a+)\1$")),
+    Match(wm_class="Brave-browser", title=re.compile(r".*Bitwarden")),
+    Match(func=lambda win: win.pid == 42),
+    Match(net_wm_pid=7),
+    Match(wm_instance_class="krita"),
+    Match(wm_type="dialog", wm_class="gimp"),
+    ~Match(wm_class="xterm") & Match(title="scratch"),
+    Match(wm_class="download"),
+]
+
+WINDOWS = [
+    Window(wm_class, name, wm_type, pid)
+    for wm_class, name, wm_type, pid in itertools.product(
+        [None, [], ["ssh-askpass", "Ssh-askpass"], ["brave-browser", "Brave-browser"], ["download"],
+         ["krita", "Krita"], ["gimp", "Gimp"], ["xterm", "XTerm"], ["file_progress_x", "X"]],
+        [None, "pinentry", "Picture-in-Picture", "SETTINGS - app", "aaaa", "Vault - Bitwarden", "scratch", ""],
+        [None, "normal", "dialog"],
+        [1, 7, 42],
+    )
+]
+
+
+def test_rule_index_agrees_with_match_compare():
+    index = RuleIndex("测试", list(enumerate(RULES)))
+    assert index.exact["wm_class"] and index.patterns and index.generic
+    for win in WINDOWS:
+        expected = next((i for i, rule in enumerate(RULES) if rule.compare(win)), None)
+        assert index.target(win) == expected, (win.wm_class, win.name, win.wm_type, win.pid)
+
+
+def test_rule_index_without_private_rules_falls_back_to_compare():
+    class Opaque:
+        def __init__(self, match):
+            self.match = match
+
+        def compare(self, win):
+            return self.match.compare(win)
+
+    index = RuleIndex("测试", [(i, Opaque(rule)) for i, rule in enumerate(RULES)])
+    assert index.generic == list(range(len(RULES)))
+    for win in WINDOWS[::7]:
+        expected = next((i for i, rule in enumerate(RULES) if rule.compare(win)), None)
+        assert index.target(win) == expected
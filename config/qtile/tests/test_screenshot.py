@@ -0,0 +1,114 @@
+import struct
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def screenshot(config):
+    # screenshot.py 依赖 libqtile，借用 config 夹具装好的假 libqtile 导入
+    return sys.modules[config.Screenshotter.__module__]
+
+
+class FakeQtile:
+    def __init__(self, core_name="x11"):
+        self.core = types.SimpleNamespace(name=core_name)
+        self.spawned = []
+
+    def spawn(self, command, shell=False):
+        self.spawned.append((command, shell))
+
+
+def test_capture_falls_back_to_maim_without_x11_internals(screenshot):
+    shooter = screenshot.Screenshotter()
+    qtile = FakeQtile("wayland")
+    shooter.capture(qtile, "#ff0000")
+    assert qtile.spawned == [("maim -s | xclip -selection clipboard -t image/png -i", True)]
+    assert shooter.selector is None and shooter.unavailable
+    # 之后不再尝试内置路径
+    shooter.capture(qtile, "#ff0000")
+    assert len(qtile.spawned) == 2 and shooter.fallbacks == 2
+
+
+def test_grab_falls_back_to_maim_for_selected_region(screenshot, monkeypatch):
+    def unavailable(*args):
+        raise screenshot.NativeUnavailable("没有 cdata")
+
+    monkeypatch.setattr(screenshot, "x_get_image", unavailable)
+    shooter = screenshot.Screenshotter()
+    qtile = FakeQtile()
+    qtile.core.conn = types.SimpleNamespace(conn=None, default_screen=types.SimpleNamespace(root=types.SimpleNamespace(wid=1)))
+    shooter._grab(qtile, (10, 20, 300, 200))
+    assert qtile.spawned == [("maim -g 300x200+10+20 | xclip -selection clipboard -t image/png -i", True)]
+    assert shooter.failures == 0
+
+
+def test_change_property_falls_back_to_public_request(screenshot):
+    pytest.importorskip("xcffib.xproto")
+    requests = []
+    core = types.SimpleNamespace(ChangeProperty=lambda *args: requests.append(args))
+    screenshot.x_change_property(types.SimpleNamespace(core=core), 5, 6, 7, 32, struct.pack("=2I", 1, 2))
+    assert requests == [(0, 5, 6, 7, 32, 2, (1, 2))]
+
+
+class FakeCore:
+    name = "x11"
+
+    def __init__(self, owner=None):
+        self.owner = owner
+        self.requests = []
+        core = types.SimpleNamespace(
+            SetSelectionOwner=lambda *args: self.requests.append(("SetSelectionOwner", *args)),
+            GetSelectionOwner=lambda selection: types.SimpleNamespace(
+                reply=lambda: types.SimpleNamespace(owner=self.owner or 9)
+            ),
+            ChangeProperty=lambda *args: self.requests.append(("ChangeProperty", *args)),
+            SendEvent=lambda *args: self.requests.append(("SendEvent", *args)),
+        )
+        names = ("CLIPBOARD", "TARGETS", "TIMESTAMP", "INTEGER", "ATOM", "image/png")
+        atoms = {name: index for index, name in enumerate(names, 1)}
+        self.conn = types.SimpleNamespace(
+            conn=types.SimpleNamespace(core=core),
+            atoms=atoms,
+            create_window=lambda *args: types.SimpleNamespace(wid=9),
+            flush=lambda: None,
+        )
+        self.qtile = types.SimpleNamespace(windows_map={})
+
+    def handle_PropertyNotify(self, event):  # noqa: N802
+        pass
+
+    def get_valid_timestamp(self):
+        return 1234
+
+
+def test_clipboard_is_owned_with_a_server_timestamp(screenshot):
+    core = FakeCore()
+    owner = screenshot.ClipboardOwner()
+    owner.own(types.SimpleNamespace(core=core), b"png")
+    assert core.requests == [("SetSelectionOwner", 9, 1, 1234)]
+    assert owner.acquired == 1234 and owner.data == b"png"
+
+    lost = FakeCore(owner=7)
+    with pytest.raises(RuntimeError):
+        screenshot.ClipboardOwner().own(types.SimpleNamespace(core=lost), b"png")
+
+
+def test_clipboard_refuses_requests_older_than_ownership(screenshot):
+    pytest.importorskip("xcffib.xproto")
+    core = FakeCore()
+    owner = screenshot.ClipboardOwner()
+    owner.own(types.SimpleNamespace(core=core), b"png")
+
+    def request(time, target):
+        core.requests.clear()
+        event = types.SimpleNamespace(owner=9, requestor=5, selection=1, target=target, property=8, time=time)
+        owner.handle_request(event)
+        return [request[1:] for request in core.requests if request[0] == "ChangeProperty"]
+
+    assert request(1000, 6) == []
+    assert request(2000, 3) == [(0, 5, 8, 4, 32, 1, (1234,))]
+    # CurrentTime 的请求照常应答
+    assert request(0, 6) == [(0, 5, 8, 6, 8, 3, b"png")]
+    assert owner.served == 1
@@ -0,0 +1,303 @@
+import types
+
+import pytest
+
+from session import SessionStore
+
+
+class ClientList:
+    def __init__(self):
+        self.clients = []
+        self._index = 0
+
+    @property
+    def current_client(self):
+        return self.clients[self._index] if self.clients else None
+
+    @current_client.setter
+    def current_client(self, client):
+        self._index = self.clients.index(client)
+
+
+class Column(ClientList):
+    def __init__(self, split, insert_position, width=100):
+        ClientList.__init__(self)
+        self.split = split
+        self.insert_position = insert_position
+        self.width = width
+        self.heights = {}
+
+    cw = ClientList.current_client
+
+
+class Columns:
+    name = "columns"
+    insert_position = 0
+
+    def __init__(self):
+        self.columns = [Column(True, 0)]
+        self.current = 0
+
+    @property
+    def cc(self):
+        return self.columns[self.current]
+
+    def focus(self, client):
+        for index, column in enumerate(self.columns):
+            if client in column.clients:
+                column.current_client = client
+                self.current = index
+
+
+class MonadTall:
+    name = "monadtall"
+    min_ratio = 0.25
+    max_ratio = 0.75
+
+    def __init__(self):
+        self.clients = ClientList()
+        self.ratio = 0.5
+        self.relative_sizes = []
+        self.do_normalize = True
+
+
+class Max:
+    name = "max"
+
+
+class Group:
+    def __init__(self, name):
+        self.name = name
+        self.layouts = [Columns(), Max(), MonadTall()]
+        self.current_layout = 0
+        self.windows = []
+        self.relayouts = 0
+
+    @property
+    def layout(self):
+        return self.layouts[self.current_layout]
+
+    @layout.setter
+    def layout(self, name):
+        self.current_layout = [layout.name for layout in self.layouts].index(name)
+
+    def add(self, win):
+        win.group = self
+        self.windows.append(win)
+        column = self.layouts[0].columns[-1]
+        column.clients.append(win)
+        column.heights[win] = 100
+        self.layouts[2].clients.clients.append(win)
+
+    def remove(self, win):
+        self.windows.remove(win)
+        win.group = None
+        for column in self.layouts[0].columns:
+            if win in column.clients:
+                column.clients.remove(win)
+                del column.heights[win]
+        self.layouts[2].clients.clients.remove(win)
+
+    def layout_all(self):
+        self.relayouts += 1
+
+
+class Window:
+    def __init__(self, qtile, wid, wm_class, pid):
+        self.qtile = qtile
+        self.wid = wid
+        self.wm_class = wm_class
+        self.pid = pid
+        self.group = None
+
+    def get_wm_class(self):
+        return [self.wm_class, self.wm_class.title()]
+
+    def get_pid(self):
+        return self.pid
+
+    def togroup(self, name):
+        if self.group is not None:
+            self.group.remove(self)
+        self.qtile.groups_map[name].add(self)
+
+
+class Qtile:
+    def __init__(self):
+        self.groups = [Group(name) for name in "123"] + [Group("scratchpad")]
+        self.groups_map = {group.name: group for group in self.groups}
+        self.windows_map = {}
+        self.later = []
+
+    def call_later(self, delay, callback, *args):
+        self.later.append((callback, args))
+        return types.SimpleNamespace(cancel=lambda: None)
+
+    def window(self, wid, wm_class, pid):
+        win = self.windows_map[wid] = Window(self, wid, wm_class, pid)
+        return win
+
+
+class Wheel:
+    def every(self, period, callback):
+        return types.SimpleNamespace(cancel=lambda: None)
+
+
+def tracked(group):
+    return group is not None and group.name != "scratchpad"
+
+
+def make_store(path, qtile=None):
+    store = SessionStore(Wheel(), tracked, str(path))
+    if qtile is not None:
+        store.start(qtile)
+    return store
+
+
+@pytest.fixture
+def session(tmp_path):
+    """
+    # 组 1：两列，[firefox] 140 宽，[alacritty ×2] 60 宽且高度 130/70；
+    # 组 2：MonadTall，比例 0.66，mpv 在主区；scratchpad 里的窗口不进快照。
+    """
+    qtile = Qtile()
+    firefox, term_a, term_b = qtile.window(1, "firefox", 101), qtile.window(2, "alacritty", 102), qtile.window(3, "alacritty", 103)
+    code, mpv = qtile.window(4, "code", 104), qtile.window(5, "mpv", 105)
+    dropdown = qtile.window(6, "alacritty", 106)
+    group1, group2 = qtile.groups_map["1"], qtile.groups_map["2"]
+    for win in (firefox, term_a, term_b):
+        group1.add(win)
+    for win in (code, mpv):
+        group2.add(win)
+    qtile.groups_map["scratchpad"].add(dropdown)
+
+    columns = group1.layouts[0]
+    right = Column(False, 0, 60)
+    right.clients = [term_a, term_b]
+    right.heights = {term_a: 130, term_b: 70}
+    columns.columns[0].clients = [firefox]
+    columns.columns[0].heights = {firefox: 100}
+    columns.columns[0].width = 140
+    columns.columns.append(right)
+    columns.current = 1
+
+    monad = group2.layouts[2]
+    monad.ratio = 0.66
+    monad.clients.clients = [mpv, code]
+    monad.relative_sizes = [1.0]
+    group2.layout = "monadtall"
+    return qtile, tmp_path / "session.bin"
+
+
+def test_encode_decode_round_trip(session):
+    qtile, path = session
+    store = make_store(path, qtile)
+    table, snapshots = store.decode(store.encode(qtile))
+
+    assert table == [
+        (101, "firefox\x1fFirefox"), (102, "alacritty\x1fAlacritty"), (103, "alacritty\x1fAlacritty"),
+        (104, "code\x1fCode"), (105, "mpv\x1fMpv"),
+    ]
+    by_name = {snapshot.name: snapshot for snapshot in snapshots}
+    assert set(by_name) == {"1", "2", "3"}
+
+    first = by_name["1"]
+    assert first.layout == "columns"
+    assert first.members == (0, 1, 2)
+    assert first.columns == ((140, True, ((0, 100),)), (60, False, ((1, 130), (2, 70))))
+    assert first.tiled == (0, 1, 2)
+
+    second = by_name["2"]
+    assert second.layout == "monadtall"
+    assert second.ratio == pytest.approx(0.66)
+    assert second.sizes == (1.0,)
+    assert second.tiled == (4, 3)
+    assert by_name["3"].members == ()
+
+
+def test_decode_rejects_bad_files(session):
+    qtile, path = session
+    store = make_store(path, qtile)
+    data = store.encode(qtile)
+    with pytest.raises(ValueError):
+        store.decode(b"XXXX" + data[4:])
+    path.write_bytes(data[:30])
+    assert store.load() is None
+
+
+def test_save_skips_unchanged_snapshot(session):
+    qtile, path = session
+    store = make_store(path, qtile)
+    store.save()
+    store.save()
+    assert (store.written, store.skipped) == (1, 1)
+    assert path.read_bytes() == store.encode(qtile)
+    assert not (path.parent / "session.bin.tmp").exists()
+
+
+def restarted(qtile, pids=None):
+    """
+    # 模拟完整重新加载：布局对象是新建的，所有窗口都先落在组 3。
+    """
+    fresh = Qtile()
+    for win in sorted(qtile.windows_map.values(), key=lambda win: -win.wid):
+        if win.group is not None and win.group.name == "scratchpad":
+            continue
+        clone = fresh.window(win.wid, win.wm_class, (pids or {}).get(win.wid, win.pid))
+        fresh.groups_map["3"].add(clone)
+    return fresh
+
+
+def test_restore_applies_snapshot_to_existing_windows(session):
+    qtile, path = session
+    make_store(path, qtile).save()
+    # 重启后一个终端换了 pid：已有窗口允许按 wm_class 认领
+    fresh = restarted(qtile, pids={3: 999})
+    store = make_store(path)
+    store.restore(fresh)
+
+    group1, group2 = fresh.groups_map["1"], fresh.groups_map["2"]
+    columns = group1.layouts[0].columns
+    assert [(column.width, column.split) for column in columns] == [(140, True), (60, False)]
+    assert [[win.wid for win in column.clients] for column in columns] == [[1], [2, 3]]
+    assert [columns[1].heights[win] for win in columns[1].clients] == [130, 70]
+
+    assert group2.layout.name == "monadtall"
+    monad = group2.layouts[2]
+    assert monad.ratio == pytest.approx(0.66)
+    assert [win.wid for win in monad.clients.clients] == [5, 4]
+    assert monad.relative_sizes == [1.0]
+    assert fresh.groups_map["3"].windows == []
+    assert store.restored == 5 and not store.restoring()
+
+    # 增量重新加载沿用布局对象，不再恢复
+    store.restore(fresh)
+    assert store.restored == 5
+
+
+def test_new_windows_are_claimed_by_pid_only(session):
+    qtile, path = session
+    make_store(path, qtile).save()
+    fresh = Qtile()
+    store = make_store(path)
+    store.restore(fresh)
+    assert store.restoring()
+
+    # 重新登录后新启动的同类程序 pid 不同，不认领
+    stranger = fresh.window(7, "firefox", 555)
+    assert store.claim(stranger) is None
+    fresh.groups_map["3"].add(stranger)
+
+    for wid, wm_class, pid in ((1, "firefox", 101), (2, "alacritty", 102), (3, "alacritty", 103)):
+        win = fresh.window(wid, wm_class, pid)
+        assert store.claim(win) == "1"
+        store.window_managed(fresh, win)
+    assert len(fresh.later) == 1
+    callback, args = fresh.later.pop()
+    callback(*args)
+
+    columns = fresh.groups_map["1"].layouts[0].columns
+    assert [[win.wid for win in column.clients] for column in columns] == [[1], [2, 3]]
+    assert stranger.group is fresh.groups_map["3"]
+    # code 和 mpv 还没出现，继续等待
+    assert store.restoring() and len(store.claimed) == 3
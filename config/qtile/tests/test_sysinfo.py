@@ -0,0 +1,37 @@
+from sysinfo import ProcessTable
+
+
+def write_process(root, pid, cpu_ticks, io_bytes, name="worker"):
+    fields = ["S"] + ["0"] * 22
+    fields[11], fields[19], fields[21] = str(cpu_ticks), "77", "10"
+    proc = root / str(pid)
+    proc.mkdir(exist_ok=True)
+    (proc / "stat").write_text(f"{pid} ({name}) {' '.join(fields)}\n")
+    if io_bytes is not None:
+        (proc / "io").write_text(f"rchar: 1\nread_bytes: {io_bytes}\nwrite_bytes: 0\n")
+
+
+def test_process_table_reads_io_of_idle_cpu_processes(tmp_path):
+    write_process(tmp_path, 10, cpu_ticks=5, io_bytes=0)
+    table = ProcessTable(str(tmp_path))
+    table.update(now=100.0)
+    # CPU 时间不变、但在读写磁盘的进程也要进 I/O 排行
+    write_process(tmp_path, 10, cpu_ticks=5, io_bytes=4000)
+    table.update(now=101.0)
+    assert table.io_skipped == 1
+    table.update(now=104.0)
+    assert [(pid, state.io_rate) for pid, state in table.top("io_rate", 5)] == [(10, 1000.0)]
+    assert table.top("cpu", 5) == []
+    # 限流期间沿用上次算出的速率
+    table.update(now=105.0)
+    assert table.processes[10].io_rate == 1000.0
+
+
+def test_process_table_stops_reading_unreadable_io(tmp_path):
+    write_process(tmp_path, 10, cpu_ticks=5, io_bytes=None)
+    table = ProcessTable(str(tmp_path))
+    table.update(now=100.0)
+    write_process(tmp_path, 10, cpu_ticks=50, io_bytes=None)
+    table.update(now=110.0)
+    assert (table.io_reads, table.io_skipped) == (1, 1)
+    assert table.processes[10].cpu > 0
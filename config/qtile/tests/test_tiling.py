@@ -0,0 +1,165 @@
+import types
+
+import tiling
+from tiling import ColumnResizer, GroupIndex
+
+
+class FakeColumn:
+    def __init__(self, width):
+        self.width = width
+
+
+class FakeColumns:
+    name = "columns"
+    grow_amount = 10
+
+    def __init__(self, widths, current=0):
+        self.columns = [FakeColumn(width) for width in widths]
+        self.current = current
+        self.group = types.SimpleNamespace(layouts_done=0)
+        self.group.layout_all = lambda: setattr(self.group, "layouts_done", self.group.layouts_done + 1)
+
+    @property
+    def cc(self):
+        return self.columns[self.current]
+
+
+class FakeQtile:
+    def __init__(self, layout):
+        self.current_layout = layout
+        self.calls = []
+
+    def call_later(self, delay, callback, *args):
+        self.calls.append((delay, callback, args))
+
+
+def test_column_resizer_coalesces_presses_into_one_relayout(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr(tiling.time, "monotonic", lambda: clock["now"])
+    changes = []
+    resizer = ColumnResizer(lambda: changes.append(1))
+    layout = FakeColumns([100, 100, 100])
+    qtile = FakeQtile(layout)
+    for _ in range(3):
+        resizer.request(qtile, 1)
+        clock["now"] += 0.01
+    assert len(qtile.calls) == 1 and resizer.scheduled
+
+    resizer.flush()
+    assert [column.width for column in layout.columns] == [130, 70, 100]
+    assert layout.group.layouts_done == 1
+    assert changes == [1]
+    assert (resizer.requests, resizer.relayouts) == (3, 1)
+
+
+def test_column_resizer_accelerates_and_clamps(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr(tiling.time, "monotonic", lambda: clock["now"])
+    resizer = ColumnResizer()
+    # 最右一列和左边的邻列交换宽度
+    layout = FakeColumns([100, 100], current=1)
+    qtile = FakeQtile(layout)
+    for _ in range(12):
+        resizer.request(qtile, 1)
+        clock["now"] += 0.01
+    # 连按 5 次后步长翻倍，10 次后再翻倍
+    assert resizer.pending == 5 * 10 + 5 * 20 + 2 * 40
+    resizer.flush()
+    assert [column.width for column in layout.columns] == [resizer.min_width, 200 - resizer.min_width]
+
+    # 已经到最小宽度，继续加宽不再触发布局
+    resizer.request(qtile, 1)
+    resizer.flush()
+    assert layout.group.layouts_done == 1
+
+
+def test_column_resizer_restarts_streak_on_new_direction_or_column(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr(tiling.time, "monotonic", lambda: clock["now"])
+    resizer = ColumnResizer()
+    layout = FakeColumns([300, 300, 300])
+    qtile = FakeQtile(layout)
+    for _ in range(6):
+        resizer.request(qtile, 1)
+        clock["now"] += 0.01
+    assert resizer.streak == 5
+    resizer.request(qtile, -1)
+    assert resizer.streak == 0
+    clock["now"] += 0.01
+    resizer.request(qtile, -1)
+    assert resizer.streak == 1
+    # 焦点换到另一列，步长也重新开始
+    layout.current = 1
+    clock["now"] += 0.01
+    resizer.request(qtile, -1)
+    assert resizer.streak == 0
+    assert resizer.pending == 5 * 10 + 20 - 3 * 10
+
+
+def test_column_resizer_ignores_other_layouts():
+    resizer = ColumnResizer()
+    qtile = FakeQtile(types.SimpleNamespace(name="max"))
+    resizer.request(qtile, 1)
+    assert qtile.calls == [] and resizer.requests == 0
+    single = FakeColumns([100])
+    resizer.request(FakeQtile(single), 1)
+    assert resizer.requests == 0
+
+
+def make_group(name, windows=()):
+    group = types.SimpleNamespace(name=name, windows=list(windows))
+    for win in group.windows:
+        win.group = group
+    return group
+
+
+def make_window(wid):
+    return types.SimpleNamespace(wid=wid, group=None)
+
+
+def test_group_index_ring_and_scratchpad():
+    a, b, c, pad_win = (make_window(wid) for wid in (1, 2, 3, 4))
+    groups = [make_group("1", [a]), make_group("2"), make_group("3", [b, c]), make_group("scratchpad", [pad_win])]
+    qtile = types.SimpleNamespace(
+        groups=groups, windows_map={win.wid: win for win in (a, b, c, pad_win)}, current_group=groups[0]
+    )
+    index = GroupIndex()
+    index.rebuild(qtile)
+    assert [group.name for group in index.ring] == ["1", "3"]
+    assert index.cycle(groups[0], 1) is groups[2]
+    assert index.cycle(groups[2], 1) is groups[0]
+    assert index.cycle(groups[1], -1) is groups[2]
+    # ScratchPad 里的窗口不进入窗口 MRU
+    assert set(index.recent_windows) == {1, 2, 3}
+
+    index.window_removed(qtile, groups[0], a)
+    assert [group.name for group in index.ring] == ["3"]
+    index.window_added(qtile, groups[1], a)
+    assert [group.name for group in index.ring] == ["2", "3"]
+
+    new = make_window(5)
+    index.window_new(new)
+    assert next(iter(index.recent_windows)) == 5
+    index.window_added(qtile, groups[3], new)
+    assert 5 not in index.recent_windows
+
+
+def test_group_index_recent_cycles_through_snapshot(monkeypatch):
+    clock = {"now": 10.0}
+    monkeypatch.setattr(tiling.time, "monotonic", lambda: clock["now"])
+    index = GroupIndex()
+    for name in ("1", "2", "3"):
+        index.group_used(types.SimpleNamespace(name=name))
+    index.group_used(types.SimpleNamespace(name="scratchpad"))
+    assert list(index.recent_groups) == ["1", "2", "3"]
+
+    candidates = ["1", "2"]
+    assert index.recent("group", candidates) == "2"
+    clock["now"] += 0.5
+    assert index.recent("group", candidates) == "1"
+    clock["now"] += 0.5
+    assert index.recent("group", candidates) == "2"
+    # 超时后重新从最近使用的开始
+    clock["now"] += GroupIndex.cycle_timeout + 0.1
+    assert index.recent("group", ["2", "3"]) == "3"
+    assert index.recent("window", []) is None
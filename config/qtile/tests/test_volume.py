@@ -0,0 +1,80 @@
+import asyncio
+
+from volume import VolumeSample, VolumeSource, parse_volume
+
+
+def script(path, body):
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_parse_volume():
+    volume = "Volume: front-left: 45875 /  70% / -9.29 dB,   front-right: 45875 /  70% / -9.29 dB\n"
+    assert parse_volume(volume, "Mute: no\n") == VolumeSample(70, False)
+    assert parse_volume(volume, "Mute: yes\n") == VolumeSample(70, True)
+    assert parse_volume("Connection failure: Connection refused\n", "") is None
+
+
+async def run(source, until, timeout=5):
+    samples = []
+    source.subscribe(samples.append)
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not until(samples) and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    source.listeners.clear()
+    process = source._process
+    source.stop()
+    if process is not None:
+        # 等被杀掉的子进程回收后再关闭事件循环
+        await process.wait()
+    return samples
+
+
+def fake_pactl(tmp_path, events):
+    subscribe = script(tmp_path / "subscribe", f"printf '{events}'\nexec sleep 5\n")
+    volume = script(tmp_path / "volume", "cat \"$(dirname \"$0\")/level\"\n")
+    mute = script(tmp_path / "mute", "echo 'Mute: no'\n")
+    (tmp_path / "level").write_text("Volume: front-left: 45875 /  70% / -9.29 dB\n")
+    return [subscribe], ([volume], [mute])
+
+
+def test_source_queries_on_sink_events_only(tmp_path):
+    events = "Event \\047new\\047 on client #5\\nEvent \\047change\\047 on sink #0\\nEvent \\047change\\047 on server #-1\\n"
+    subscribe, queries = fake_pactl(tmp_path, events)
+    source = VolumeSource(subscribe, queries, coalesce=0.05)
+    samples = asyncio.run(run(source, lambda samples: source.events == 2 and samples))
+    assert samples == [VolumeSample(70, False)]
+    assert source.events == 2
+    # 初始查询和两个事件在 coalesce 窗口内合并
+    assert source.queries == 1
+    assert source._process is None
+
+
+def test_source_requeries_after_change(tmp_path):
+    subscribe, queries = fake_pactl(tmp_path, "")
+    source = VolumeSource(subscribe, queries, coalesce=0.01)
+
+    def until(samples):
+        if samples == [VolumeSample(70, False)]:
+            (tmp_path / "level").write_text("Volume: front-left: 32768 /  50% / -18.06 dB\n")
+            source.changed()
+        return len(samples) == 2
+
+    assert asyncio.run(run(source, until)) == [VolumeSample(70, False), VolumeSample(50, False)]
+
+
+def test_source_retries_when_pactl_is_missing(tmp_path):
+    subscribe, queries = fake_pactl(tmp_path, "")
+    missing = tmp_path / "pactl"
+    source = VolumeSource([str(missing)], queries, retry_delay=0.01)
+
+    def until(samples):
+        # pipewire-pulse 晚于 qtile 启动的情况：几次失败之后命令才可用
+        if source.restarts >= 2 and not missing.exists():
+            missing.symlink_to(subscribe[0])
+        return any(samples)
+
+    samples = asyncio.run(run(source, until))
+    assert samples[0] is None
+    assert samples[-1] == VolumeSample(70, False)
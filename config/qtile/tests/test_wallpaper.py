@@ -0,0 +1,93 @@
+import os
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def wallpaper(config):
+    # wallpaper.py 依赖 cairocffi，借用 config 夹具装好的假模块导入
+    return sys.modules[config.WallpaperCache.__module__]
+
+
+@pytest.fixture
+def cache(wallpaper, tmp_path, monkeypatch):
+    cache = wallpaper.WallpaperCache(str(tmp_path / "cache"))
+    rendered = []
+
+    def render(source, mode, width, height, path):
+        # 不解码图片，按真实格式写一个全黑的缓存文件
+        rendered.append((mode, width, height))
+        os.makedirs(cache.directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(cache.header.pack(cache.magic, width, height, width * 4))
+            f.write(bytes(width * height * 4))
+
+    monkeypatch.setattr(cache, "_render", render)
+    cache.rendered = rendered
+    return cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "wall.jpg"
+    path.write_bytes(b"jpeg")
+    return str(path)
+
+
+def test_surface_renders_once_then_maps_the_cached_file(cache, source):
+    for _ in range(2):
+        _, mapped, data = cache.surface(source, "fill", 8, 4)
+        assert len(data) == 8 * 4 * 4
+        data.release()
+        mapped.close()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.rendered == [("fill", 8, 4)]
+
+
+def test_entry_path_depends_on_mode_size_and_mtime(cache, source):
+    path = cache.entry_path(source, "fill", 8, 4)
+    assert cache.entry_path(source, "fill", 8, 4) == path
+    assert cache.entry_path(source, "stretch", 8, 4) != path
+    assert cache.entry_path(source, "fill", 4, 8) != path
+    os.utime(source, ns=(1, 1))
+    assert cache.entry_path(source, "fill", 8, 4) != path
+
+
+def test_corrupt_entry_is_removed(cache, source):
+    path = cache.entry_path(source, "fill", 8, 4)
+    os.makedirs(cache.directory)
+    with open(path, "wb") as f:
+        f.write(cache.header.pack(cache.magic, 1, 1, 4) + bytes(4))
+    with pytest.raises(ValueError):
+        cache.surface(source, "fill", 8, 4)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_paint_closes_the_mapping(config, cache, source, monkeypatch, fails):
+    results = []
+    original = cache.surface
+
+    def surface(*args):
+        results.append(original(*args))
+        return results[-1]
+
+    monkeypatch.setattr(cache, "surface", surface)
+    monkeypatch.setattr(config, "wallpaper_cache", cache)
+
+    def root_pixmap(screen):
+        if fails:
+            raise AttributeError("_get_root_pixmap_and_surface")
+        return object(), types.SimpleNamespace(finish=lambda: None)
+
+    painter = types.SimpleNamespace(_get_root_pixmap_and_surface=root_pixmap, _update_root_pixmap=lambda pixmap: None)
+    screen = config.CachedWallpaperScreen()
+    screen.qtile = types.SimpleNamespace(core=types.SimpleNamespace(name="x11", painter=painter))
+    screen.x, screen.y, screen.width, screen.height = 0, 0, 8, 4
+    screen.paint(source, "fill")
+    (_, mapped, data), = results
+    assert mapped.closed
+    with pytest.raises(ValueError):
+        data.tobytes()
@@ -0,0 +1,189 @@
+from collections import OrderedDict
+import time
+
+
+class ColumnResizer:
+    """
+    # 合并按住按键时的列宽调整：每次按键只把增量记下来，每帧统一应用一次
+    # 并只做一次 layout_all。连续按住时步长逐渐加大，大幅调整几帧就能完成。
+    # 调整的是焦点列和它右边的邻列（最右一列则用左边的邻列）。
+    """
+
+    frame_interval = 1 / 60
+    repeat_window = 0.25  # 两次按键间隔小于此值视为按住不放
+    max_factor = 8
+    min_width = 10
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change  # 每次真正调整列宽后调用
+        self.layout = None
+        self.pending = 0
+        self.streak = 0
+        self.last_press = 0.0
+        self.target = None  # (方向, 布局, 焦点列)，换方向或换列时重新从小步长开始
+        self.scheduled = False
+        self.requests = 0
+        self.relayouts = 0
+
+    def request(self, qtile, direction: int):
+        layout = qtile.current_layout
+        if getattr(layout, "name", "") != "columns" or len(layout.columns) < 2:
+            return
+        now = time.monotonic()
+        target = (direction, layout, layout.cc)
+        repeating = target == self.target and now - self.last_press < self.repeat_window
+        self.streak = self.streak + 1 if repeating else 0
+        self.target = target
+        self.last_press = now
+        step = getattr(layout, "grow_amount", 10) * min(2 ** (self.streak // 5), self.max_factor)
+        if layout is not self.layout:
+            self.layout = layout
+            self.pending = 0
+        self.pending += direction * step
+        self.requests += 1
+        if not self.scheduled:
+            self.scheduled = True
+            qtile.call_later(self.frame_interval, self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        layout, delta = self.layout, self.pending
+        self.layout, self.pending = None, 0
+        if layout is None or not delta or len(layout.columns) < 2 or layout.group is None:
+            return
+        current = layout.cc
+        index = layout.columns.index(current)
+        neighbour = layout.columns[index + 1 if index + 1 < len(layout.columns) else index - 1]
+        growing = delta > 0
+        if growing:
+            delta = min(delta, neighbour.width - self.min_width)
+        else:
+            delta = max(delta, self.min_width - current.width)
+        if delta == 0 or (delta > 0) != growing:
+            return
+        current.width += delta
+        neighbour.width -= delta
+        self.relayouts += 1
+        layout.group.layout_all()
+        if self.on_change is not None:
+            self.on_change()
+
+    def status(self) -> str:
+        saved = 100 * (1 - self.relayouts / self.requests) if self.requests else 0
+        return f"调整请求 {self.requests} 次，重新布局 {self.relayouts} 次（节省 {saved:.0f}%）"
+
+
+class GroupIndex:
+    """
+    # 由 hook 增量维护的分组索引：
+    # - members：每个组里有哪些窗口，只在组由空变非空（或反过来）时重建循环表，
+    #   按 Mod+Tab 时直接查表，不用每次筛选全部组再 index；
+    # - 组和窗口的最近使用顺序（MRU），末尾是最近使用的，供 alt-tab 式切换。
+    """
+
+    cycle_timeout = 1.0  # 连续按键的间隔小于此值时沿着同一份 MRU 快照往下走
+
+    def __init__(self):
+        self.members = {}
+        self.ring = []
+        self.position = {}
+        self.recent_groups = OrderedDict()
+        self.recent_windows = OrderedDict()
+        self._cycle = None
+
+    @staticmethod
+    def tracked(group) -> bool:
+        return group is not None and group.name != "scratchpad"
+
+    def rebuild(self, qtile):
+        self.members = {
+            group.name: {win.wid for win in group.windows}
+            for group in qtile.groups
+            if self.tracked(group)
+        }
+        for win in qtile.windows_map.values():
+            if self.tracked(getattr(win, "group", None)):
+                self.recent_windows.setdefault(win.wid)
+        for wid in [
+            wid
+            for wid in self.recent_windows
+            if not self.tracked(getattr(qtile.windows_map.get(wid), "group", None))
+        ]:
+            del self.recent_windows[wid]
+        for name in [name for name in self.recent_groups if name not in self.members]:
+            del self.recent_groups[name]
+        self._rebuild_ring(qtile)
+        self.group_used(qtile.current_group)
+
+    def _rebuild_ring(self, qtile):
+        self.ring = [
+            group for group in qtile.groups if self.members.get(group.name)
+        ]
+        self.position = {group.name: i for i, group in enumerate(self.ring)}
+
+    def window_added(self, qtile, group, win):
+        if not self.tracked(group):
+            # 移进 ScratchPad 的窗口（下拉终端等）不参与 alt-tab
+            self.recent_windows.pop(win.wid, None)
+            return
+        members = self.members.setdefault(group.name, set())
+        was_empty = not members
+        members.add(win.wid)
+        if was_empty:
+            self._rebuild_ring(qtile)
+
+    def window_removed(self, qtile, group, win):
+        members = self.members.get(getattr(group, "name", None))
+        if not members or win.wid not in members:
+            return
+        members.discard(win.wid)
+        if not members:
+            self._rebuild_ring(qtile)
+
+    def window_new(self, win):
+        # 新窗口还没获得焦点，先排在 MRU 最旧的位置
+        group = getattr(win, "group", None)
+        if group is not None and not self.tracked(group):
+            return
+        self.recent_windows[win.wid] = None
+        self.recent_windows.move_to_end(win.wid, last=False)
+
+    def window_killed(self, qtile, win):
+        self.recent_windows.pop(win.wid, None)
+        self.window_removed(qtile, getattr(win, "group", None), win)
+
+    def window_used(self, win):
+        if win is not None and self.tracked(getattr(win, "group", None)):
+            self.recent_windows[win.wid] = None
+            self.recent_windows.move_to_end(win.wid)
+
+    def group_used(self, group):
+        if self.tracked(group):
+            self.recent_groups[group.name] = None
+            self.recent_groups.move_to_end(group.name)
+
+    def cycle(self, current, direction: int):
+        if not self.ring:
+            return None
+        index = self.position.get(current.name) if current else None
+        if index is None:
+            return self.ring[0 if direction > 0 else -1]
+        return self.ring[(index + direction) % len(self.ring)]
+
+    def recent(self, kind: str, candidates):
+        """
+        # alt-tab 式选择：第一次按取最近用过的另一个，超时前连续按则沿着
+        # 按下第一次时的 MRU 快照继续往更早的走。
+        """
+        now = time.monotonic()
+        if self._cycle and self._cycle[0] == kind and now < self._cycle[3]:
+            _, snapshot, pos, _ = self._cycle
+            pos = (pos + 1) % len(snapshot)
+        else:
+            snapshot = list(reversed(candidates))
+            pos = 0
+        if not snapshot:
+            self._cycle = None
+            return None
+        self._cycle = (kind, snapshot, pos, now + self.cycle_timeout)
+        return snapshot[pos]
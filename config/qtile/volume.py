@@ -0,0 +1,130 @@
+from metrics import MetricSource
+from typing import NamedTuple
+import asyncio
+import re
+
+
+class VolumeSample(NamedTuple):
+    volume: int  # 百分比
+    muted: bool
+
+
+def parse_volume(volume_text: str, mute_text: str):
+    """
+    # 解析 `pactl get-sink-volume` 和 `pactl get-sink-mute` 的输出，取第一个声道的百分比。
+    """
+    found = re.search(r"(\d+)%", volume_text)
+    if found is None:
+        return None
+    return VolumeSample(int(found.group(1)), "yes" in mute_text.lower())
+
+
+class VolumeSource(MetricSource):
+    """
+    # 事件驱动的音量采集器。
+    # 常驻一个 `pactl subscribe` 子进程，只有收到 sink 或 server（默认输出设备
+    # 变化）的事件时才重新查询音量；coalesce 秒内连续到达的事件只查询一次，
+    # 查询期间又来的事件在查询结束后再补一次。子进程退出或启动失败后
+    # 从 retry_delay 秒开始按指数退避重启。
+    # subscribe_command、query_commands 可以换成输出固定内容的假命令，方便测试。
+    """
+
+    event_pattern = re.compile(r"Event '\w+' on (sink|server) #")
+
+    def __init__(self, subscribe_command=None, query_commands=None, coalesce: float = 0.03,
+                 retry_delay: float = 1):
+        MetricSource.__init__(self)
+        self.subscribe_command = subscribe_command or ["pactl", "subscribe"]
+        self.query_commands = query_commands or (
+            ["pactl", "get-sink-volume", "@DEFAULT_SINK@"],
+            ["pactl", "get-sink-mute", "@DEFAULT_SINK@"],
+        )
+        self.coalesce = coalesce
+        self.retry_delay = retry_delay
+        self.events = 0
+        self.queries = 0
+        self.restarts = 0
+        self._dirty = False
+        self._task = None
+        self._query_task = None
+        self._process = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        for task in (self._task, self._query_task):
+            if task is not None:
+                task.cancel()
+        self._task = self._query_task = None
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+        self._process = None
+
+    def changed(self):
+        """
+        # 音量可能变了：安排一次合并后的查询。
+        """
+        self._dirty = True
+        if self._query_task is None or self._query_task.done():
+            self._query_task = asyncio.create_task(self._query())
+
+    async def _run(self):
+        delay = self.retry_delay
+        while True:
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    *self.subscribe_command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError as error:
+                # pipewire-pulse 可能比 qtile 晚启动，稍后再试
+                print(f"启动 pactl subscribe 失败: {error}，{delay} 秒后重试。")
+                self._publish(None)
+            else:
+                # 订阅建立后查询一次初始状态，重启期间错过的变化也一并补上
+                self.changed()
+                async for raw in self._process.stdout:
+                    if self.event_pattern.search(raw.decode(errors="replace")):
+                        self.events += 1
+                        self.changed()
+                        delay = self.retry_delay
+
+                await self._process.wait()
+                print(f"pactl subscribe 已退出 ({self._process.returncode})，{delay} 秒后重启。")
+            self.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _query(self):
+        while self._dirty:
+            await asyncio.sleep(self.coalesce)
+            self._dirty = False
+            self.queries += 1
+            try:
+                outputs = await asyncio.gather(*(self._output(command) for command in self.query_commands))
+            except OSError as error:
+                print(f"查询音量失败: {error}")
+                return
+            sample = parse_volume(*outputs)
+            if sample != self.sample:
+                self._publish(sample)
+
+    @staticmethod
+    async def _output(command) -> str:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        # returncode 会被 qtile 的 SIGCHLD 处理抢走，不可靠，以输出为准
+        stdout, _ = await process.communicate()
+        return stdout.decode(errors="replace")
+
+    def status(self) -> str:
+        state = "运行中" if self._process is not None and self._process.returncode is None else "未运行"
+        current = "n/a" if self.sample is None else f"{self.sample.volume}%{'（静音）' if self.sample.muted else ''}"
+        return (
+            f"pactl subscribe {state}，重启 {self.restarts} 次\n"
+            f"事件 {self.events} 个，查询 {self.queries} 次，当前 {current}"
+        )
@@ -0,0 +1,114 @@
+import cairocffi
+import hashlib
+import mmap
+import os
+import struct
+
+
+class WallpaperCache:
+    """
+    # 按输出尺寸预先缩放好的壁纸缓存。
+    # 第一次遇到某个 (源文件, mtime, 模式, 宽, 高) 时解码并按 fill/stretch/center
+    # 缩放裁剪，把 RGB24 像素原样写进缓存文件；之后重新加载配置或插拔显示器时
+    # 直接 mmap 文件作为 cairo 表面，不再解码 JPEG。缓存总大小超过 max_bytes 时
+    # 删除最久没用过的文件。
+    """
+
+    magic = b"QWP1"
+    header = struct.Struct("<4sIII")  # magic, 宽, 高, stride
+
+    def __init__(self, directory: str = "~/.cache/qtile/wallpapers", max_bytes: int = 256 * 1024 * 1024):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry_path(self, source: str, mode, width: int, height: int) -> str:
+        stat = os.stat(source)
+        key = f"{os.path.realpath(source)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{mode}\0{width}x{height}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".raw")
+
+    def surface(self, source: str, mode, width: int, height: int):
+        """
+        # 返回 (表面, mmap, 像素的 memoryview)，未命中时先生成缓存文件。
+        # 用完后依次 finish 表面、release memoryview、close mmap。
+        """
+        path = self.entry_path(source, mode, width, height)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+        else:
+            self.misses += 1
+            self._render(source, mode, width, height, path)
+            self._evict(keep=path)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, stored_width, stored_height, stride = self.header.unpack_from(mapped)
+        if (magic, stored_width, stored_height) != (self.magic, width, height):
+            mapped.close()
+            os.unlink(path)
+            raise ValueError(f"壁纸缓存文件损坏：{path}")
+        data = memoryview(mapped)[self.header.size:]
+        surface = cairocffi.ImageSurface.create_for_data(data, cairocffi.FORMAT_RGB24, width, height, stride)
+        return surface, mapped, data
+
+    def _render(self, source, mode, width, height, path):
+        with open(source, "rb") as f:
+            image, _ = cairocffi.pixbuf.decode_to_image_surface(f.read())
+        target = cairocffi.ImageSurface(cairocffi.FORMAT_RGB24, width, height)
+        context = cairocffi.Context(target)
+        image_w, image_h = image.get_width(), image.get_height()
+        # 与 qtile 自带的壁纸绘制保持同样的缩放方式
+        if mode == "fill":
+            width_ratio = width / image_w
+            if width_ratio * image_h >= height:
+                context.scale(width_ratio)
+            else:
+                height_ratio = height / image_h
+                context.translate(-(image_w * height_ratio - width) // 2, 0)
+                context.scale(height_ratio)
+            context.set_source_surface(image)
+        elif mode == "stretch":
+            context.scale(sx=width / image_w, sy=height / image_h)
+            context.set_source_surface(image)
+        elif mode == "center":
+            context.set_source_surface(image, x=(width - image_w) / 2, y=(height - image_h) / 2)
+        else:
+            context.set_source_surface(image)
+        context.paint()
+        target.flush()
+
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.header.pack(self.magic, width, height, target.get_stride()))
+            f.write(target.get_data())
+        os.replace(temporary, path)
+
+    def _evict(self, keep: str):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".raw")]
+        except FileNotFoundError:
+            return
+        stats = sorted(((entry.stat(), entry.path) for entry in entries), key=lambda item: item[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in stats)
+        for stat, path in stats:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.unlink(path)
+            total -= stat.st_size
+            self.evictions += 1
+
+    def status(self) -> str:
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".raw")]
+        except FileNotFoundError:
+            entries = []
+        size = sum(entry.stat().st_size for entry in entries)
+        return (
+            f"缓存 {len(entries)} 张，{size / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MiB\n"
+            f"命中 {self.hits}，未命中 {self.misses}，淘汰 {self.evictions}"
+        )